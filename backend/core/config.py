@@ -2,6 +2,7 @@
 Configuration centralisée de l'application
 """
 import os
+import secrets
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -25,6 +26,67 @@ class Settings:
     # Weather API
     DEFAULT_CITY: str = "Paris"
     DEFAULT_COUNTRY_CODE: str = "FR"
+    WEATHER_PROVIDER: str = os.getenv("WEATHER_PROVIDER", "open-meteo")  # "open-meteo" | "fake" (local)
+    WEATHER_FORECAST_TTL: int = int(os.getenv("WEATHER_FORECAST_TTL", "900"))  # Mise à jour Open-Meteo : 15 min
+    WEATHER_STALE_TTL: int = int(os.getenv("WEATHER_STALE_TTL", "21600"))  # Prévision périmée encore servie
+    WEATHER_HTTP_TIMEOUT: float = float(os.getenv("WEATHER_HTTP_TIMEOUT", "3"))
+    WEATHER_CONNECT_TIMEOUT: float = float(os.getenv("WEATHER_CONNECT_TIMEOUT", "1"))
+    WEATHER_MAX_CONNECTIONS: int = int(os.getenv("WEATHER_MAX_CONNECTIONS", "20"))
+    WEATHER_NEAREST_CITY_KM: float = float(os.getenv("WEATHER_NEAREST_CITY_KM", "50"))  # Position GPS -> ville
+    # Préchargement des prévisions des villes actives (avant qu'elles n'expirent)
+    WEATHER_PREFETCH_ENABLED: bool = os.getenv("WEATHER_PREFETCH_ENABLED", "true").lower() == "true"
+    WEATHER_PREFETCH_INTERVAL: float = float(os.getenv("WEATHER_PREFETCH_INTERVAL", "600"))  # < WEATHER_FORECAST_TTL
+    WEATHER_PREFETCH_ACTIVE_WINDOW: int = int(os.getenv("WEATHER_PREFETCH_ACTIVE_WINDOW", "172800"))  # Demandée depuis < 48 h
+    WEATHER_PREFETCH_CONCURRENCY: int = int(os.getenv("WEATHER_PREFETCH_CONCURRENCY", "4"))
+    WEATHER_PREFETCH_JITTER: float = float(os.getenv("WEATHER_PREFETCH_JITTER", "60"))
+    WEATHER_PREFETCH_START_HOUR: int = int(os.getenv("WEATHER_PREFETCH_START_HOUR", "5"))  # Heure locale de la ville
+    
+    # Cache de garde-robe
+    WARDROBE_CACHE_SIZE: int = int(os.getenv("WARDROBE_CACHE_SIZE", "512"))
+    WARDROBE_CACHE_REDIS_URL: str = os.getenv("WARDROBE_CACHE_REDIS_URL")  # Backend partagé optionnel
+    WARDROBE_CACHE_SHARED_TTL: int = int(os.getenv("WARDROBE_CACHE_SHARED_TTL", "3600"))
+    WARDROBE_NOTIFY_CHANNEL: str = "wardrobe_changed"
+    
+    # Recherche à facettes
+    WARDROBE_SEARCH_CACHE_SIZE: int = int(os.getenv("WARDROBE_SEARCH_CACHE_SIZE", "2048"))
+    WARDROBE_SEARCH_TRIGRAM: bool = os.getenv("WARDROBE_SEARCH_TRIGRAM", "true").lower() == "true"  # Nécessite pg_trgm
+    
+    # Suivi des ports (écriture différée)
+    WEAR_FLUSH_INTERVAL: float = float(os.getenv("WEAR_FLUSH_INTERVAL", "5"))
+    WEAR_BUFFER_MAX_ENTRIES: int = int(os.getenv("WEAR_BUFFER_MAX_ENTRIES", "5000"))
+    
+    # Historique des analyses (écriture différée, partitions mensuelles)
+    ANALYSIS_LOG_FLUSH_INTERVAL: float = float(os.getenv("ANALYSIS_LOG_FLUSH_INTERVAL", "5"))
+    ANALYSIS_LOG_BATCH_SIZE: int = int(os.getenv("ANALYSIS_LOG_BATCH_SIZE", "500"))
+    ANALYSIS_LOG_MAX_PENDING: int = int(os.getenv("ANALYSIS_LOG_MAX_PENDING", "20000"))
+    ANALYSIS_HISTORY_RETENTION_MONTHS: int = int(os.getenv("ANALYSIS_HISTORY_RETENTION_MONTHS", "12"))
+    # Jeton signé des mesures d'analyse : secret partagé par tous les workers (aléatoire par processus sinon)
+    ANALYSIS_TOKEN_SECRET: str = os.getenv("ANALYSIS_TOKEN_SECRET") or secrets.token_urlsafe(32)
+    ANALYSIS_TOKEN_MAX_AGE_HOURS: int = int(os.getenv("ANALYSIS_TOKEN_MAX_AGE_HOURS", "48"))
+    
+    # Clés d'idempotence (en-tête Idempotency-Key)
+    IDEMPOTENCY_KEY_TTL: int = int(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))  # Durée de rejeu des réponses
+    IDEMPOTENCY_LOCK_TIMEOUT: int = int(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", "120"))  # Reprise d'un traitement abandonné
+    IDEMPOTENCY_WAIT_TIMEOUT: float = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "30"))  # Attente d'une requête en cours
+    
+    # Recommandations : candidats chargés côté serveur
+    RECOMMENDATION_CANDIDATES_CACHE_SIZE: int = int(os.getenv("RECOMMENDATION_CANDIDATES_CACHE_SIZE", "512"))
+    RECOMMENDATION_MAX_PER_CATEGORY: int = int(os.getenv("RECOMMENDATION_MAX_PER_CATEGORY", "15"))
+    RECOMMENDATION_MAX_LOOKS: int = int(os.getenv("RECOMMENDATION_MAX_LOOKS", "10"))
+    # Tenues générées localement : K meilleures proposées au modèle, ou choix local ("auto" | "local")
+    RECOMMENDATION_TOP_K: int = int(os.getenv("RECOMMENDATION_TOP_K", "5"))
+    RECOMMENDATION_MODE: str = os.getenv("RECOMMENDATION_MODE", "auto")
+    RECOMMENDATION_LLM_TIMEOUT: float = float(os.getenv("RECOMMENDATION_LLM_TIMEOUT", "15"))
+    # Recommandations du jour en cache jusqu'à minuit local (choix local de secours : moins longtemps)
+    RECOMMENDATION_CACHE_SIZE: int = int(os.getenv("RECOMMENDATION_CACHE_SIZE", "4096"))
+    RECOMMENDATION_DEGRADED_CACHE_TTL: int = int(os.getenv("RECOMMENDATION_DEGRADED_CACHE_TTL", "600"))
+    # Historique côté serveur : dernières tenues recommandées, écartées des suivantes
+    RECOMMENDATION_HISTORY_SIZE: int = int(os.getenv("RECOMMENDATION_HISTORY_SIZE", "30"))
+    # Précalcul nocturne (scripts/precompute_recommendations.py) : utilisateurs actifs, tôt le matin local
+    RECOMMENDATION_PRECOMPUTE_CONCURRENCY: int = int(os.getenv("RECOMMENDATION_PRECOMPUTE_CONCURRENCY", "8"))
+    RECOMMENDATION_PRECOMPUTE_ACTIVE_DAYS: int = int(os.getenv("RECOMMENDATION_PRECOMPUTE_ACTIVE_DAYS", "14"))
+    RECOMMENDATION_PRECOMPUTE_START_HOUR: int = int(os.getenv("RECOMMENDATION_PRECOMPUTE_START_HOUR", "3"))
+    RECOMMENDATION_PRECOMPUTE_END_HOUR: int = int(os.getenv("RECOMMENDATION_PRECOMPUTE_END_HOUR", "7"))
     
     # AI Model
     AI_MODEL: str = "gpt-4o"
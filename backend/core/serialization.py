@@ -0,0 +1,73 @@
+"""
+Sérialisation JSON rapide des réponses
+
+Les lignes (NamedTuple) sont converties en dict par des fonctions compilées une
+seule fois, puis écrites directement en bytes par orjson quand il est installé
+(UUID et datetime sont gérés nativement, sans passer par jsonable_encoder).
+"""
+import json
+import keyword
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+from uuid import UUID
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # Dépendance optionnelle : repli sur json
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Type non sérialisable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode un contenu en JSON (bytes)"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """Réponse JSON encodée sans re-validation ni jsonable_encoder"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+
+def compile_row_mapper(fields: Dict[str, str], nested: Optional[Dict[str, Tuple[str, Callable]]] = None) -> Callable[[Any], dict]:
+    """Compile une fonction ligne -> dict à partir d'un mapping {clé de sortie: attribut source}.
+
+    L'attribut source peut être un chemin pointé ("item.name"). Les entrées de
+    `nested` produisent une liste via un autre mapper : {clé: (attribut, mapper)}.
+    """
+    nested = nested or {}
+    namespace = {}
+    entries = []
+
+    for output_key, source in fields.items():
+        entries.append(f"{output_key!r}: row.{_checked_path(source)}")
+    for index, (output_key, (source, mapper)) in enumerate(nested.items()):
+        name = f"_nested_{index}"
+        namespace[name] = mapper
+        entries.append(f"{output_key!r}: [{name}(x) for x in (row.{_checked_path(source)} or ())]")
+
+    source_code = "def map_row(row):\n    return {" + ", ".join(entries) + "}\n"
+    exec(source_code, namespace)
+    return namespace["map_row"]
+
+
+def _checked_path(path: str) -> str:
+    parts = path.split(".")
+    if not all(part.isidentifier() and not keyword.iskeyword(part) for part in parts):
+        raise ValueError(f"Chemin d'attribut invalide: {path!r}")
+    return path
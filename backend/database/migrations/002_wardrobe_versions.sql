@@ -0,0 +1,16 @@
+-- Migration: Compteur de version de garde-robe par utilisateur
+-- Description: Incrémenté à chaque écriture (pièce, tenue, mise à jour) pour
+-- servir d'ETag aux endpoints de liste et répondre 304 sans lire les tables d'items
+
+CREATE TABLE IF NOT EXISTS wardrobe_versions (
+    user_id UUID PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Initialiser les utilisateurs existants à la version 1
+INSERT INTO wardrobe_versions (user_id, version)
+SELECT user_id, 1 FROM clothing_items
+UNION
+SELECT user_id, 1 FROM outfit_looks
+ON CONFLICT (user_id) DO NOTHING;
@@ -0,0 +1,24 @@
+-- Migration: Statistiques de garde-robe matérialisées
+-- Description: Une ligne par utilisateur, recalculée par l'application au commit
+-- de chaque écriture (services/wardrobe_stats.py). Lue par GET /wardrobe/{user_id}/stats
+-- et scripts/check_wardrobe_status.py au lieu de GROUP BY sur clothing_items / outfit_looks.
+-- Les lignes absentes sont calculées à la première lecture ; pour tout recalculer :
+--     python scripts/check_wardrobe_status.py --refresh
+
+CREATE TABLE IF NOT EXISTS wardrobe_stats (
+    user_id UUID PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    total_items INTEGER NOT NULL DEFAULT 0,
+    favorite_items INTEGER NOT NULL DEFAULT 0,
+    total_looks INTEGER NOT NULL DEFAULT 0,
+    total_wears INTEGER NOT NULL DEFAULT 0,
+    by_type JSONB NOT NULL DEFAULT '{}',
+    by_color JSONB NOT NULL DEFAULT '{}',
+    by_season JSONB NOT NULL DEFAULT '{}',
+    by_wear JSONB NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Le recalcul par utilisateur s'appuie sur ces index
+CREATE INDEX IF NOT EXISTS idx_clothing_items_user_id ON clothing_items(user_id);
+CREATE INDEX IF NOT EXISTS idx_outfit_looks_user_id ON outfit_looks(user_id);
@@ -0,0 +1,13 @@
+-- Migration: Recherche à facettes dans la garde-robe
+-- Description: Index des filtres de GET /wardrobe/{user_id}/search
+-- (services/wardrobe_search.py). Sans pg_trgm, définir WARDROBE_SEARCH_TRIGRAM=false :
+-- la recherche texte se replie sur ILIKE.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Recherche texte approximative (opérateur <% / word_similarity, et ILIKE)
+CREATE INDEX IF NOT EXISTS idx_clothing_items_name_trgm ON clothing_items USING GIN (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_clothing_items_notes_trgm ON clothing_items USING GIN (notes gin_trgm_ops);
+
+-- Les filtres de facettes restent bornés à un utilisateur (idx_clothing_items_user_id,
+-- migration 003) : pas d'index GIN dédié sur les colonnes tableau.
@@ -0,0 +1,6 @@
+-- Migration: Index inverse pièce -> tenues
+-- Description: La clé primaire (look_id, item_id) ne sert pas les recherches par pièce.
+-- Utilisé par GET /wardrobe/{user_id}/pieces/{item_id}/looks et par le nombre de
+-- tenues (look_count) renvoyé dans la liste des pièces.
+
+CREATE INDEX IF NOT EXISTS ix_look_items_item_id ON look_items(item_id);
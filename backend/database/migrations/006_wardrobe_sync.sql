@@ -0,0 +1,18 @@
+-- Migration: Synchronisation incrémentale de la garde-robe
+-- Description: GET /wardrobe/{user_id}/changes parcourt les pièces d'un utilisateur
+-- par (updated_at, id). updated_at doit donc changer à chaque modification, y compris
+-- hors ORM : trigger équivalent au onupdate du modèle.
+
+CREATE INDEX IF NOT EXISTS ix_clothing_items_user_updated ON clothing_items(user_id, updated_at, id);
+
+CREATE OR REPLACE FUNCTION update_updated_at_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS update_clothing_items_updated_at ON clothing_items;
+CREATE TRIGGER update_clothing_items_updated_at BEFORE UPDATE
+    ON clothing_items FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
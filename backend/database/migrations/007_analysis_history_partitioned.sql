@@ -0,0 +1,66 @@
+-- Migration: Historique des analyses partitionné par mois
+-- Description: analysis_history devient une table partitionnée (RANGE sur created_at,
+-- une partition analysis_history_pAAAAMM par mois UTC) avec raw_analysis en JSONB et
+-- les mesures de l'appel au modèle (model_used, jetons, durée). Les lignes sont écrites
+-- par lots par services/analysis_history.py, qui crée les partitions manquantes ; les
+-- partitions expirées sont supprimées par :
+--     python scripts/analysis_history_retention.py
+
+BEGIN;
+
+ALTER TABLE analysis_history RENAME TO analysis_history_legacy;
+ALTER TABLE analysis_history_legacy RENAME CONSTRAINT analysis_history_pkey TO analysis_history_legacy_pkey;
+
+CREATE TABLE analysis_history (
+    id UUID NOT NULL DEFAULT gen_random_uuid(),
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    user_id UUID NOT NULL,
+    capture_type VARCHAR(20) NOT NULL,
+    raw_analysis JSONB NOT NULL,
+    created_item_id UUID REFERENCES clothing_items(id) ON DELETE SET NULL,
+    created_look_id UUID REFERENCES outfit_looks(id) ON DELETE SET NULL,
+    analysis_duration_ms INTEGER,
+    model_used VARCHAR(50),
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    confidence_score NUMERIC(3, 2),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Une partition par mois de données existantes, plus le mois courant et le suivant
+DO $$
+DECLARE
+    month DATE;
+BEGIN
+    FOR month IN
+        SELECT DISTINCT date_trunc('month', created_at AT TIME ZONE 'UTC')::date
+        FROM analysis_history_legacy WHERE created_at IS NOT NULL
+        UNION
+        SELECT date_trunc('month', now() AT TIME ZONE 'UTC')::date + offs * INTERVAL '1 month'
+        FROM generate_series(0, 1) AS offs
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF analysis_history FOR VALUES FROM (%L) TO (%L)',
+            'analysis_history_p' || to_char(month, 'YYYYMM'),
+            month::text || ' 00:00:00+00',
+            (month + INTERVAL '1 month')::date::text || ' 00:00:00+00'
+        );
+    END LOOP;
+END $$;
+
+-- Les champs nuls du dump Pydantic ne sont pas conservés. L'ancienne durée mesurait
+-- l'écriture en base et non l'analyse : elle n'est pas reprise.
+INSERT INTO analysis_history (id, created_at, user_id, capture_type, raw_analysis,
+                              created_item_id, created_look_id, analysis_duration_ms,
+                              model_used, confidence_score)
+SELECT id, COALESCE(created_at, now()), user_id, capture_type, jsonb_strip_nulls(raw_analysis::jsonb),
+       created_item_id, created_look_id, NULL, model_used, confidence_score
+FROM analysis_history_legacy;
+
+DROP TABLE analysis_history_legacy;
+
+CREATE INDEX IF NOT EXISTS ix_analysis_history_user_created ON analysis_history(user_id, created_at);
+CREATE INDEX IF NOT EXISTS ix_analysis_history_created_item ON analysis_history(created_item_id);
+CREATE INDEX IF NOT EXISTS ix_analysis_history_created_look ON analysis_history(created_look_id);
+
+COMMIT;
@@ -0,0 +1,19 @@
+-- Migration: Clés d'idempotence
+-- Description: Réponse de la première requête portant un en-tête Idempotency-Key
+-- (POST /wardrobe/save), rejouée pour les nouvelles tentatives pendant IDEMPOTENCY_KEY_TTL.
+-- Les clés expirées sont supprimées au fil des réservations (services/idempotency.py).
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    user_id UUID NOT NULL,
+    scope VARCHAR(50) NOT NULL,
+    key VARCHAR(255) NOT NULL,
+    request_hash VARCHAR(64) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'in_progress',
+    response_status INTEGER,
+    response_body JSONB,
+    locked_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (user_id, scope, key)
+);
+
+CREATE INDEX IF NOT EXISTS ix_idempotency_keys_expires_at ON idempotency_keys(expires_at);
@@ -0,0 +1,14 @@
+-- Migration: Cache persistant du géocodage
+-- Description: Coordonnées des villes demandées pour la météo des recommandations,
+-- partagées entre workers et conservées aux redémarrages (services/weather.py).
+
+CREATE TABLE IF NOT EXISTS geocoded_cities (
+    query VARCHAR(200) PRIMARY KEY,
+    name VARCHAR NOT NULL,
+    country VARCHAR,
+    latitude DOUBLE PRECISION NOT NULL,
+    longitude DOUBLE PRECISION NOT NULL,
+    timezone VARCHAR(64),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
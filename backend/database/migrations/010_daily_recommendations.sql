@@ -0,0 +1,21 @@
+-- Migration: Recommandations quotidiennes précalculées
+-- Description: Contexte de la dernière demande de chaque utilisateur (ville, saison, mode)
+-- et recommandation calculée avant le pic du matin par scripts/precompute_recommendations.py,
+-- servie par /recommendations/daily tant que ses entrées restent valables.
+
+CREATE TABLE IF NOT EXISTS daily_recommendations (
+    user_id UUID PRIMARY KEY,
+    city VARCHAR,
+    country_code VARCHAR(2),
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION,
+    current_season VARCHAR(20),
+    mode VARCHAR(10),
+    last_requested_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    input_key VARCHAR(64),
+    result JSONB,
+    valid_until TIMESTAMP WITH TIME ZONE,
+    computed_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS ix_daily_recommendations_last_requested_at ON daily_recommendations(last_requested_at);
@@ -0,0 +1,10 @@
+-- Migration: Historique des recommandations
+-- Description: Dernières tenues recommandées à chaque utilisateur (anneau borné d'empreintes
+-- de 8 octets des clés canoniques, services/recommendation_history.py), écartées de la
+-- génération des tenues sans que le client ait à les renvoyer.
+
+CREATE TABLE IF NOT EXISTS recommendation_history (
+    user_id UUID PRIMARY KEY,
+    digests BYTEA NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
@@ -0,0 +1,173 @@
+-- Migration: Statistiques de garde-robe mises à jour par deltas
+-- Description: wardrobe_stats n'est plus recalculée au commit à partir de toutes les
+-- pièces de l'utilisateur. Des triggers par instruction (tables de transition) ajoutent
+-- la contribution des lignes insérées et retirent celle des lignes supprimées ou
+-- modifiées, quel que soit le chemin d'écriture (ORM, mises à jour groupées, imports).
+-- Une pièce compte si is_active. La lecture (GET /wardrobe/{user_id}/stats) ne fait
+-- plus aucune écriture. Après cette migration, recalculer une fois toutes les lignes :
+--     python scripts/check_wardrobe_status.py --refresh
+
+-- Tranche de fréquence de port d'une pièce (seuils de wear_count)
+CREATE OR REPLACE FUNCTION wardrobe_wear_bucket(wear_count INTEGER)
+RETURNS TEXT AS $$
+    SELECT CASE
+        WHEN COALESCE(wear_count, 0) <= 0 THEN 'never'
+        WHEN wear_count <= 4 THEN 'occasional'
+        WHEN wear_count <= 19 THEN 'regular'
+        ELSE 'frequent'
+    END
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Somme de deux objets {clé: nombre} ; les clés à zéro disparaissent
+CREATE OR REPLACE FUNCTION jsonb_add_counts(base JSONB, delta JSONB)
+RETURNS JSONB AS $$
+    SELECT COALESCE(jsonb_object_agg(k, n), '{}'::jsonb)
+    FROM (
+        SELECT k, sum(n)::int AS n
+        FROM (
+            SELECT key, value::int FROM jsonb_each_text(COALESCE(base, '{}'::jsonb))
+            UNION ALL
+            SELECT key, value::int FROM jsonb_each_text(COALESCE(delta, '{}'::jsonb))
+        ) AS counts(k, n)
+        GROUP BY k
+        HAVING sum(n) <> 0
+    ) AS merged
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Applique un delta : changed = [{"sign": 1 | -1, "row": ligne de clothing_items}, ...]
+CREATE OR REPLACE FUNCTION apply_wardrobe_stats_delta(changed JSONB)
+RETURNS VOID AS $$
+    WITH items AS (
+        SELECT
+            (c->>'sign')::int AS sign,
+            (c->'row'->>'user_id')::uuid AS user_id,
+            COALESCE((c->'row'->>'is_favorite')::boolean, false) AS is_favorite,
+            COALESCE((c->'row'->>'wear_count')::int, 0) AS wear_count,
+            c->'row'->>'piece_type' AS piece_type,
+            CASE WHEN jsonb_typeof(c->'row'->'colors'->'primary') = 'array'
+                 THEN c->'row'->'colors'->'primary' ELSE '[]'::jsonb END AS colors,
+            CASE WHEN jsonb_typeof(c->'row'->'seasonality') = 'array'
+                 THEN c->'row'->'seasonality' ELSE '[]'::jsonb END AS seasons
+        FROM jsonb_array_elements(changed) AS c
+    ),
+    users AS (
+        SELECT DISTINCT user_id FROM items
+    )
+    INSERT INTO wardrobe_stats (
+        user_id, version, total_items, favorite_items, total_looks, total_wears,
+        by_type, by_color, by_season, by_wear, updated_at
+    )
+    SELECT
+        u.user_id,
+        COALESCE((SELECT v.version FROM wardrobe_versions v WHERE v.user_id = u.user_id), 0),
+        (SELECT sum(i.sign) FROM items i WHERE i.user_id = u.user_id),
+        (SELECT COALESCE(sum(i.sign) FILTER (WHERE i.is_favorite), 0) FROM items i WHERE i.user_id = u.user_id),
+        0,
+        (SELECT sum(i.sign * i.wear_count) FROM items i WHERE i.user_id = u.user_id),
+        (SELECT COALESCE(jsonb_object_agg(k, n), '{}'::jsonb) FROM (
+            SELECT i.piece_type, sum(i.sign) FROM items i
+            WHERE i.user_id = u.user_id AND i.piece_type IS NOT NULL GROUP BY 1
+        ) AS counts(k, n)),
+        (SELECT COALESCE(jsonb_object_agg(k, n), '{}'::jsonb) FROM (
+            SELECT c.color, sum(i.sign) FROM items i, jsonb_array_elements_text(i.colors) AS c(color)
+            WHERE i.user_id = u.user_id GROUP BY 1
+        ) AS counts(k, n)),
+        (SELECT COALESCE(jsonb_object_agg(k, n), '{}'::jsonb) FROM (
+            SELECT s.season, sum(i.sign) FROM items i, jsonb_array_elements_text(i.seasons) AS s(season)
+            WHERE i.user_id = u.user_id GROUP BY 1
+        ) AS counts(k, n)),
+        (SELECT COALESCE(jsonb_object_agg(k, n), '{}'::jsonb) FROM (
+            SELECT wardrobe_wear_bucket(i.wear_count), sum(i.sign) FROM items i
+            WHERE i.user_id = u.user_id GROUP BY 1
+        ) AS counts(k, n)),
+        now()
+    FROM users u
+    ON CONFLICT (user_id) DO UPDATE SET
+        total_items = wardrobe_stats.total_items + EXCLUDED.total_items,
+        favorite_items = wardrobe_stats.favorite_items + EXCLUDED.favorite_items,
+        total_wears = wardrobe_stats.total_wears + EXCLUDED.total_wears,
+        by_type = jsonb_add_counts(wardrobe_stats.by_type, EXCLUDED.by_type),
+        by_color = jsonb_add_counts(wardrobe_stats.by_color, EXCLUDED.by_color),
+        by_season = jsonb_add_counts(wardrobe_stats.by_season, EXCLUDED.by_season),
+        by_wear = jsonb_add_counts(wardrobe_stats.by_wear, EXCLUDED.by_wear),
+        updated_at = EXCLUDED.updated_at
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION wardrobe_stats_items_delta()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed JSONB := '[]'::jsonb;
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        SELECT changed || COALESCE(jsonb_agg(jsonb_build_object('sign', 1, 'row', to_jsonb(n))), '[]'::jsonb)
+        INTO changed FROM new_rows n WHERE n.is_active;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        SELECT changed || COALESCE(jsonb_agg(jsonb_build_object('sign', -1, 'row', to_jsonb(o))), '[]'::jsonb)
+        INTO changed FROM old_rows o WHERE o.is_active;
+    END IF;
+    IF jsonb_array_length(changed) > 0 THEN
+        PERFORM apply_wardrobe_stats_delta(changed);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS wardrobe_stats_items_insert ON clothing_items;
+CREATE TRIGGER wardrobe_stats_items_insert AFTER INSERT ON clothing_items
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION wardrobe_stats_items_delta();
+
+DROP TRIGGER IF EXISTS wardrobe_stats_items_update ON clothing_items;
+CREATE TRIGGER wardrobe_stats_items_update AFTER UPDATE ON clothing_items
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION wardrobe_stats_items_delta();
+
+DROP TRIGGER IF EXISTS wardrobe_stats_items_delete ON clothing_items;
+CREATE TRIGGER wardrobe_stats_items_delete AFTER DELETE ON clothing_items
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION wardrobe_stats_items_delta();
+
+CREATE OR REPLACE FUNCTION wardrobe_stats_looks_delta()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO wardrobe_stats (
+        user_id, version, total_items, favorite_items, total_looks, total_wears,
+        by_type, by_color, by_season, by_wear, updated_at
+    )
+    SELECT
+        d.user_id, COALESCE((SELECT v.version FROM wardrobe_versions v WHERE v.user_id = d.user_id), 0),
+        0, 0, d.n, 0, '{}', '{}', '{}', '{}', now()
+    FROM (
+        SELECT user_id, CASE WHEN TG_OP = 'INSERT' THEN count(*) ELSE -count(*) END AS n
+        FROM changed_looks GROUP BY user_id
+    ) AS d
+    ON CONFLICT (user_id) DO UPDATE SET
+        total_looks = wardrobe_stats.total_looks + EXCLUDED.total_looks,
+        updated_at = EXCLUDED.updated_at;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS wardrobe_stats_looks_insert ON outfit_looks;
+CREATE TRIGGER wardrobe_stats_looks_insert AFTER INSERT ON outfit_looks
+    REFERENCING NEW TABLE AS changed_looks
+    FOR EACH STATEMENT EXECUTE FUNCTION wardrobe_stats_looks_delta();
+
+DROP TRIGGER IF EXISTS wardrobe_stats_looks_delete ON outfit_looks;
+CREATE TRIGGER wardrobe_stats_looks_delete AFTER DELETE ON outfit_looks
+    REFERENCING OLD TABLE AS changed_looks
+    FOR EACH STATEMENT EXECUTE FUNCTION wardrobe_stats_looks_delta();
+
+-- Version de garde-robe des statistiques, suivie dans la même transaction que l'écriture
+CREATE OR REPLACE FUNCTION wardrobe_stats_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE wardrobe_stats SET version = NEW.version WHERE user_id = NEW.user_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS wardrobe_stats_version ON wardrobe_versions;
+CREATE TRIGGER wardrobe_stats_version AFTER INSERT OR UPDATE ON wardrobe_versions
+    FOR EACH ROW EXECUTE FUNCTION wardrobe_stats_version();
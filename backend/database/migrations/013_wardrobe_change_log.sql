@@ -0,0 +1,99 @@
+-- Migration: Journal de modifications de la garde-robe ordonné par commit
+-- Description: GET /wardrobe/{user_id}/changes ne parcourt plus les lignes par
+-- (updated_at, id) : updated_at est fixé au début de la transaction, une transaction
+-- longue pouvait donc valider des lignes derrière le curseur d'un client déjà passé.
+-- Chaque pièce et chaque tenue porte maintenant change_seq, le numéro de la version
+-- de garde-robe (wardrobe_versions) que la transaction d'écriture va publier. La ligne
+-- wardrobe_versions de l'utilisateur est verrouillée dès la première écriture et
+-- jusqu'au commit : les écritures d'un même utilisateur sont sérialisées et une
+-- version visible couvre toutes les lignes validées avec un change_seq inférieur ou égal.
+-- Les suppressions physiques (tenues, pièces) laissent une trace dans wardrobe_tombstones.
+
+ALTER TABLE clothing_items ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE outfit_looks ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT 0;
+
+DROP INDEX IF EXISTS ix_clothing_items_user_updated;
+CREATE INDEX IF NOT EXISTS ix_clothing_items_user_change ON clothing_items(user_id, change_seq, id);
+CREATE INDEX IF NOT EXISTS ix_outfit_looks_user_change ON outfit_looks(user_id, change_seq, id);
+
+CREATE TABLE IF NOT EXISTS wardrobe_tombstones (
+    user_id UUID NOT NULL,
+    kind VARCHAR(10) NOT NULL,  -- 'item' | 'look'
+    entity_id UUID NOT NULL,
+    change_seq BIGINT NOT NULL,
+    deleted_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, kind, entity_id)
+);
+
+CREATE INDEX IF NOT EXISTS ix_wardrobe_tombstones_user_change ON wardrobe_tombstones(user_id, change_seq, entity_id);
+
+-- Version que la transaction courante publiera pour l'utilisateur ; verrouille sa ligne
+-- wardrobe_versions jusqu'au commit (créée au besoin pour que le verrou existe)
+CREATE OR REPLACE FUNCTION wardrobe_next_change_seq(owner UUID)
+RETURNS BIGINT AS $$
+DECLARE
+    current_version BIGINT;
+BEGIN
+    INSERT INTO wardrobe_versions (user_id, version, updated_at)
+    VALUES (owner, 0, now())
+    ON CONFLICT (user_id) DO NOTHING;
+
+    SELECT version INTO current_version
+    FROM wardrobe_versions WHERE user_id = owner
+    FOR UPDATE;
+
+    RETURN current_version + 1;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION wardrobe_stamp_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.change_seq = wardrobe_next_change_seq(NEW.user_id);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS wardrobe_stamp_items ON clothing_items;
+CREATE TRIGGER wardrobe_stamp_items BEFORE INSERT OR UPDATE ON clothing_items
+    FOR EACH ROW EXECUTE FUNCTION wardrobe_stamp_change();
+
+DROP TRIGGER IF EXISTS wardrobe_stamp_looks ON outfit_looks;
+CREATE TRIGGER wardrobe_stamp_looks BEFORE INSERT OR UPDATE ON outfit_looks
+    FOR EACH ROW EXECUTE FUNCTION wardrobe_stamp_change();
+
+-- Suppression physique : trace pour les clients qui avaient la ligne (TG_ARGV[0] = kind)
+CREATE OR REPLACE FUNCTION wardrobe_record_tombstone()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO wardrobe_tombstones (user_id, kind, entity_id, change_seq, deleted_at)
+    VALUES (OLD.user_id, TG_ARGV[0], OLD.id, wardrobe_next_change_seq(OLD.user_id), now())
+    ON CONFLICT (user_id, kind, entity_id) DO UPDATE SET
+        change_seq = EXCLUDED.change_seq,
+        deleted_at = EXCLUDED.deleted_at;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS wardrobe_tombstone_items ON clothing_items;
+CREATE TRIGGER wardrobe_tombstone_items AFTER DELETE ON clothing_items
+    FOR EACH ROW EXECUTE FUNCTION wardrobe_record_tombstone('item');
+
+DROP TRIGGER IF EXISTS wardrobe_tombstone_looks ON outfit_looks;
+CREATE TRIGGER wardrobe_tombstone_looks AFTER DELETE ON outfit_looks
+    FOR EACH ROW EXECUTE FUNCTION wardrobe_record_tombstone('look');
+
+-- Composition d'une tenue modifiée (pièce ajoutée ou retirée, y compris par cascade) :
+-- la tenue repart dans le journal
+CREATE OR REPLACE FUNCTION wardrobe_touch_look()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE outfit_looks SET updated_at = now()
+    WHERE id = CASE WHEN TG_OP = 'DELETE' THEN OLD.look_id ELSE NEW.look_id END;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS wardrobe_touch_look_items ON look_items;
+CREATE TRIGGER wardrobe_touch_look_items AFTER INSERT OR DELETE ON look_items
+    FOR EACH ROW EXECUTE FUNCTION wardrobe_touch_look();
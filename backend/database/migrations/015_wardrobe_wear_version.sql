@@ -0,0 +1,25 @@
+-- Migration: Compteurs de port hors de la version de garde-robe
+-- Description: le vidage des "porté aujourd'hui" (services/wear_tracker.py) incrémentait
+-- wardrobe_versions.version : chaque port invalidait les ETags, l'instantané en cache et
+-- les recommandations calculées pour cette version (clé wardrobe=v<version>), alors que
+-- seuls wear_count et last_worn changent. Ces compteurs ont maintenant leur propre
+-- version (wear_version), qui n'entre que dans l'ETag des listes qui les affichent.
+-- Une mise à jour qui ne touche que les compteurs de port garde son change_seq : elle ne
+-- verrouille pas wardrobe_versions et la synchronisation ne la renvoie pas (le client
+-- relit les compteurs quand wear_version, renvoyé par /changes, augmente).
+
+ALTER TABLE wardrobe_versions ADD COLUMN IF NOT EXISTS wear_version BIGINT NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION wardrobe_stamp_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND to_jsonb(NEW) - ARRAY['wear_count', 'last_worn', 'updated_at', 'change_seq']
+           = to_jsonb(OLD) - ARRAY['wear_count', 'last_worn', 'updated_at', 'change_seq'] THEN
+        NEW.change_seq = OLD.change_seq;
+        RETURN NEW;
+    END IF;
+    NEW.change_seq = wardrobe_next_change_seq(NEW.user_id);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
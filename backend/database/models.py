@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, DateTime, Boolean, Integer, ForeignKey, JSON, ARRAY, Date, Numeric
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, DateTime, Boolean, Integer, BigInteger, ForeignKey, JSON, ARRAY, Date, Numeric, Float, Index, LargeBinary
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from sqlalchemy.ext.declarative import declarative_base
@@ -44,10 +44,17 @@ class ClothingItem(Base):
     wear_count = Column(Integer, default=0)
     is_favorite = Column(Boolean, default=False)
     is_active = Column(Boolean, default=True)
+    # Version de garde-robe qui a publié la dernière modification (trigger, migration 013)
+    change_seq = Column(BigInteger, nullable=False, server_default="0")
     
     # Relations
     looks = relationship("LookItem", back_populates="item")
-    analysis_history = relationship("AnalysisHistory", back_populates="created_item")
+    analysis_history = relationship("AnalysisHistory", back_populates="created_item", passive_deletes=True)
+    
+    __table_args__ = (
+        # Synchronisation incrémentale : parcours par (change_seq, id) pour un utilisateur
+        Index('ix_clothing_items_user_change', 'user_id', 'change_seq', 'id'),
+    )
 
 
 class OutfitLook(Base):
@@ -81,17 +88,23 @@ class OutfitLook(Base):
     wear_count = Column(Integer, default=0)
     rating = Column(Integer)
     is_favorite = Column(Boolean, default=False)
+    change_seq = Column(BigInteger, nullable=False, server_default="0")
     
     # Relations
     items = relationship("LookItem", back_populates="look", cascade="all, delete-orphan")
-    analysis_history = relationship("AnalysisHistory", back_populates="created_look")
+    analysis_history = relationship("AnalysisHistory", back_populates="created_look", passive_deletes=True)
+    
+    __table_args__ = (
+        Index('ix_outfit_looks_user_change', 'user_id', 'change_seq', 'id'),
+    )
 
 
 class LookItem(Base):
     __tablename__ = 'look_items'
     
     look_id = Column(UUID(as_uuid=True), ForeignKey('outfit_looks.id', ondelete='CASCADE'), primary_key=True)
-    item_id = Column(UUID(as_uuid=True), ForeignKey('clothing_items.id', ondelete='CASCADE'), primary_key=True)
+    # Index dédié : la clé primaire (look_id, item_id) ne sert pas les recherches par pièce
+    item_id = Column(UUID(as_uuid=True), ForeignKey('clothing_items.id', ondelete='CASCADE'), primary_key=True, index=True)
     position = Column(Integer, default=0)
     
     # Coordonnées de la pièce dans l'image de la tenue complète (format normalisé 0-1)
@@ -103,27 +116,138 @@ class LookItem(Base):
 
 
 class AnalysisHistory(Base):
+    """Journal des analyses, partitionné par mois (migration 007, services/analysis_history.py)"""
     __tablename__ = 'analysis_history'
-    
+    __table_args__ = (
+        Index('ix_analysis_history_user_created', 'user_id', 'created_at'),
+        Index('ix_analysis_history_created_item', 'created_item_id'),
+        Index('ix_analysis_history_created_look', 'created_look_id'),
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
+    
+    # La clé de partitionnement fait partie de la clé primaire
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
     user_id = Column(UUID(as_uuid=True), nullable=False)
     
     # Type d'analyse
     capture_type = Column(String(20), nullable=False)
     
-    # Données brutes
-    raw_analysis = Column(JSON, nullable=False)
+    # Données brutes (sans les valeurs nulles ni analysis_meta, reprise dans les colonnes)
+    raw_analysis = Column(JSONB, nullable=False)
     
     # Références
     created_item_id = Column(UUID(as_uuid=True), ForeignKey('clothing_items.id', ondelete='SET NULL'))
     created_look_id = Column(UUID(as_uuid=True), ForeignKey('outfit_looks.id', ondelete='SET NULL'))
     
-    # Métadonnées
+    # Métadonnées (journal de performance de l'appel au modèle)
     analysis_duration_ms = Column(Integer)
-    model_used = Column(String(50), default='gpt-4o')
+    model_used = Column(String(50))
+    prompt_tokens = Column(Integer)
+    completion_tokens = Column(Integer)
     confidence_score = Column(Numeric(3, 2))
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relations
     created_item = relationship("ClothingItem", back_populates="analysis_history")
-    created_look = relationship("OutfitLook", back_populates="analysis_history")
\ No newline at end of file
+    created_look = relationship("OutfitLook", back_populates="analysis_history")
+
+
+class WardrobeVersion(Base):
+    __tablename__ = 'wardrobe_versions'
+    
+    # Compteur monotone par utilisateur, incrémenté à chaque écriture dans la garde-robe
+    user_id = Column(UUID(as_uuid=True), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    # Compteurs de port (wear_count, last_worn) : versionnés à part, sans invalider le reste (migration 015)
+    wear_version = Column(BigInteger, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class WardrobeTombstone(Base):
+    __tablename__ = 'wardrobe_tombstones'
+    
+    # Suppression physique d'une pièce ou d'une tenue, rejouée par la synchronisation incrémentale
+    user_id = Column(UUID(as_uuid=True), primary_key=True)
+    kind = Column(String(10), primary_key=True)  # 'item' | 'look'
+    entity_id = Column(UUID(as_uuid=True), primary_key=True)
+    change_seq = Column(BigInteger, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index('ix_wardrobe_tombstones_user_change', 'user_id', 'change_seq', 'entity_id'),
+    )
+
+
+class WardrobeStats(Base):
+    __tablename__ = 'wardrobe_stats'
+    
+    # Statistiques matérialisées par utilisateur, mises à jour par deltas (triggers, migration 012)
+    user_id = Column(UUID(as_uuid=True), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)  # Version de garde-robe au moment du calcul
+    total_items = Column(Integer, nullable=False, default=0)
+    favorite_items = Column(Integer, nullable=False, default=0)
+    total_looks = Column(Integer, nullable=False, default=0)
+    total_wears = Column(Integer, nullable=False, default=0)
+    by_type = Column(JSONB, nullable=False, default={})  # {"tshirt": 4, "jeans": 2}
+    by_color = Column(JSONB, nullable=False, default={})  # Couleurs principales
+    by_season = Column(JSONB, nullable=False, default={})
+    by_wear = Column(JSONB, nullable=False, default={})  # {"never": 3, "occasional": 5, "regular": 2, "frequent": 1}
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class IdempotencyKey(Base):
+    __tablename__ = 'idempotency_keys'
+    
+    # Réponse de la première requête portant un en-tête Idempotency-Key (services/idempotency.py)
+    user_id = Column(UUID(as_uuid=True), primary_key=True)
+    scope = Column(String(50), primary_key=True)  # Endpoint concerné, ex: "wardrobe.save"
+    key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    status = Column(String(20), nullable=False, default='in_progress')  # in_progress | completed
+    response_status = Column(Integer)
+    response_body = Column(JSONB)
+    locked_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class GeocodedCity(Base):
+    __tablename__ = 'geocoded_cities'
+    
+    # Cache persistant du géocodage des villes (services/weather.py)
+    query = Column(String(200), primary_key=True)  # Recherche normalisée : "ville|pays"
+    name = Column(String, nullable=False)
+    country = Column(String)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    timezone = Column(String(64))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class DailyRecommendation(Base):
+    __tablename__ = 'daily_recommendations'
+    
+    # Dernière demande de recommandation de l'utilisateur (contexte du précalcul nocturne)
+    user_id = Column(UUID(as_uuid=True), primary_key=True)
+    city = Column(String)
+    country_code = Column(String(2))
+    latitude = Column(Float)
+    longitude = Column(Float)
+    current_season = Column(String(20))
+    mode = Column(String(10))
+    last_requested_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    
+    # Recommandation précalculée (modules/recommendations/precompute.py)
+    input_key = Column(String(64))  # Signature des entrées hors exclusions (services/recommendation_cache.py)
+    result = Column(JSONB)
+    valid_until = Column(DateTime(timezone=True))  # Minuit, heure locale de la ville
+    computed_at = Column(DateTime(timezone=True))
+
+
+class RecommendationHistoryEntry(Base):
+    __tablename__ = 'recommendation_history'
+    
+    # Dernières tenues recommandées (services/recommendation_history.py)
+    user_id = Column(UUID(as_uuid=True), primary_key=True)
+    digests = Column(LargeBinary, nullable=False)  # Empreintes de 8 octets, de la plus ancienne à la plus récente
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,7 +1,7 @@
 """
 Application principale - Architecture modulaire
 """
-from fastapi import FastAPI, Request, UploadFile, File, Depends
+from fastapi import FastAPI, BackgroundTasks, Request, UploadFile, File, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Optional
 from uuid import UUID
@@ -14,6 +14,13 @@ from modules.recommendations import router as recommendations_router
 # Import de la configuration
 from core.config import settings
 from core.database import get_db
+from database.connection import engine, SessionLocal
+from services.wardrobe_service import start_wardrobe_cache_listener, stop_wardrobe_cache_listener
+from services.wear_tracker import start_wear_flusher, stop_wear_flusher
+from services.analysis_history import start_analysis_log_flusher, stop_analysis_log_flusher
+from services.weather import close_http_client
+from services.weather_prefetch import start_weather_prefetcher, stop_weather_prefetcher
+from modules.recommendations.weather import weather_service
 
 # Créer l'application FastAPI
 app = FastAPI(
@@ -47,6 +54,28 @@ app.include_router(
     prefix=f"{settings.API_PREFIX}",
 )
 
+# Cycle de vie des workers
+@app.on_event("startup")
+async def startup():
+    # Invalidation inter-workers du cache de garde-robe (LISTEN/NOTIFY)
+    start_wardrobe_cache_listener(engine)
+    # Écriture groupée des ports (write-behind)
+    start_wear_flusher(SessionLocal)
+    # Historique des analyses écrit par lots, hors des requêtes
+    start_analysis_log_flusher(SessionLocal)
+    # Prévisions des villes actives gardées à jour avant le pic du matin
+    start_weather_prefetcher(weather_service)
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Dernier vidage des ports en attente avant l'arrêt
+    stop_wear_flusher()
+    stop_analysis_log_flusher()
+    stop_wardrobe_cache_listener()
+    # Connexions du client météo partagé
+    await stop_weather_prefetcher()
+    await close_http_client()
+
 # Routes de base
 @app.get("/")
 async def root():
@@ -71,41 +100,47 @@ async def analyze_outfit_legacy(
     return await analyze_outfit(file=file, item_type=item_type)
 
 @app.post("/daily-recommendations")
-async def daily_recommendations_legacy(request: Request):
+async def daily_recommendations_legacy(request: Request, background_tasks: BackgroundTasks, db = Depends(get_db)):
     """Route de compatibilité - redirige vers le nouveau endpoint"""
     from modules.recommendations.router import DailyRecommendationRequest, get_daily_recommendations
     # Récupérer le body de la requête
     body = await request.json()
     # Convertir le dict en modèle Pydantic
     recommendation_request = DailyRecommendationRequest(**body)
-    return await get_daily_recommendations(recommendation_request)
+    return await get_daily_recommendations(recommendation_request, background_tasks=background_tasks, db=db)
 
 @app.post("/save-clothing")
-async def save_clothing_legacy(request: Request, db = Depends(get_db)):
+async def save_clothing_legacy(
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255),
+    db = Depends(get_db)
+):
     """Route de compatibilité - redirige vers le nouveau endpoint"""
     from modules.wardrobe.router import save_clothing, SaveClothingRequest
     body = await request.json()
     save_request = SaveClothingRequest(**body)
-    return await save_clothing(request=save_request, db=db)
+    return await save_clothing(request=save_request, idempotency_key=idempotency_key, db=db)
 
 @app.get("/wardrobe/{user_id}/pieces")
 async def get_user_pieces_legacy(
     user_id: UUID,
     piece_type: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
     db = Depends(get_db)
 ):
     """Route de compatibilité - redirige vers le nouveau endpoint"""
     from modules.wardrobe.router import get_user_pieces
-    return await get_user_pieces(user_id=user_id, piece_type=piece_type, db=db)
+    return await get_user_pieces(user_id=user_id, piece_type=piece_type, if_none_match=if_none_match, db=db)
 
 @app.get("/wardrobe/{user_id}/looks")
 async def get_user_looks_legacy(
     user_id: UUID,
+    if_none_match: Optional[str] = Header(None),
     db = Depends(get_db)
 ):
     """Route de compatibilité - redirige vers le nouveau endpoint"""
     from modules.wardrobe.router import get_user_looks
-    return await get_user_looks(user_id=user_id, db=db)
+    return await get_user_looks(user_id=user_id, if_none_match=if_none_match, db=db)
 
 @app.put("/wardrobe/items/{item_id}")
 async def update_clothing_item_legacy(
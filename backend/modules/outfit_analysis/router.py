@@ -2,18 +2,25 @@
 Routes pour l'analyse de tenues
 """
 from fastapi import APIRouter, UploadFile, File, HTTPException
+from pydantic import TypeAdapter
 from typing import Optional, Union
 from PIL import Image
+import asyncio
 import io
 import base64
 
 from schemas.clothing_analysis import SinglePieceResponse, CompleteLookResponse
+from core.serialization import FastJSONResponse
 from .service import OutfitAnalysisService
 
 router = APIRouter(prefix="/outfit-analysis", tags=["outfit-analysis"])
 service = OutfitAnalysisService()
 
-@router.post("/analyze", response_model=Union[SinglePieceResponse, CompleteLookResponse])
+# Le résultat est déjà un modèle validé : on l'encode directement, sans re-validation
+AnalysisResult = Union[SinglePieceResponse, CompleteLookResponse]
+analysis_adapter = TypeAdapter(AnalysisResult)
+
+@router.post("/analyze", response_model=AnalysisResult)
 async def analyze_outfit(
     file: UploadFile = File(...), 
     item_type: Optional[str] = None
@@ -39,10 +46,10 @@ async def analyze_outfit(
         # Déterminer si c'est une pièce unique ou une tenue complète
         is_single_piece = (item_type == "clothing")
         
-        # Utiliser le service pour analyser l'image
-        result = service.analyze_image(base64_image, is_single_piece)
+        # Appel au modèle bloquant : hors de la boucle d'événements
+        result = await asyncio.to_thread(service.analyze_image, base64_image, is_single_piece)
         
-        return result
+        return FastJSONResponse(content=analysis_adapter.dump_json(result))
         
     except Exception as e:
         print(f"Erreur détaillée dans analyze_outfit: {type(e).__name__}: {str(e)}")
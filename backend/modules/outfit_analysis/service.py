@@ -2,6 +2,7 @@
 Service d'analyse de tenues
 """
 from services.clothing_analyzer import ClothingAnalyzer
+from services.analysis_history import sign_analysis
 from openai import OpenAI
 from core.config import settings
 
@@ -13,5 +14,7 @@ class OutfitAnalysisService:
         self.analyzer = ClothingAnalyzer(self.client)
     
     def analyze_image(self, base64_image: str, is_single_piece: bool):
-        """Analyse une image de vêtement ou tenue"""
-        return self.analyzer.analyze_image(base64_image, is_single_piece)
\ No newline at end of file
+        """Analyse une image de vêtement ou tenue et signe les mesures de l'appel (analysis_token)"""
+        result = self.analyzer.analyze_image(base64_image, is_single_piece)
+        sign_analysis(result, settings.ANALYSIS_TOKEN_SECRET)
+        return result
@@ -0,0 +1,69 @@
+"""
+Précalcul des recommandations du jour : branchement sur la base
+
+Le parcours (créneau, concurrence, métriques) est dans
+services/recommendation_precompute.py ; ici, la lecture des utilisateurs
+actifs, de leur garde-robe et l'écriture des recommandations stockées.
+"""
+from datetime import datetime
+from typing import Optional
+
+from core.config import settings
+from services.recommendation_precompute import PrecomputeMetrics, RecommendationPrecomputer
+from .router import DailyRecommendationRequest
+from .service import RecommendationService, load_wardrobe_candidates
+from .store import list_active_profiles, load_recommendation_history, save_stored_recommendation
+
+
+class DatabasePrecomputeStore:
+    """Une session par opération"""
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+
+    def load(self, user_id):
+        db = self.session_factory()
+        try:
+            wardrobe_version, items = load_wardrobe_candidates(db, user_id)
+            return wardrobe_version, items, load_recommendation_history(db, user_id, settings.RECOMMENDATION_HISTORY_SIZE)
+        finally:
+            db.close()
+
+    def save(self, user_id, key, result, valid_until: datetime) -> None:
+        db = self.session_factory()
+        try:
+            save_stored_recommendation(db, user_id, key, result, valid_until)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+async def precompute_daily_recommendations(
+    session_factory,
+    service: RecommendationService,
+    concurrency: int = 8,
+    active_days: int = 14,
+    start_hour: int = 3,
+    end_hour: int = 7,
+    limit: int = 100000,
+    dry_run: bool = False,
+    now: Optional[datetime] = None,
+) -> PrecomputeMetrics:
+    """Un passage de précalcul sur les utilisateurs actifs"""
+    db = session_factory()
+    try:
+        profiles = list_active_profiles(db, active_days, limit)
+    finally:
+        db.close()
+    print(f"🌙 {len(profiles)} utilisateurs actifs ces {active_days} derniers jours")
+
+    precomputer = RecommendationPrecomputer(
+        service, DatabasePrecomputeStore(session_factory), DailyRecommendationRequest,
+        concurrency=concurrency,
+        start_hour=start_hour,
+        end_hour=end_hour,
+        dry_run=dry_run,
+    )
+    return await precomputer.run(profiles, now)
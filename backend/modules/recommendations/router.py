@@ -1,11 +1,21 @@
 """
 Routes pour les recommandations quotidiennes
 """
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Literal, Optional
+from uuid import UUID
 
-from .service import RecommendationService
+from core.config import settings
+from core.database import get_db
+from database.connection import SessionLocal
+from .service import RecommendationService, StaleWardrobeVersion, WeatherUnavailable, load_wardrobe_candidates
+from .store import (
+    load_recommendation_history,
+    load_stored_recommendation,
+    record_recommendations,
+    record_request_profile,
+)
 
 router = APIRouter(prefix="/recommendations", tags=["recommendations"])
 service = RecommendationService()
@@ -13,21 +23,56 @@ service = RecommendationService()
 class DailyRecommendationRequest(BaseModel):
     city: Optional[str] = "Paris"
     country_code: Optional[str] = "FR"
-    wardrobe_items: List[Dict[str, Any]] = []
+    # Position de l'appareil (prioritaire sur city) : ville la plus proche résolue hors ligne
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+    wardrobe_items: List[Dict[str, Any]] = []  # Ancien format : garde-robe complète envoyée par le client
+    # Recommandé : garde-robe chargée, projetée et élaguée côté serveur
+    user_id: Optional[UUID] = None
+    wardrobe_version: Optional[int] = None  # Version synchronisée par le client (/wardrobe/{user_id}/changes)
     user_needs: Optional[str] = None
     current_season: Optional[str] = None
     recently_worn_ids: List[str] = []
     recently_recommended_ids: List[str] = []
     recently_recommended_combos: List[str] = []
+    # "local" : choix sans appel au modèle (par défaut : RECOMMENDATION_MODE)
+    mode: Optional[Literal["auto", "local"]] = None
+    # Cache des recommandations du jour : refresh recalcule et remplace, use_cache=False l'ignore
+    refresh: bool = False
+    use_cache: bool = True
 
 @router.post("/daily")
-async def get_daily_recommendations(request: DailyRecommendationRequest):
+async def get_daily_recommendations(request: DailyRecommendationRequest, background_tasks: BackgroundTasks,
+                                    db = Depends(get_db)):
     """Génère des recommandations quotidiennes basées sur la météo et la garde-robe"""
     try:
-        result = await service.get_daily_recommendations(request)
+        wardrobe_version, load_stored, load_history = None, None, None
+        if request.user_id and not request.wardrobe_items:
+            try:
+                wardrobe_version, request.wardrobe_items = load_wardrobe_candidates(db, request.user_id, request.wardrobe_version)
+            except StaleWardrobeVersion as e:
+                # La copie du client est périmée : il doit se synchroniser avant de référencer sa garde-robe
+                raise HTTPException(status_code=409, detail={
+                    "message": "Version de garde-robe périmée, synchronisation nécessaire",
+                    "current_version": e.current_version
+                })
+            # Recommandation précalculée (lue seulement si le cache du worker ne l'a pas)
+            load_stored = lambda: load_stored_recommendation(db, request.user_id)
+            # Tenues déjà recommandées, écartées de la génération (lu seulement si la recommandation est calculée)
+            load_history = lambda: load_recommendation_history(db, request.user_id, settings.RECOMMENDATION_HISTORY_SIZE)
+            # Contexte de la demande pour le précalcul nocturne, enregistré après la réponse
+            background_tasks.add_task(record_request_profile, SessionLocal, request.user_id, request)
+        
+        result = await service.get_daily_recommendations(request, wardrobe_version, load_stored, load_history)
+        if request.user_id and wardrobe_version is not None:
+            # Tenue servie ajoutée à l'historique, après la réponse
+            background_tasks.add_task(record_recommendations, SessionLocal, request.user_id, result,
+                                      settings.RECOMMENDATION_HISTORY_SIZE)
         return result
     except HTTPException:
         raise
+    except WeatherUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         print(f"Erreur dans daily_recommendations: {type(e).__name__}: {str(e)}")
         import traceback
@@ -1,42 +1,308 @@
 """
 Service de recommandations
 """
+import asyncio
 import json
 import httpx
 from openai import OpenAI
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from uuid import UUID
 
+from core.cache import LRUCache
 from core.config import settings
-from .weather import WeatherService
+from services.outfit_engine import OutfitCandidate, generate_outfits
+from services.prompt_encoding import PromptWardrobe, encode_options
+from services.recommendation_cache import (
+    RecommendationKey,
+    conflicts_with_exclusions,
+    daytime_weather,
+    is_raining,
+    recommendation_key,
+    seconds_until_local_midnight,
+)
+from services.recommendation_history import RecommendationHistory, recommendation_outfit_key
+from services.recommendation_rules import prefilter_wardrobe
+from services.wardrobe_candidates import prune_candidates, wardrobe_items_from_snapshot
+from services.wardrobe_service import WardrobeService
+from services.weather import WeatherService
+from .weather import weather_service as default_weather_service
+
+# Prompt système de la recherche complète dans la garde-robe : rôle et règles statiques,
+# construit une fois (préfixe identique d'une requête à l'autre)
+WARDROBE_SYSTEM_PROMPT = """Tu es un styliste personnel expert qui recommande des tenues basées sur:
+1. La météo actuelle et prévue
+2. Les vêtements disponibles dans la garde-robe
+3. Les besoins spécifiques de l'utilisateur (si fournis)
+4. La saison actuelle
+
+Tu dois analyser la garde-robe et recommander les meilleures combinaisons ou pièces uniques.
+Priorise les tenues complètes (outfits) quand c'est pertinent.
+
+RÈGLES IMPORTANTES ET OBLIGATOIRES:
+1. COHÉRENCE MÉTÉO STRICTE - NE JAMAIS DÉROGER À CES RÈGLES:
+   - Si température >= 30°C: 
+     * INTERDITS: pulls, sweats, vestes chaudes, laine, cachemire, velours
+     * OBLIGATOIRES: t-shirts, chemises légères, shorts, robes légères, lin, coton léger
+   - Si température 20-29°C:
+     * INTERDITS: pulls épais, doudounes, manteaux, laine épaisse
+     * AUTORISÉS: chemises, t-shirts, pantalons légers, robes, cardigans légers
+   - Si température 10-19°C:
+     * AUTORISÉS: pulls légers, vestes, jeans, chemises manches longues
+   - Si température < 10°C:
+     * RECOMMANDÉS: pulls chauds, manteaux, écharpes, vestes chaudes
+   - Si pluie: privilégier imperméables ou résistants à l'eau
+2. VÉRIFIER que chaque pièce recommandée a des matières adaptées:
+   - Chaleur (>25°C): coton, lin, viscose, matières respirantes
+   - Froid (<15°C): laine, cachemire, polyester, matières chaudes
+3. NE JAMAIS recommander un pull/sweat/veste chaude si température > 25°C
+
+RÈGLES OBLIGATOIRES pour les recommandations:
+1. Si c'est une tenue complète (ligne TENUES) : recommande-la directement
+2. Si c'est une combinaison, elle DOIT être une tenue complète :
+   - SOIT : 1 haut (t-shirt, chemise, top, etc.) + 1 bas (pantalon, short, jupe, etc.)
+   - SOIT : 1 robe SEULE (car la robe compte comme haut + bas)
+   - Optionnel dans tous les cas : veste/cardigan, chaussures, accessoires
+3. JAMAIS recommander seulement des hauts ou seulement des bas
+4. Les combinaisons peuvent inclure 2-5 pièces selon le type
+
+COMPATIBILITÉ VESTIMENTAIRE - INTERDICTIONS ABSOLUES:
+- JAMAIS combiner une robe avec un t-shirt/chemise/top (une robe se porte seule ou avec veste)
+- JAMAIS combiner une robe avec un pantalon/short/jupe
+- Une robe peut SEULEMENT être combinée avec : veste, cardigan, chaussures, accessoires
+- JAMAIS superposer plusieurs bas ensemble (pantalon + short, jupe + pantalon, etc.)
+- JAMAIS combiner plusieurs pièces du même type sauf pour le layering de hauts
+- Si tu recommandes plusieurs hauts, assure-toi qu'ils sont compatibles pour le layering (ex: t-shirt sous chemise ouverte)
+
+Retourne UNIQUEMENT ce JSON:
+{"recommendations": [{"id": "id_du_vetement_ou_combinaison", "score": 95, "reason": "Pourquoi cette recommandation est parfaite pour aujourd'hui", "weather_adaptation": "OBLIGATOIRE: Expliquer précisément pourquoi ces vêtements sont adaptés à la température du jour (matières, coupe, épaisseur)", "style_tips": "Conseils de style supplémentaires"}]}
+
+IMPORTANT: 
+- L'id doit être un id de la garde-robe (p1, t2...)
+- Pour une combinaison, l'id est "combo-" suivi des ids de TOUTES ses pièces séparés par des tirets (ex: "combo-p1-p4-p7")
+- Une combinaison DOIT inclure au minimum un haut ET un bas (sauf si c'est une robe)
+- Le score doit refléter la pertinence (0-100)
+- EXACTEMENT 1 recommandation dans le tableau recommendations, pas plus
+- Si tu recommandes plusieurs hauts (ex: t-shirt + chemise), assure-toi qu'ils se complètent (layering)
+Réponds UNIQUEMENT avec un JSON valide."""
+
+# Candidats de recommandation par (utilisateur, version de garde-robe) : immuables, partagés
+candidates_cache = LRUCache(maxsize=settings.RECOMMENDATION_CANDIDATES_CACHE_SIZE)
+# Recommandations du jour par signature des entrées (services/recommendation_cache.py), jusqu'à minuit local
+recommendation_cache = LRUCache(maxsize=settings.RECOMMENDATION_CACHE_SIZE)
+
+class StaleWardrobeVersion(Exception):
+    """La version de garde-robe du client ne correspond plus à celle du serveur"""
+    
+    def __init__(self, current_version: int):
+        super().__init__(f"Version de garde-robe périmée (actuelle: {current_version})")
+        self.current_version = current_version
+
+class WeatherUnavailable(Exception):
+    """Ville inconnue ou météo indisponible (fournisseur en panne, rien en cache)"""
+
+def load_wardrobe_candidates(db, user_id: UUID, expected_version: Optional[int] = None) -> Tuple[int, List[Dict[str, Any]]]:
+    """Candidats de recommandation chargés côté serveur : (version, éléments au format client).
+
+    S'appuie sur l'instantané de garde-robe en cache (colonnes projetées,
+    pièces actives uniquement) ; la conversion est mise en cache par version
+    (la liste complète : l'élagage par catégorie dépend de la météo et se fait
+    après le pré-filtre). La liste retournée est partagée et ne doit pas être
+    modifiée.
+    Lève StaleWardrobeVersion si expected_version est périmée.
+    """
+    snapshot = WardrobeService(db).get_wardrobe_snapshot(user_id)
+    if expected_version is not None and expected_version != snapshot.version:
+        raise StaleWardrobeVersion(snapshot.version)
+    
+    key = (user_id, snapshot.version)
+    items = candidates_cache.get(key)
+    if items is None:
+        items = wardrobe_items_from_snapshot(snapshot)
+        candidates_cache.set(key, items)
+    return snapshot.version, items
 
 class RecommendationService:
     """Service pour générer des recommandations de tenues"""
     
-    def __init__(self):
+    def __init__(self, weather_service: Optional[WeatherService] = None):
         self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        self.weather_service = WeatherService()
+        self.weather_service = weather_service or default_weather_service
+    
+    async def get_daily_recommendations(self, request, wardrobe_version: Optional[int] = None,
+                                        load_stored: Optional[Callable[[], Optional[Dict[str, Any]]]] = None,
+                                        load_history: Optional[Callable[[], RecommendationHistory]] = None) -> Dict[str, Any]:
+        """Génère des recommandations quotidiennes.
+        
+        wardrobe_version : garde-robe chargée côté serveur ; load_stored : lecture de la
+        recommandation précalculée de l'utilisateur (servie si ses entrées sont toujours valables) ;
+        load_history : lecture de son historique de recommandations (seulement si elle est calculée).
+        """
+        weather, weather_description, weather_icon, mode, key = await self._prepare(request, wardrobe_version)
+        if request.use_cache and not request.refresh:
+            cached = recommendation_cache.get(key)
+            stored = load_stored() if cached is None and load_stored is not None else None
+            if stored is not None and self._stored_is_valid(stored, key, request):
+                # Recommandation précalculée avant le pic du matin
+                cached = stored["result"]
+                recommendation_cache.set(key, cached, ttl=seconds_until_local_midnight(weather["timezone"]))
+            if cached is not None:
+                # Même recommandation pour la journée, météo du moment
+                return {**cached, "weather": self._weather_summary(weather, weather_description, weather_icon), "cached": True}
+        
+        history = load_history() if load_history is not None else None
+        result = await self._compute_recommendations(request, weather, weather_description, weather_icon, mode, history)
+        
+        if request.use_cache:
+            ttl = seconds_until_local_midnight(weather["timezone"])
+            if mode != "local" and result["mode"] == "local":
+                # Choix local de secours (modèle indisponible) : le modèle sera retenté plus tôt
+                ttl = min(ttl, settings.RECOMMENDATION_DEGRADED_CACHE_TTL)
+            recommendation_cache.set(key, result, ttl=ttl)
+        return {**result, "cached": False}
     
-    async def get_daily_recommendations(self, request) -> Dict[str, Any]:
-        """Génère des recommandations quotidiennes"""
-        # Récupérer la météo (simulée pour l'instant)
-        weather = await self._get_weather_data(request.city, request.country_code)
+    async def precompute(self, request, wardrobe_version: int, current_input_key: Optional[str] = None,
+                         history: Optional[RecommendationHistory] = None):
+        """Recommandation du jour calculée à l'avance : (clé des entrées, résultat, validité en secondes).
         
-        # Interpréter les conditions météo
+        Retourne None si current_input_key correspond déjà aux entrées (rien à recalculer).
+        """
+        weather, weather_description, weather_icon, mode, key = await self._prepare(request, wardrobe_version)
+        if current_input_key == key.digest(with_exclusions=False):
+            return None
+        # Calcul pour la journée (prévision), pas pour la météo de la nuit
+        result = await self._compute_recommendations(
+            request, daytime_weather(weather), weather_description, weather_icon, mode, history
+        )
+        result["precomputed"] = True
+        
+        ttl = seconds_until_local_midnight(weather["timezone"])
+        if mode != "local" and result["mode"] == "local":
+            ttl = min(ttl, settings.RECOMMENDATION_DEGRADED_CACHE_TTL)
+        return key, result, ttl
+    
+    @staticmethod
+    def _stored_is_valid(stored: Dict[str, Any], key: RecommendationKey, request) -> bool:
+        """Mêmes entrées (hors exclusions) et aucun élément exclu depuis le précalcul"""
+        return stored["input_key"] == key.digest(with_exclusions=False) and not conflicts_with_exclusions(
+            stored["result"], request.recently_worn_ids,
+            request.recently_recommended_ids, request.recently_recommended_combos,
+        )
+    
+    async def _prepare(self, request, wardrobe_version: Optional[int]):
+        """Météo (prévision en cache le plus souvent), son interprétation et la clé des entrées"""
+        weather = await self._get_weather_data(request.city, request.country_code, request.latitude, request.longitude)
         weather_description = self._interpret_weather_code(weather["current"]["weather_code"])
         weather_icon = self._get_weather_icon(weather["current"]["weather_code"])
         
-        # Créer le prompt pour GPT-4
+        mode = request.mode or settings.RECOMMENDATION_MODE
+        key = recommendation_key(
+            weather, request.wardrobe_items,
+            user_id=request.user_id,
+            wardrobe_version=wardrobe_version,
+            season=request.current_season,
+            user_needs=request.user_needs,
+            recently_worn_ids=request.recently_worn_ids,
+            recently_recommended_ids=request.recently_recommended_ids,
+            recently_recommended_combos=request.recently_recommended_combos,
+            mode=mode,
+        )
+        return weather, weather_description, weather_icon, mode, key
+    
+    async def _compute_recommendations(self, request, weather, weather_description: str, weather_icon: str,
+                                       mode: str, history: Optional[RecommendationHistory] = None) -> Dict[str, Any]:
+        """Pré-filtre, génération locale des tenues puis choix (modèle ou local)"""
+        # Retirer localement les pièces inéligibles (météo, saison, portées récemment)
+        prefilter = prefilter_wardrobe(
+            request.wardrobe_items,
+            temperature=weather["current"]["temperature"],
+            raining=is_raining(weather),
+            season=request.current_season,
+            recently_worn_ids=request.recently_worn_ids,
+        )
+        print(f"🧹 Pré-filtre: {prefilter.summary()}")
+        # Nombre de candidats par catégorie limité parmi les éléments éligibles, adaptés à la météo d'abord
+        eligible = prune_candidates(
+            prefilter.items,
+            settings.RECOMMENDATION_MAX_PER_CATEGORY,
+            settings.RECOMMENDATION_MAX_LOOKS,
+            preferred=prefilter.preferred,
+        )
+        
+        # Tenues déjà recommandées : historique serveur et ids envoyés par le client
+        excluded = (history or RecommendationHistory(0)).with_outfit_ids(
+            [*request.recently_recommended_ids, *request.recently_recommended_combos]
+        )
+        
+        # Combinaisons valides générées et notées localement, hors tenues déjà recommandées
+        candidates = generate_outfits(
+            eligible,
+            temperature=weather["current"]["temperature"],
+            user_needs=request.user_needs,
+            exclude=excluded,
+            top_k=settings.RECOMMENDATION_TOP_K,
+        )
+        
+        if not candidates:
+            # Aucune tenue complète réalisable localement : le modèle cherche dans la garde-robe (hors mode local)
+            result = None
+            if mode != "local":
+                try:
+                    result = await self._recommend_from_wardrobe(request, weather, weather_description, weather_icon, eligible)
+                    result["mode"] = "llm"
+                    for recommendation in result.get("recommendations") or []:
+                        if recommendation_outfit_key(recommendation) in excluded:
+                            recommendation["was_recently_recommended"] = True
+                except Exception as e:
+                    print(f"⚠️ Recherche par le modèle indisponible, réponse locale: {type(e).__name__}: {e}")
+            if result is None:
+                result = self._no_outfit_result(weather, weather_description, weather_icon)
+        else:
+            items_by_id = {str(item.get("id")): item for item in eligible}
+            # Pièces des tenues enregistrées absentes des candidats (élaguées) : description de la tenue
+            for item in eligible:
+                for piece in item.get("pieces") or []:
+                    items_by_id.setdefault(str(piece.get("id")), piece)
+            for candidate in candidates:
+                for item_id in candidate.item_ids:
+                    items_by_id.setdefault(item_id, {"id": item_id})
+            
+            recommendation, chosen_by = None, "local"
+            if mode != "local":
+                try:
+                    recommendation = await self._rerank_with_llm(
+                        weather, weather_description, request.current_season, request.user_needs, candidates, items_by_id
+                    )
+                    chosen_by = "llm"
+                except Exception as e:
+                    print(f"⚠️ Choix par le modèle indisponible, recommandation locale: {type(e).__name__}: {e}")
+            if recommendation is None:
+                recommendation = self._local_recommendation(candidates[0], items_by_id, weather)
+            # Pièces de la tenue retenue (contrôle des exclusions d'une recommandation précalculée)
+            recommendation["item_ids"] = list(next(c for c in candidates if c.id == recommendation["id"]).item_ids)
+            
+            result = {
+                "weather": self._weather_summary(weather, weather_description, weather_icon),
+                "recommendations": [recommendation],
+                "mode": chosen_by,
+            }
+        
+        result["candidates_considered"] = len(candidates)
+        result["prefilter"] = prefilter.summary()
+        return result
+    
+    async def _recommend_from_wardrobe(self, request, weather, weather_description, weather_icon, wardrobe_items) -> Dict[str, Any]:
+        """Recherche complète par le modèle dans la garde-robe pré-filtrée"""
+        # Pièces portées récemment déjà retirées par le pré-filtre ; ids remplacés par des alias courts
+        wardrobe = PromptWardrobe(wardrobe_items)
         system_prompt = self._create_system_prompt()
         user_prompt = self._create_user_prompt(
-            weather, weather_description, weather_icon,
-            request.current_season, request.user_needs,
-            request.recently_worn_ids,
-            request.recently_recommended_ids, request.recently_recommended_combos,
-            request.wardrobe_items
+            weather, weather_description, request.current_season, request.user_needs, wardrobe
         )
         
-        # Appeler GPT-4
-        response = self.client.chat.completions.create(
+        # Appel au modèle hors de la boucle d'événements, borné comme le choix parmi les candidates
+        client = self.client.with_options(timeout=settings.RECOMMENDATION_LLM_TIMEOUT, max_retries=0)
+        response = await asyncio.to_thread(
+            client.chat.completions.create,
             model=settings.AI_MODEL,
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -54,8 +320,94 @@ class RecommendationService:
             result["recommendations"] = result["recommendations"][:1]
             print("Avertissement: Plus d'une recommandation générée, limité à 1")
         
+        # Alias remis en correspondance avec les ids réels ; météo du jour fournie localement
+        for recommendation in result.get("recommendations") or []:
+            # Pièces de la tenue retenue (contrôle des exclusions d'une recommandation précalculée)
+            recommendation["item_ids"] = wardrobe.item_ids(recommendation.get("id"))
+            recommendation["id"] = wardrobe.resolve(recommendation.get("id"))
+        result["weather"] = self._weather_summary(weather, weather_description, weather_icon)
         return result
     
+    async def _rerank_with_llm(self, weather, weather_description, current_season, user_needs,
+                               candidates: List[OutfitCandidate], items_by_id: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Le modèle choisit parmi les K meilleurs candidats locaux et rédige l'explication"""
+        # Pièces des candidates décrites une fois, candidates désignées par o1, o2...
+        piece_ids = dict.fromkeys(item_id for candidate in candidates for item_id in candidate.item_ids)
+        wardrobe = PromptWardrobe([{**items_by_id[item_id], "isLook": False} for item_id in piece_ids])
+        options = encode_options(wardrobe, ((candidate.score, candidate.item_ids) for candidate in candidates))
+        user_prompt = f"""MÉTÉO À {weather['city']}: {weather_description}, {weather['current']['temperature']}°C (max {weather['daily']['max_temp']}°C / min {weather['daily']['min_temp']}°C), précipitations {weather['current']['precipitation']}mm
+SAISON: {current_season or 'all_season'}
+{f"BESOINS SPÉCIFIQUES: {user_needs}" if user_needs else ""}
+
+TENUES CANDIDATES (toutes valides pour la météo et la composition ; champs séparés par |, tags numérotés):
+{options}
+{wardrobe.text}
+
+Choisis LA meilleure tenue parmi les candidates. Retourne UNIQUEMENT ce JSON:
+{{"id": "id de l'option (o1, o2...)", "score": 0-100, "reason": "Pourquoi cette tenue est parfaite aujourd'hui", "weather_adaptation": "Pourquoi ces pièces sont adaptées à {weather['current']['temperature']}°C (matières, coupe, épaisseur)", "style_tips": "Conseils de style"}}"""
+        
+        client = self.client.with_options(timeout=settings.RECOMMENDATION_LLM_TIMEOUT, max_retries=0)
+        response = await asyncio.to_thread(
+            client.chat.completions.create,
+            model=settings.AI_MODEL,
+            messages=[
+                {"role": "system", "content": "Tu es un styliste personnel expert. Réponds UNIQUEMENT avec un JSON valide."},
+                {"role": "user", "content": user_prompt}
+            ],
+            max_tokens=400,
+            temperature=settings.AI_TEMPERATURE
+        )
+        choice = self._parse_ai_response(response.choices[0].message.content)
+        if isinstance(choice.get("recommendations"), list) and choice["recommendations"]:
+            choice = choice["recommendations"][0]
+        by_option = {f"o{number}": candidate.id for number, candidate in enumerate(candidates, 1)}
+        choice["id"] = by_option.get(str(choice.get("id")).strip(), choice.get("id"))
+        if choice["id"] not in by_option.values():
+            raise ValueError(f"Tenue inconnue choisie par le modèle: {choice.get('id')}")
+        return choice
+    
+    def _local_recommendation(self, candidate: OutfitCandidate, items_by_id: Dict[str, Dict[str, Any]], weather) -> Dict[str, Any]:
+        """Recommandation entièrement locale : meilleur candidat et explication générée à partir du score"""
+        pieces = [items_by_id[item_id] for item_id in candidate.item_ids]
+        names = ", ".join(piece.get("name") or piece.get("category") or "pièce" for piece in pieces)
+        materials = sorted({material for piece in pieces for material in piece.get("materials") or []})
+        features = candidate.features
+        
+        reason = f"Tenue {'enregistrée' if candidate.is_look else 'composée'} : {names}."
+        if "color" in features:
+            reason += f" Harmonie des couleurs {round(features['color'] * 100)}%, styles cohérents à {round(features['style'] * 100)}%."
+        return {
+            "id": candidate.id,
+            "score": candidate.score,
+            "reason": reason,
+            "weather_adaptation": (
+                f"Adéquation à {weather['current']['temperature']}°C : {round(features['weather'] * 100)}%"
+                + (f" ({', '.join(materials)})." if materials else ".")
+            ),
+            "style_tips": "Misez sur des accessoires sobres pour laisser les pièces principales ressortir.",
+        }
+    
+    def _no_outfit_result(self, weather, weather_description: str, weather_icon: str) -> Dict[str, Any]:
+        """Réponse locale lorsqu'aucune tenue complète n'est réalisable avec les pièces éligibles"""
+        return {
+            "weather": self._weather_summary(weather, weather_description, weather_icon),
+            "recommendations": [],
+            "message": "Aucune tenue complète adaptée à la météo du jour dans votre garde-robe.",
+            "mode": "local",
+        }
+    
+    def _weather_summary(self, weather, weather_description: str, weather_icon: str) -> Dict[str, Any]:
+        return {
+            "temp": weather["current"]["temperature"],
+            "condition": weather_description.lower(),
+            "description": weather_description,
+            "icon": weather_icon,
+            "humidity": weather["current"]["humidity"],
+            "wind": weather["current"]["wind_speed"],
+            "sunrise": weather["sunrise"],
+            "sunset": weather["sunset"]
+        }
+    
     async def match_outfit(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """Trouve les meilleures combinaisons pour un article"""
         item = request.get("item", {})
@@ -101,24 +453,20 @@ class RecommendationService:
         
         return {"suggestions": response.choices[0].message.content}
     
-    async def _get_weather_data(self, city: str, country_code: str) -> Dict[str, Any]:
-        """Récupère les données météo (simulées pour l'instant)"""
-        # TODO: Connecter l'API météo plus tard
-        return {
-            "city": city,
-            "current": {
-                "temperature": 35,
-                "humidity": 65,
-                "precipitation": 0,
-                "wind_speed": 15,
-                "weather_code": 0  # Ciel dégagé
-            },
-            "daily": {
-                "max_temp": 37,
-                "min_temp": 28,
-                "precipitation": 0
-            }
-        }
+    async def _get_weather_data(self, city: str, country_code: str,
+                                latitude: Optional[float] = None, longitude: Optional[float] = None) -> Dict[str, Any]:
+        """Récupère les données météo (lève WeatherUnavailable si elles ne sont pas disponibles)"""
+        if latitude is not None and longitude is not None:
+            # Position de l'appareil : ville la plus proche résolue hors ligne
+            location = self.weather_service.locate(latitude, longitude)
+            weather = await self.weather_service.get_location_weather(location)
+            city = location.name
+        else:
+            city = city or settings.DEFAULT_CITY
+            weather = await self.weather_service.get_weather_data(city, country_code or settings.DEFAULT_COUNTRY_CODE)
+        if weather is None:
+            raise WeatherUnavailable(f"Météo indisponible pour {city}")
+        return weather
     
     def _interpret_weather_code(self, code: int) -> str:
         """Interprète le code météo"""
@@ -168,22 +516,12 @@ class RecommendationService:
             return "partly-sunny"
     
     def _create_system_prompt(self) -> str:
-        """Crée le prompt système pour GPT-4"""
-        return """Tu es un styliste personnel expert qui recommande des tenues basées sur:
-1. La météo actuelle et prévue
-2. Les vêtements disponibles dans la garde-robe
-3. Les besoins spécifiques de l'utilisateur (si fournis)
-4. La saison actuelle
-
-Tu dois analyser la garde-robe et recommander les meilleures combinaisons ou pièces uniques.
-Priorise les tenues complètes (outfits) quand c'est pertinent.
-Réponds UNIQUEMENT avec un JSON valide."""
+        """Prompt système : rôle et règles statiques (WARDROBE_SYSTEM_PROMPT)"""
+        return WARDROBE_SYSTEM_PROMPT
     
-    def _create_user_prompt(self, weather, weather_description, weather_icon,
-                           current_season, user_needs, recently_worn_ids,
-                           recently_recommended_ids,
-                           recently_recommended_combos, wardrobe_items) -> str:
-        """Crée le prompt utilisateur pour GPT-4"""
+    def _create_user_prompt(self, weather, weather_description, current_season, user_needs,
+                            wardrobe: PromptWardrobe) -> str:
+        """Crée le prompt utilisateur : conditions du jour et garde-robe encodée"""
         return f"""Conditions actuelles:
 MÉTÉO À {weather['city']}:
 - {weather_description}
@@ -197,84 +535,10 @@ SAISON: {current_season or 'all_season'}
 
 {f"BESOINS SPÉCIFIQUES: {user_needs}" if user_needs else ""}
 
-VÊTEMENTS RÉCEMMENT PORTÉS (à éviter):
-{json.dumps(recently_worn_ids) if recently_worn_ids else "Aucun"}
-
-VÊTEMENTS ET COMBOS RÉCEMMENT RECOMMANDÉS (à éviter absolument):
-Items: {json.dumps(recently_recommended_ids) if recently_recommended_ids else "Aucun"}
-Combos: {json.dumps(recently_recommended_combos) if recently_recommended_combos else "Aucun"}
-
-GARDE-ROBE DISPONIBLE:
-{json.dumps(wardrobe_items, ensure_ascii=False)}
+GARDE-ROBE DISPONIBLE (une ligne par élément, champs séparés par |, listes par des virgules, tags numérotés):
+{wardrobe.text}
 
-RÈGLES IMPORTANTES ET OBLIGATOIRES:
-1. ÉVITER absolument les vêtements avec les IDs dans recently_worn_ids
-2. COHÉRENCE MÉTÉO STRICTE - NE JAMAIS DÉROGER À CES RÈGLES:
-   - Si température >= 30°C: 
-     * INTERDITS: pulls, sweats, vestes chaudes, laine, cachemire, velours
-     * OBLIGATOIRES: t-shirts, chemises légères, shorts, robes légères, lin, coton léger
-   - Si température 20-29°C:
-     * INTERDITS: pulls épais, doudounes, manteaux, laine épaisse
-     * AUTORISÉS: chemises, t-shirts, pantalons légers, robes, cardigans légers
-   - Si température 10-19°C:
-     * AUTORISÉS: pulls légers, vestes, jeans, chemises manches longues
-   - Si température < 10°C:
-     * RECOMMANDÉS: pulls chauds, manteaux, écharpes, vestes chaudes
-   - Si pluie: privilégier imperméables ou résistants à l'eau
-3. VÉRIFIER que chaque pièce recommandée a des matières adaptées:
-   - Chaleur (>25°C): coton, lin, viscose, matières respirantes
-   - Froid (<15°C): laine, cachemire, polyester, matières chaudes
-4. NE JAMAIS recommander un pull/sweat/veste chaude si température > 25°C
-
-Génère EXACTEMENT 1 SEULE recommandation de TENUE COMPLÈTE. 
-
-RÈGLES OBLIGATOIRES pour les recommandations:
-1. Si c'est une tenue complète (itemType: OUTFIT) : recommande-la directement
-2. Si c'est une combinaison, elle DOIT être une tenue complète :
-   - SOIT : 1 haut (t-shirt, chemise, top, etc.) + 1 bas (pantalon, short, jupe, etc.)
-   - SOIT : 1 robe SEULE (car la robe compte comme haut + bas)
-   - Optionnel dans tous les cas : veste/cardigan, chaussures, accessoires
-3. JAMAIS recommander seulement des hauts ou seulement des bas
-4. Les combinaisons peuvent inclure 2-5 pièces selon le type
-
-COMPATIBILITÉ VESTIMENTAIRE - INTERDICTIONS ABSOLUES:
-- JAMAIS combiner une robe avec un t-shirt/chemise/top (une robe se porte seule ou avec veste)
-- JAMAIS combiner une robe avec un pantalon/short/jupe
-- Une robe peut SEULEMENT être combinée avec : veste, cardigan, chaussures, accessoires
-- JAMAIS superposer plusieurs bas ensemble (pantalon + short, jupe + pantalon, etc.)
-- JAMAIS combiner plusieurs pièces du même type sauf pour le layering de hauts
-- Si tu recommandes plusieurs hauts, assure-toi qu'ils sont compatibles pour le layering (ex: t-shirt sous chemise ouverte)
-
-Retourne UNIQUEMENT ce JSON:
-{{
-  "weather": {{
-    "temp": {weather['current']['temperature']},
-    "condition": "{weather_description.lower()}",
-    "description": "{weather_description}",
-    "icon": "{weather_icon}",
-    "humidity": {weather['current']['humidity']},
-    "wind": {weather['current']['wind_speed']},
-    "sunrise": "06:30",
-    "sunset": "19:45"
-  }},
-  "recommendations": [
-    {{
-      "id": "id_du_vetement_ou_combinaison",
-      "score": 95,
-      "reason": "Pourquoi cette recommandation est parfaite pour aujourd'hui",
-      "weather_adaptation": "OBLIGATOIRE: Expliquer précisément pourquoi ces vêtements sont adaptés à {weather['current']['temperature']}°C (matières, coupe, épaisseur)",
-      "style_tips": "Conseils de style supplémentaires"
-    }}
-  ]
-}}
-
-IMPORTANT: 
-- L'id doit correspondre à un id existant dans la garde-robe
-- Pour une combinaison, créer un id unique comme "combo-[id1]-[id2]-[id3]..." avec TOUS les IDs triés alphabétiquement
-- Une combinaison DOIT inclure au minimum un haut ET un bas (sauf si c'est une robe)
-- Le score doit refléter la pertinence (0-100)
-- EXACTEMENT 1 recommandation dans le tableau recommendations, pas plus
-- Si tu recommandes plusieurs hauts (ex: t-shirt + chemise), assure-toi qu'ils se complètent (layering)"""
+Génère EXACTEMENT 1 SEULE recommandation de TENUE COMPLÈTE adaptée à {weather['current']['temperature']}°C."""
     
     def _parse_ai_response(self, raw_content: str) -> Dict[str, Any]:
         """Parse la réponse JSON de l'IA"""
@@ -0,0 +1,134 @@
+"""
+Recommandations quotidiennes précalculées (table daily_recommendations)
+
+Chaque demande d'un utilisateur (garde-robe côté serveur) enregistre son
+contexte : ville ou position, saison, mode. Le précalcul nocturne parcourt
+les utilisateurs actifs et stocke leur recommandation du jour, servie par
+/recommendations/daily tant que ses entrées n'ont pas changé.
+
+Les tenues servies sont ajoutées à l'historique de l'utilisateur (table
+recommendation_history), écarté des recommandations suivantes.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from core.serialization import dumps
+from services.recommendation_cache import RecommendationKey
+from services.recommendation_history import RecommendationHistory, recommendation_outfit_key
+
+# Contexte mis à jour au plus une fois par heure s'il n'a pas changé
+RECORD_PROFILE_SQL = text("""
+INSERT INTO daily_recommendations (user_id, city, country_code, latitude, longitude, current_season, mode, last_requested_at)
+VALUES (:user_id, :city, :country_code, :latitude, :longitude, :current_season, :mode, now())
+ON CONFLICT (user_id) DO UPDATE
+SET city = EXCLUDED.city,
+    country_code = EXCLUDED.country_code,
+    latitude = EXCLUDED.latitude,
+    longitude = EXCLUDED.longitude,
+    current_season = EXCLUDED.current_season,
+    mode = EXCLUDED.mode,
+    last_requested_at = now()
+WHERE daily_recommendations.last_requested_at < now() - interval '1 hour'
+   OR (daily_recommendations.city, daily_recommendations.country_code, daily_recommendations.latitude,
+       daily_recommendations.longitude, daily_recommendations.current_season, daily_recommendations.mode)
+      IS DISTINCT FROM (EXCLUDED.city, EXCLUDED.country_code, EXCLUDED.latitude,
+                        EXCLUDED.longitude, EXCLUDED.current_season, EXCLUDED.mode)
+""")
+
+LOAD_STORED_SQL = text("""
+SELECT input_key, result, valid_until FROM daily_recommendations
+WHERE user_id = :user_id AND result IS NOT NULL AND valid_until > now()
+""")
+
+SAVE_STORED_SQL = text("""
+UPDATE daily_recommendations
+SET input_key = :input_key, result = CAST(:result AS jsonb), valid_until = :valid_until, computed_at = now()
+WHERE user_id = :user_id
+""")
+
+ACTIVE_PROFILES_SQL = text("""
+SELECT user_id, city, country_code, latitude, longitude, current_season, mode, input_key, valid_until
+FROM daily_recommendations
+WHERE last_requested_at > now() - make_interval(days => :active_days)
+ORDER BY last_requested_at DESC
+LIMIT :limit
+""")
+
+LOAD_HISTORY_SQL = text("SELECT digests FROM recommendation_history WHERE user_id = :user_id")
+
+LOCK_HISTORY_SQL = text("SELECT digests FROM recommendation_history WHERE user_id = :user_id FOR UPDATE")
+
+SAVE_HISTORY_SQL = text("""
+INSERT INTO recommendation_history (user_id, digests, updated_at)
+VALUES (:user_id, :digests, now())
+ON CONFLICT (user_id) DO UPDATE SET digests = EXCLUDED.digests, updated_at = now()
+""")
+
+
+def record_request_profile(session_factory, user_id: UUID, request) -> None:
+    """Enregistre le contexte de la demande (tâche d'arrière-plan, après la réponse)"""
+    db = session_factory()
+    try:
+        db.execute(RECORD_PROFILE_SQL, {
+            "user_id": user_id,
+            "city": request.city,
+            "country_code": (request.country_code or "")[:2] or None,
+            "latitude": request.latitude,
+            "longitude": request.longitude,
+            "current_season": request.current_season,
+            "mode": request.mode,
+        })
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ Contexte de recommandation non enregistré pour {user_id}: {type(e).__name__}: {e}")
+    finally:
+        db.close()
+
+
+def load_stored_recommendation(db: Session, user_id: UUID) -> Optional[Dict[str, Any]]:
+    """Recommandation précalculée encore valable : {"input_key", "result", "valid_until"} ou None"""
+    row = db.execute(LOAD_STORED_SQL, {"user_id": user_id}).first()
+    return dict(row._mapping) if row is not None else None
+
+
+def save_stored_recommendation(db: Session, user_id: UUID, key: RecommendationKey,
+                               result: Dict[str, Any], valid_until: datetime) -> None:
+    db.execute(SAVE_STORED_SQL, {
+        "user_id": user_id,
+        "input_key": key.digest(with_exclusions=False),
+        "result": dumps(result).decode("utf-8"),
+        "valid_until": valid_until.astimezone(timezone.utc),
+    })
+    db.commit()
+
+
+def list_active_profiles(db: Session, active_days: int, limit: int) -> List[Any]:
+    """Utilisateurs ayant demandé une recommandation dans les active_days derniers jours"""
+    return db.execute(ACTIVE_PROFILES_SQL, {"active_days": active_days, "limit": limit}).all()
+
+
+def load_recommendation_history(db: Session, user_id: UUID, capacity: int) -> RecommendationHistory:
+    digests = db.execute(LOAD_HISTORY_SQL, {"user_id": user_id}).scalar()
+    return RecommendationHistory.from_bytes(bytes(digests or b""), capacity)
+
+
+def record_recommendations(session_factory, user_id: UUID, result: Dict[str, Any], capacity: int) -> None:
+    """Ajoute les tenues servies à l'historique (tâche d'arrière-plan, après la réponse)"""
+    db = session_factory()
+    try:
+        digests = db.execute(LOCK_HISTORY_SQL, {"user_id": user_id}).scalar()
+        history = RecommendationHistory.from_bytes(bytes(digests or b""), capacity)
+        added = [history.add(recommendation_outfit_key(r)) for r in result.get("recommendations") or []]
+        if any(added):
+            db.execute(SAVE_HISTORY_SQL, {"user_id": user_id, "digests": history.to_bytes()})
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ Historique de recommandations non enregistré pour {user_id}: {type(e).__name__}: {e}")
+    finally:
+        db.close()
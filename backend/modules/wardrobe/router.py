@@ -1,14 +1,32 @@
 """
 Routes pour la gestion de garde-robe
 """
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response, UploadFile, File
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from typing import List, Optional, Union
 from uuid import UUID
+from datetime import date
+import io
 
 from schemas.clothing_analysis import SinglePieceResponse, CompleteLookResponse
-from database.models import ClothingItem
 from core.database import get_db
+from database.connection import SessionLocal
+from core.serialization import FastJSONResponse
+from services.wardrobe_import import WardrobeImporter, detect_format, iter_records
+from services.wardrobe_stats import WardrobeStatsService
+from services.wardrobe_search import WardrobeSearchService
+from services.wardrobe_sync import WardrobeSyncService
+from services.wardrobe_export import stream_ndjson, stream_zip
+from services.wear_tracker import wear_buffer
+from services.idempotency import (
+    DatabaseIdempotencyBackend,
+    IdempotencyKeyInProgress,
+    IdempotencyKeyMismatch,
+    IdempotencyStore,
+    request_fingerprint,
+)
+from .serializers import serialize_pieces, serialize_looks, item_to_dict, piece_look_to_dict, stats_to_dict
 from .service import WardrobeServiceModule
 
 router = APIRouter(prefix="/wardrobe", tags=["wardrobe"])
@@ -31,12 +49,32 @@ class UpdateClothingItemRequest(BaseModel):
     seasonality: Optional[List[str]] = None
     is_favorite: Optional[bool] = None
 
-@router.post("/save")
-async def save_clothing(
-    request: SaveClothingRequest,
-    db = Depends(get_db)
-):
-    """Sauvegarde les vêtements analysés"""
+class BulkUpdateClothingItemsRequest(BaseModel):
+    item_ids: List[UUID] = Field(..., min_length=1, max_length=500)
+    changes: UpdateClothingItemRequest
+
+class MarkWornRequest(BaseModel):
+    worn_on: Optional[date] = None  # Aujourd'hui par défaut
+
+def _wardrobe_etag(version: int, wear_version: int) -> str:
+    """ETag des listes de garde-robe, dérivé des versions de l'utilisateur (contenu et compteurs de port)"""
+    return f'"v{version}.w{wear_version}"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Vérifie si l'en-tête If-None-Match correspond à l'ETag courant"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+def _json_with_etag(content: dict, etag: str) -> FastJSONResponse:
+    return FastJSONResponse(content=content, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+async def _save_analysis(request: SaveClothingRequest, db) -> dict:
+    """Sauvegarde une analyse (pièce unique ou tenue complète)"""
     try:
         service = WardrobeServiceModule(db)
         
@@ -67,39 +105,59 @@ async def save_clothing(
         print(f"Erreur lors de la sauvegarde: {type(e).__name__}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/save")
+async def save_clothing(
+    request: SaveClothingRequest,
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255),
+    db = Depends(get_db)
+):
+    """Sauvegarde les vêtements analysés.
+    
+    Avec un en-tête Idempotency-Key, une nouvelle tentative (ou une requête
+    concurrente) rejoue la réponse de la première au lieu de sauvegarder à nouveau.
+    """
+    if idempotency_key is None:
+        return await _save_analysis(request, db)
+    
+    store = IdempotencyStore(DatabaseIdempotencyBackend(SessionLocal, scope="wardrobe.save"))
+    try:
+        outcome = await store.run(
+            request.user_id, idempotency_key, request_fingerprint(request.model_dump(mode="json")),
+            lambda: _save_analysis(request, db)
+        )
+    except IdempotencyKeyMismatch as e:
+        raise HTTPException(status_code=e.http_status, detail=str(e))
+    except IdempotencyKeyInProgress as e:
+        raise HTTPException(status_code=e.http_status, detail=str(e), headers={"Retry-After": "1"})
+    
+    if outcome.replayed:
+        return FastJSONResponse(
+            content=outcome.body,
+            status_code=outcome.status_code,
+            headers={"Idempotent-Replayed": "true"}
+        )
+    return outcome.body
+
 @router.get("/{user_id}/pieces")
 async def get_user_pieces(
     user_id: UUID,
     piece_type: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
     db = Depends(get_db)
 ):
     """Récupère les pièces de vêtements d'un utilisateur"""
     try:
         service = WardrobeServiceModule(db)
-        pieces = service.get_user_pieces(user_id, piece_type)
-        
-        return {
-            "pieces": [
-                {
-                    "piece_id": str(piece.id),
-                    "piece_type": piece.piece_type,
-                    "name": piece.name,
-                    "colors": piece.colors,
-                    "material": piece.material,
-                    "pattern": piece.pattern,
-                    "fit": piece.fit,
-                    "details": piece.details,
-                    "style_tags": piece.style_tags,
-                    "occasion_tags": piece.occasion_tags,
-                    "seasonality": piece.seasonality,
-                    "image_url": piece.image_url,
-                    "is_favorite": piece.is_favorite,
-                    "wear_count": piece.wear_count,
-                    "created_at": piece.created_at.isoformat() if piece.created_at else None
-                }
-                for piece in pieces
-            ]
-        }
+        
+        etag = _wardrobe_etag(*service.get_wardrobe_versions(user_id))
+        if _etag_matches(if_none_match, etag):
+            return _not_modified(etag)
+        
+        snapshot = service.get_wardrobe_snapshot(user_id)
+        etag = _wardrobe_etag(snapshot.version, snapshot.wear_version)
+        pieces = snapshot.pieces_of_type(piece_type)
+        
+        return _json_with_etag(serialize_pieces(pieces), etag)
         
     except Exception as e:
         print(f"Erreur lors de la récupération des pièces: {type(e).__name__}: {str(e)}")
@@ -108,95 +166,260 @@ async def get_user_pieces(
 @router.get("/{user_id}/looks")
 async def get_user_looks(
     user_id: UUID,
+    if_none_match: Optional[str] = Header(None),
     db = Depends(get_db)
 ):
     """Récupère les tenues complètes d'un utilisateur"""
     try:
         service = WardrobeServiceModule(db)
-        looks = service.get_user_looks(user_id)
-        
-        return {
-            "looks": [
-                {
-                    "id": str(look.id),
-                    "user_id": str(look.user_id),
-                    "name": look.name,
-                    "dominant_style": look.dominant_style,
-                    "occasion_tags": look.occasion_tags,
-                    "seasonality": look.seasonality,
-                    "color_palette": look.color_palette,
-                    "pattern_mix": look.pattern_mix,
-                    "silhouette": look.silhouette,
-                    "layering_level": look.layering_level,
-                    "image_url": look.image_url,
-                    "rating": look.rating,
-                    "is_favorite": look.is_favorite,
-                    "wear_count": look.wear_count,
-                    "created_at": look.created_at.isoformat() if look.created_at else None,
-                    "pieces": [
-                        {
-                            "id": str(item.item_id),
-                            "position": item.position,
-                            "bounding_box": item.bounding_box,
-                            "piece_type": item.item.piece_type if hasattr(item, 'item') and item.item else None,
-                            "name": item.item.name if hasattr(item, 'item') and item.item else None,
-                            "colors": item.item.colors if hasattr(item, 'item') and item.item else None,
-                            "image_url": item.item.image_url if hasattr(item, 'item') and item.item else None
-                        }
-                        for item in look.items
-                    ] if hasattr(look, 'items') and look.items else []
-                }
-                for look in looks
-            ]
-        }
+        
+        etag = _wardrobe_etag(*service.get_wardrobe_versions(user_id))
+        if _etag_matches(if_none_match, etag):
+            return _not_modified(etag)
+        
+        snapshot = service.get_wardrobe_snapshot(user_id)
+        etag = _wardrobe_etag(snapshot.version, snapshot.wear_version)
+        looks = snapshot.looks
+        
+        return _json_with_etag(serialize_looks(looks), etag)
         
     except Exception as e:
         print(f"Erreur lors de la récupération des tenues: {type(e).__name__}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/{user_id}/changes")
+async def get_wardrobe_changes(
+    user_id: UUID,
+    since: Optional[str] = Query(None, description="Curseur renvoyé par l'appel précédent (absent = tout télécharger)"),
+    limit: int = Query(500, ge=1, le=2000),
+    db = Depends(get_db)
+):
+    """Modifications de la garde-robe depuis un curseur : pièces et tenues modifiées + suppressions"""
+    try:
+        changes = WardrobeSyncService(db).get_changes(user_id, since, limit)
+        
+        return FastJSONResponse(content={
+            "version": changes["version"],
+            "wear_version": changes["wear_version"],
+            "upserts": [item_to_dict(row) for row in changes["upserts"]],
+            "looks": serialize_looks(changes["looks"])["looks"],
+            "deleted": changes["deleted"],
+            "deleted_looks": changes["deleted_looks"],
+            "cursor": changes["cursor"],
+            "has_more": changes["has_more"]
+        })
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Erreur lors de la synchronisation: {type(e).__name__}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{user_id}/pieces/{item_id}/looks")
+async def get_looks_with_piece(
+    user_id: UUID,
+    item_id: UUID,
+    if_none_match: Optional[str] = Header(None),
+    db = Depends(get_db)
+):
+    """Tenues dans lesquelles apparaît une pièce"""
+    try:
+        service = WardrobeServiceModule(db)
+        
+        etag = _wardrobe_etag(*service.get_wardrobe_versions(user_id))
+        if _etag_matches(if_none_match, etag):
+            return _not_modified(etag)
+        
+        looks = service.get_looks_with_piece(user_id, item_id)
+        
+        return _json_with_etag({
+            "piece_id": item_id,
+            "look_count": len(looks),
+            "looks": [piece_look_to_dict(look) for look in looks]
+        }, etag)
+        
+    except Exception as e:
+        print(f"Erreur lors de la récupération des tenues de la pièce: {type(e).__name__}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{user_id}/stats")
+async def get_wardrobe_stats(
+    user_id: UUID,
+    if_none_match: Optional[str] = Header(None),
+    db = Depends(get_db)
+):
+    """Statistiques de la garde-robe (lues dans la table matérialisée wardrobe_stats)"""
+    try:
+        version, wear_version = WardrobeServiceModule(db).get_wardrobe_versions(user_id)
+        etag = _wardrobe_etag(version, wear_version)
+        if _etag_matches(if_none_match, etag):
+            return _not_modified(etag)
+        
+        stats = WardrobeStatsService(db).get(user_id)
+        
+        # wear_version lue avant les statistiques : l'ETag n'annonce jamais des compteurs plus récents que la réponse
+        return _json_with_etag(stats_to_dict(stats), _wardrobe_etag(stats.version, wear_version))
+        
+    except Exception as e:
+        print(f"Erreur lors de la récupération des statistiques: {type(e).__name__}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{user_id}/search")
+async def search_wardrobe(
+    user_id: UUID,
+    q: Optional[str] = Query(None, max_length=100, description="Texte recherché dans le nom et les notes"),
+    piece_type: List[str] = Query([]),
+    colors: List[str] = Query([]),
+    material: List[str] = Query([]),
+    pattern: List[str] = Query([]),
+    seasonality: List[str] = Query([]),
+    style_tags: List[str] = Query([]),
+    occasion_tags: List[str] = Query([]),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    if_none_match: Optional[str] = Header(None),
+    db = Depends(get_db)
+):
+    """Recherche à facettes : pièces filtrées + nombre de pièces par valeur de chaque facette"""
+    try:
+        version, wear_version = WardrobeServiceModule(db).get_wardrobe_versions(user_id)
+        etag = _wardrobe_etag(version, wear_version)
+        if _etag_matches(if_none_match, etag):
+            return _not_modified(etag)
+        
+        filters = {
+            "piece_type": piece_type,
+            "colors": colors,
+            "material": material,
+            "pattern": pattern,
+            "seasonality": seasonality,
+            "style_tags": style_tags,
+            "occasion_tags": occasion_tags,
+        }
+        
+        result = WardrobeSearchService(db).search(user_id, version, filters, q, limit=limit, offset=offset)
+        
+        return _json_with_etag(result, etag)
+        
+    except Exception as e:
+        print(f"Erreur lors de la recherche: {type(e).__name__}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.patch("/items/{item_id}")
 @router.put("/items/{item_id}")
 async def update_clothing_item(
     item_id: UUID,
     request: UpdateClothingItemRequest,
     db = Depends(get_db)
 ):
-    """Met à jour un vêtement existant"""
+    """Met à jour un vêtement existant (seuls les champs fournis sont modifiés)"""
     try:
-        item = db.query(ClothingItem).filter_by(id=item_id).first()
+        service = WardrobeServiceModule(db)
+        
+        # Un seul UPDATE ... RETURNING avec les champs fournis
+        item = service.update_clothing_item(item_id, request.model_dump(exclude_unset=True))
         
         if not item:
             raise HTTPException(status_code=404, detail="Vêtement non trouvé")
         
-        # Mettre à jour les champs fournis
-        update_data = request.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(item, field, value)
-        
-        db.commit()
-        db.refresh(item)
-        
-        return {
-            "piece_id": str(item.id),
-            "piece_type": item.piece_type,
-            "name": item.name,
-            "colors": item.colors,
-            "material": item.material,
-            "pattern": item.pattern,
-            "fit": item.fit,
-            "details": item.details,
-            "style_tags": item.style_tags,
-            "occasion_tags": item.occasion_tags,
-            "seasonality": item.seasonality,
-            "image_url": item.image_url,
-            "is_favorite": item.is_favorite,
-            "wear_count": item.wear_count,
-            "brand": item.brand,
-            "created_at": item.created_at.isoformat() if item.created_at else None,
-            "updated_at": item.updated_at.isoformat() if item.updated_at else None
-        }
+        return FastJSONResponse(content=item_to_dict(item))
         
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         print(f"Erreur lors de la mise à jour: {type(e).__name__}: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.patch("/{user_id}/items")
+async def bulk_update_clothing_items(
+    user_id: UUID,
+    request: BulkUpdateClothingItemsRequest,
+    db = Depends(get_db)
+):
+    """Applique les mêmes modifications à plusieurs vêtements (re-tag en sélection multiple)"""
+    try:
+        service = WardrobeServiceModule(db)
+        
+        rows = service.update_clothing_items(
+            request.item_ids,
+            request.changes.model_dump(exclude_unset=True),
+            user_id=user_id
+        )
+        
+        updated_ids = {row.id for row in rows}
+        return FastJSONResponse(content={
+            "updated": len(rows),
+            "not_found": [item_id for item_id in request.item_ids if item_id not in updated_ids],
+            "pieces": [item_to_dict(row) for row in rows]
+        })
+        
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        print(f"Erreur lors de la mise à jour groupée: {type(e).__name__}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/{user_id}/items/{item_id}/worn", status_code=202)
+async def mark_item_worn(
+    user_id: UUID,
+    item_id: UUID,
+    request: Optional[MarkWornRequest] = None
+):
+    """Enregistre le port d'une pièce (écrit en différé, par lots)"""
+    wear_buffer.record_item(user_id, item_id, (request and request.worn_on) or date.today())
+    return {"accepted": True, "pending": len(wear_buffer)}
+
+@router.post("/{user_id}/looks/{look_id}/worn", status_code=202)
+async def mark_look_worn(
+    user_id: UUID,
+    look_id: UUID,
+    request: Optional[MarkWornRequest] = None
+):
+    """Enregistre le port d'une tenue, compté aussi pour chacune de ses pièces"""
+    wear_buffer.record_look(user_id, look_id, (request and request.worn_on) or date.today())
+    return {"accepted": True, "pending": len(wear_buffer)}
+
+@router.get("/{user_id}/export")
+def export_wardrobe(
+    user_id: UUID,
+    file_format: str = Query("ndjson", alias="format", pattern="^(ndjson|zip)$"),
+    include_images: bool = Query(True, description="Mode zip : inclure les images dans l'archive")
+):
+    """Exporte toute la garde-robe en flux (NDJSON, ou ZIP avec les images)"""
+    # Les générateurs ouvrent leur propre session : la réponse est envoyée après la fin de la requête
+    if file_format == "zip":
+        return StreamingResponse(
+            stream_zip(SessionLocal, user_id, include_images=include_images),
+            media_type="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="garde-robe-{user_id}.zip"'}
+        )
+    return StreamingResponse(
+        stream_ndjson(SessionLocal, user_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="garde-robe-{user_id}.ndjson"'}
+    )
+
+@router.post("/{user_id}/import")
+def import_wardrobe(
+    user_id: UUID,
+    file: UploadFile = File(...),
+    file_format: Optional[str] = Query(None, alias="format"),
+    db = Depends(get_db)
+):
+    """Importe en masse des vêtements depuis un fichier JSONL ou CSV (lu en flux)"""
+    try:
+        file_format = detect_format(file.filename, file_format)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    try:
+        # Lecture ligne par ligne : la mémoire ne dépend pas de la taille du fichier
+        stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+        report = WardrobeImporter(db, user_id).run(iter_records(stream, file_format))
+        return FastJSONResponse(content=report.as_dict())
+        
+    except Exception as e:
+        print(f"Erreur lors de l'import: {type(e).__name__}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,114 @@
+"""
+Sérialiseurs des réponses de garde-robe (mappers compilés une fois à l'import)
+"""
+from typing import Iterable
+
+from core.serialization import compile_row_mapper
+
+# PieceRow -> pièce de la liste des pièces
+piece_to_dict = compile_row_mapper({
+    "piece_id": "id",
+    "piece_type": "piece_type",
+    "name": "name",
+    "colors": "colors",
+    "material": "material",
+    "pattern": "pattern",
+    "fit": "fit",
+    "details": "details",
+    "style_tags": "style_tags",
+    "occasion_tags": "occasion_tags",
+    "seasonality": "seasonality",
+    "image_url": "image_url",
+    "is_favorite": "is_favorite",
+    "wear_count": "wear_count",
+    "look_count": "look_count",
+    "created_at": "created_at",
+})
+
+# Ligne renvoyée par une modification -> pièce détaillée
+item_to_dict = compile_row_mapper({
+    "piece_id": "id",
+    "piece_type": "piece_type",
+    "name": "name",
+    "colors": "colors",
+    "material": "material",
+    "pattern": "pattern",
+    "fit": "fit",
+    "details": "details",
+    "style_tags": "style_tags",
+    "occasion_tags": "occasion_tags",
+    "seasonality": "seasonality",
+    "image_url": "image_url",
+    "is_favorite": "is_favorite",
+    "wear_count": "wear_count",
+    "brand": "brand",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+})
+
+# LookItemRow -> pièce d'une tenue
+look_item_to_dict = compile_row_mapper({
+    "id": "item_id",
+    "position": "position",
+    "bounding_box": "bounding_box",
+    "piece_type": "item.piece_type",
+    "name": "item.name",
+    "colors": "item.colors",
+    "image_url": "item.image_url",
+})
+
+# LookRow -> tenue avec ses pièces
+look_to_dict = compile_row_mapper({
+    "id": "id",
+    "user_id": "user_id",
+    "name": "name",
+    "dominant_style": "dominant_style",
+    "occasion_tags": "occasion_tags",
+    "seasonality": "seasonality",
+    "color_palette": "color_palette",
+    "pattern_mix": "pattern_mix",
+    "silhouette": "silhouette",
+    "layering_level": "layering_level",
+    "image_url": "image_url",
+    "rating": "rating",
+    "is_favorite": "is_favorite",
+    "wear_count": "wear_count",
+    "created_at": "created_at",
+}, nested={"pieces": ("items", look_item_to_dict)})
+
+# Tenue contenant une pièce donnée (position et cadre de la pièce dans la tenue)
+piece_look_to_dict = compile_row_mapper({
+    "id": "id",
+    "name": "name",
+    "dominant_style": "dominant_style",
+    "occasion_tags": "occasion_tags",
+    "image_url": "image_url",
+    "is_favorite": "is_favorite",
+    "wear_count": "wear_count",
+    "created_at": "created_at",
+    "position": "position",
+    "bounding_box": "bounding_box",
+})
+
+# WardrobeStats -> statistiques de garde-robe
+stats_to_dict = compile_row_mapper({
+    "user_id": "user_id",
+    "version": "version",
+    "total_items": "total_items",
+    "favorite_items": "favorite_items",
+    "total_looks": "total_looks",
+    "total_wears": "total_wears",
+    "by_type": "by_type",
+    "by_color": "by_color",
+    "by_season": "by_season",
+    "by_wear": "by_wear",
+    "updated_at": "updated_at",
+})
+
+
+def serialize_pieces(pieces: Iterable) -> dict:
+    return {"pieces": [piece_to_dict(piece) for piece in pieces]}
+
+
+def serialize_looks(looks: Iterable) -> dict:
+    return {"looks": [look_to_dict(look) for look in looks]}
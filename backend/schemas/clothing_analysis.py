@@ -35,9 +35,23 @@ class ClothingPiece(BaseModel):
     bounding_box: Optional[BoundingBox] = None  # Coordonnées dans l'image (seulement pour tenues complètes)
 
 
+class AnalysisMeta(BaseModel):
+    """Mesures de l'appel au modèle, renvoyées pour information.
+
+    Jamais reprises du client : la sauvegarde ne garde que celles du jeton
+    signé par le serveur (analysis_token).
+    """
+    model_used: str
+    duration_ms: int
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+
+
 class SinglePieceResponse(BaseModel):
     capture_type: Literal["single_piece"]
     pieces: List[ClothingPiece]
+    analysis_token: Optional[str] = None  # Mesures signées par /outfit-analysis/analyze
+    analysis_meta: Optional[AnalysisMeta] = None
 
 
 class ColorPaletteGlobal(BaseModel):
@@ -59,4 +73,6 @@ class LookMeta(BaseModel):
 class CompleteLookResponse(BaseModel):
     capture_type: Literal["complete_look"]
     pieces: List[ClothingPiece]
-    look_meta: LookMeta
\ No newline at end of file
+    look_meta: LookMeta
+    analysis_token: Optional[str] = None  # Mesures signées par /outfit-analysis/analyze
+    analysis_meta: Optional[AnalysisMeta] = None
\ No newline at end of file
@@ -0,0 +1,54 @@
+import json
+from datetime import date
+from typing import List, Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field, field_validator
+
+from .clothing_analysis import PieceColors
+
+
+LIST_SEPARATOR = "|"
+
+
+class ImportedClothingItem(BaseModel):
+    """Ligne d'import de garde-robe (JSONL ou CSV), alignée sur la table clothing_items"""
+    id: Optional[UUID] = None
+    piece_type: str = Field(..., min_length=1, max_length=50)
+    name: Optional[str] = None
+    colors: PieceColors = Field(default_factory=lambda: PieceColors(primary=[], secondary=[]))
+    material: Optional[str] = Field(None, max_length=50)
+    pattern: Optional[str] = Field(None, max_length=50)
+    fit: Optional[str] = Field(None, max_length=50)
+    details: List[str] = []
+    style_tags: List[str] = []
+    occasion_tags: List[str] = []
+    seasonality: List[str] = []
+    image_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    brand: Optional[str] = Field(None, max_length=100)
+    price_range: Optional[str] = Field(None, max_length=50)
+    notes: Optional[str] = None
+    last_worn: Optional[date] = None
+    wear_count: int = Field(0, ge=0)
+    is_favorite: bool = False
+
+    @field_validator("details", "style_tags", "occasion_tags", "seasonality", mode="before")
+    @classmethod
+    def split_list(cls, value):
+        # En CSV, les listes sont séparées par "|" (ex: "casual|chic")
+        if isinstance(value, str):
+            return [part.strip() for part in value.split(LIST_SEPARATOR) if part.strip()]
+        return value
+
+    @field_validator("colors", mode="before")
+    @classmethod
+    def parse_colors(cls, value):
+        # Objet JSON, ou simple liste / chaîne interprétée comme les couleurs principales
+        if isinstance(value, str) and value.lstrip().startswith("{"):
+            return json.loads(value)
+        if isinstance(value, str):
+            value = [part.strip() for part in value.split(LIST_SEPARATOR) if part.strip()]
+        if isinstance(value, list):
+            return {"primary": value, "secondary": []}
+        return value
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Tâche de rétention de l'historique des analyses
+
+Supprime les partitions mensuelles de analysis_history antérieures à la
+fenêtre de rétention (ANALYSIS_HISTORY_RETENTION_MONTHS, 12 par défaut : le
+mois courant et les 12 précédents sont conservés) et prépare les partitions
+des mois à venir. Prévue pour un cron quotidien ou mensuel, par exemple :
+    python scripts/analysis_history_retention.py --months-ahead 2
+"""
+
+import argparse
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from core.config import settings
+from database.connection import SessionLocal
+from services.analysis_history import (
+    add_months,
+    drop_expired_partitions,
+    ensure_partitions,
+    list_partitions,
+    month_start,
+)
+
+
+def run_retention(retention_months: int, months_ahead: int, dry_run: bool = False):
+    db = SessionLocal()
+    try:
+        current = month_start(datetime.now(timezone.utc))
+
+        if not dry_run:
+            created = ensure_partitions(db, (add_months(current, offset) for offset in range(months_ahead + 1)))
+            for name in created:
+                print(f"🆕 Partition créée: {name}")
+
+        expired = drop_expired_partitions(db, retention_months, dry_run=dry_run)
+        action = "serait supprimée" if dry_run else "supprimée"
+        for name in expired:
+            print(f"🗑️  Partition {action}: {name}")
+        if not expired:
+            print(f"✅ Aucune partition antérieure à {add_months(current, -retention_months):%Y-%m}")
+
+        remaining = [name for name, _ in list_partitions(db) if name not in expired]
+        print(f"\n📊 {len(remaining)} partitions conservées ({retention_months} mois de rétention)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--retention-months", type=int, default=settings.ANALYSIS_HISTORY_RETENTION_MONTHS,
+                        help="Nombre de mois complets conservés avant le mois courant")
+    parser.add_argument("--months-ahead", type=int, default=1, help="Partitions futures à créer à l'avance")
+    parser.add_argument("--dry-run", action="store_true", help="Afficher les partitions expirées sans les supprimer")
+    args = parser.parse_args()
+
+    if args.retention_months < 0:
+        parser.error("--retention-months doit être positif")
+    run_retention(args.retention_months, args.months_ahead, dry_run=args.dry_run)
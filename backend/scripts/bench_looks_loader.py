@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Benchmark du chargement des tenues : joinedload cartésien vs chargeur en trois requêtes
+
+Crée un utilisateur fictif avec plusieurs centaines de tenues (pièces partagées
+entre les tenues) dans une transaction annulée à la fin, puis compare les deux
+stratégies de chargement sur la même base.
+
+Usage:
+    python scripts/bench_looks_loader.py --looks 500 --pieces 120 --runs 10
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from database.connection import SessionLocal
+from database.models import ClothingItem, OutfitLook, LookItem
+from services.wardrobe_service import WardrobeService
+from sqlalchemy.orm import joinedload
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PIECE_TYPES = ["tshirt", "shirt", "sweater", "pants", "jeans", "skirt", "shoes", "jacket"]
+
+
+def seed_user(db, n_looks: int, n_pieces: int) -> uuid.UUID:
+    """Crée un utilisateur fictif avec des pièces partagées entre ses tenues"""
+    user_id = uuid.uuid4()
+    rng = random.Random(42)
+
+    pieces = [
+        ClothingItem(
+            id=uuid.uuid4(),
+            user_id=user_id,
+            piece_type=rng.choice(PIECE_TYPES),
+            name=f"Pièce {i}",
+            colors={"primary": ["black"], "secondary": ["white"]},
+            material="coton",
+            pattern="uni",
+            fit="regular",
+            details=["crewneck", "short_sleeves"],
+            style_tags=["casual", "minimaliste"],
+            occasion_tags=["weekend"],
+            seasonality=["spring", "summer"],
+            image_url=f"https://example.com/piece_{i}.jpg",
+            notes="x" * 200,
+        )
+        for i in range(n_pieces)
+    ]
+    db.add_all(pieces)
+    db.flush()
+
+    for i in range(n_looks):
+        look = OutfitLook(
+            id=uuid.uuid4(),
+            user_id=user_id,
+            name=f"Look {i}",
+            dominant_style=["casual"],
+            occasion_tags=["weekend"],
+            seasonality=["summer"],
+            color_palette={"primary": ["black"], "accent": []},
+            pattern_mix=["uni"],
+            layering_level=1,
+            image_url=f"https://example.com/look_{i}.jpg",
+        )
+        db.add(look)
+        for position, piece in enumerate(rng.sample(pieces, rng.randint(3, 5))):
+            db.add(LookItem(
+                look_id=look.id,
+                item_id=piece.id,
+                position=position,
+                bounding_box={"x": 0.1, "y": 0.1, "width": 0.5, "height": 0.5},
+            ))
+    db.flush()
+    return user_id
+
+
+def load_joined(db, user_id):
+    """Ancienne stratégie : joinedload(OutfitLook.items).joinedload(LookItem.item)"""
+    looks = db.query(OutfitLook).filter_by(user_id=user_id).options(
+        joinedload(OutfitLook.items).joinedload(LookItem.item)
+    ).order_by(OutfitLook.created_at.desc()).all()
+    # Accéder aux attributs comme le fait le router
+    return sum(len([item.item.piece_type for item in look.items]) for look in looks)
+
+
+def load_three_queries(db, user_id):
+    """Nouvelle stratégie : chargeur de WardrobeService (sans passer par le cache)"""
+    looks = WardrobeService(db)._load_user_looks(user_id)
+    return sum(len([item.item.piece_type for item in look.items]) for look in looks)
+
+
+def bench(label, loader, db, user_id, runs):
+    timings = []
+    for _ in range(runs):
+        db.expunge_all()  # Pas de cache de l'identity map entre deux mesures
+        start = time.perf_counter()
+        count = loader(db, user_id)
+        timings.append((time.perf_counter() - start) * 1000)
+    print(
+        f"  {label:<28} médiane {statistics.median(timings):8.1f} ms"
+        f" | min {min(timings):8.1f} ms | {count} liens chargés"
+    )
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--looks", type=int, default=500, help="Nombre de tenues à créer")
+    parser.add_argument("--pieces", type=int, default=120, help="Nombre de pièces partagées")
+    parser.add_argument("--runs", type=int, default=10, help="Nombre de mesures par stratégie")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print(f"🌱 Création de {args.looks} tenues / {args.pieces} pièces...")
+        user_id = seed_user(db, args.looks, args.pieces)
+
+        print("⏱️  Chargement des tenues:")
+        joined = bench("joinedload (avant)", load_joined, db, user_id, args.runs)
+        three_queries = bench("trois requêtes (après)", load_three_queries, db, user_id, args.runs)
+        print(f"\n📊 Gain: x{joined / three_queries:.1f}")
+    finally:
+        # Ne rien laisser en base
+        db.rollback()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark de la taille des prompts de recommandation
+
+Compare, sur une garde-robe synthétique au format client, l'ancienne
+garde-robe du prompt (json.dumps des éléments complets, UUID compris) et les
+anciennes options du choix final (JSON des pièces de chaque candidate) à
+l'encodage compact (services/prompt_encoding.py). Sans tokenizer : la taille
+est donnée en caractères, en octets UTF-8 et en jetons estimés (mots,
+nombres et signes de ponctuation comptés séparément, ce qui suit de près le
+découpage des UUID et du JSON).
+
+Usage:
+    python scripts/bench_prompt_encoding.py --pieces 150 --looks 10
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import timeit
+import uuid
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services.prompt_encoding import PromptWardrobe, encode_options
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+CATEGORIES = ["tshirt", "shirt", "sweater", "jeans", "pants", "shorts", "skirt", "dress", "jacket", "coat", "sneakers", "boots"]
+COLORS = ["white", "black", "navy", "beige", "grey", "red", "green", "brown"]
+MATERIALS = ["coton", "lin", "laine", "denim", "polyester", "soie", "cuir", "cachemire"]
+STYLES = ["casual", "minimaliste", "chic", "streetwear", "bohème", "classique", "sportswear"]
+OCCASIONS = ["weekend", "travail", "soirée", "sport", "voyage"]
+SEASONS = ["spring", "summer", "fall", "winter"]
+
+
+def make_wardrobe(n_pieces: int, n_looks: int, seed: int = 0):
+    rng = random.Random(seed)
+    pieces = [
+        {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "name": f"{category.capitalize()} {i}",
+            "category": category,
+            "itemType": "SINGLE_PIECE",
+            "colors": rng.sample(COLORS, 2),
+            "materials": [rng.choice(MATERIALS)],
+            "pattern": "uni",
+            "styleTags": rng.sample(STYLES, 2),
+            "occasionTags": rng.sample(OCCASIONS, 2),
+            "seasons": rng.sample(SEASONS, 2),
+            "wearCount": rng.randint(0, 20),
+            "isLook": False,
+        }
+        for i, category in enumerate(rng.choice(CATEGORIES) for _ in range(n_pieces))
+    ]
+    looks = [
+        {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "name": f"Look {i}",
+            "itemType": "OUTFIT",
+            "styleTags": rng.sample(STYLES, 2),
+            "occasionTags": rng.sample(OCCASIONS, 1),
+            "seasons": rng.sample(SEASONS, 2),
+            "isLook": True,
+            "pieces": [{"id": piece["id"], "category": piece["category"], "name": piece["name"]}
+                       for piece in rng.sample(pieces, 3)],
+        }
+        for i in range(n_looks)
+    ]
+    return pieces + looks
+
+
+def legacy_wardrobe(items) -> str:
+    return json.dumps(items, ensure_ascii=False, separators=(",", ":"))
+
+
+def legacy_options(candidates, items_by_id) -> str:
+    keys = ("id", "name", "category", "colors", "materials", "pattern", "styleTags")
+    options = [
+        {"id": "combo-" + "-".join(sorted(item_ids)), "local_score": score,
+         "pieces": [{key: items_by_id[item_id][key] for key in keys if items_by_id[item_id].get(key)} for item_id in item_ids]}
+        for score, item_ids in candidates
+    ]
+    return json.dumps(options, ensure_ascii=False, separators=(",", ":"))
+
+
+def compact_options(candidates, items_by_id) -> str:
+    piece_ids = dict.fromkeys(item_id for _, item_ids in candidates for item_id in item_ids)
+    wardrobe = PromptWardrobe([items_by_id[item_id] for item_id in piece_ids])
+    return encode_options(wardrobe, candidates) + "\n" + wardrobe.text
+
+
+def size(text: str) -> str:
+    return f"{len(text):>7} car. {len(text.encode('utf-8')):>7} octets {len(TOKEN_PATTERN.findall(text)):>7} jetons est."
+
+
+def report(label: str, legacy: str, compact: str) -> None:
+    ratio = len(TOKEN_PATTERN.findall(compact)) / max(len(TOKEN_PATTERN.findall(legacy)), 1)
+    print(f"\n{label}")
+    print(f"  ancien  : {size(legacy)}")
+    print(f"  compact : {size(compact)}  ({(1 - ratio) * 100:.0f}% de jetons en moins)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pieces", type=int, default=150, help="Pièces de la garde-robe (après élagage)")
+    parser.add_argument("--looks", type=int, default=10, help="Tenues enregistrées")
+    parser.add_argument("--candidates", type=int, default=5, help="Tenues candidates du choix final")
+    parser.add_argument("--number", type=int, default=200, help="Répétitions pour la mesure du temps")
+    args = parser.parse_args()
+
+    items = make_wardrobe(args.pieces, args.looks)
+    pieces = [item for item in items if not item["isLook"]]
+    items_by_id = {item["id"]: item for item in pieces}
+    rng = random.Random(1)
+    candidates = [(90 - i, [piece["id"] for piece in rng.sample(pieces, 3)]) for i in range(args.candidates)]
+
+    print(f"📏 Garde-robe synthétique: {args.pieces} pièces, {args.looks} tenues, {args.candidates} candidates")
+    report("Garde-robe (recherche complète par le modèle)", legacy_wardrobe(items), PromptWardrobe(items).text)
+    report("Options (choix final parmi les candidates)", legacy_options(candidates, items_by_id),
+           compact_options(candidates, items_by_id))
+
+    legacy_time = timeit.timeit(lambda: legacy_wardrobe(items), number=args.number) / args.number
+    compact_time = timeit.timeit(lambda: PromptWardrobe(items).text, number=args.number) / args.number
+    print(f"\n⏱️  Encodage de la garde-robe: ancien {legacy_time * 1e3:.2f} ms, compact {compact_time * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
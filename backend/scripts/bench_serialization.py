@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark de la sérialisation des réponses de garde-robe
+
+Compare, sur une garde-robe synthétique, l'ancienne construction des réponses
+(dict comprehension avec isoformat/hasattr puis jsonable_encoder + json.dumps,
+comme le fait FastAPI pour un dict) aux mappers compilés + encodeur rapide, ainsi
+que la re-validation du response_model Union de /analyze face au TypeAdapter.
+
+Usage:
+    python scripts/bench_serialization.py --pieces 2000 --looks 500
+"""
+
+import argparse
+import json
+import sys
+import timeit
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Union
+
+# Ajouter le répertoire parent au path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from core.serialization import dumps, orjson
+from modules.wardrobe.serializers import serialize_pieces, serialize_looks
+from schemas.clothing_analysis import CompleteLookResponse, SinglePieceResponse
+from services.wardrobe_service import LookItemRow, LookPiece, LookRow, PieceRow
+
+
+def make_wardrobe(n_pieces: int, n_looks: int):
+    now = datetime.now(timezone.utc)
+    pieces = [
+        PieceRow(
+            uuid.uuid4(), "tshirt", f"T-shirt {i}", {"primary": ["white"], "secondary": ["black"]},
+            "coton", "uni", "regular", ["crewneck"], ["casual", "minimaliste"], ["weekend"],
+            ["spring", "summer"], f"https://example.com/{i}.jpg", False, i % 7, now
+        )
+        for i in range(n_pieces)
+    ]
+    looks = [
+        LookRow(
+            uuid.uuid4(), uuid.uuid4(), f"Look {i}", ["casual"], ["weekend"], ["summer"],
+            {"primary": ["black"], "accent": []}, ["uni"], None, 1, None, None, False, 0, now,
+            items=tuple(
+                LookItemRow(piece.id, position, {"x": 0.1, "y": 0.2, "width": 0.5, "height": 0.4},
+                            LookPiece(piece.piece_type, piece.name, piece.colors, piece.image_url))
+                for position, piece in enumerate(pieces[i % n_pieces:i % n_pieces + 4])
+            )
+        )
+        for i in range(n_looks)
+    ]
+    return pieces, looks
+
+
+def legacy_pieces(pieces):
+    content = {"pieces": [
+        {
+            "piece_id": str(piece.id), "piece_type": piece.piece_type, "name": piece.name,
+            "colors": piece.colors, "material": piece.material, "pattern": piece.pattern,
+            "fit": piece.fit, "details": piece.details, "style_tags": piece.style_tags,
+            "occasion_tags": piece.occasion_tags, "seasonality": piece.seasonality,
+            "image_url": piece.image_url, "is_favorite": piece.is_favorite,
+            "wear_count": piece.wear_count,
+            "created_at": piece.created_at.isoformat() if piece.created_at else None
+        }
+        for piece in pieces
+    ]}
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False).encode("utf-8")
+
+
+def legacy_looks(looks):
+    content = {"looks": [
+        {
+            "id": str(look.id), "user_id": str(look.user_id), "name": look.name,
+            "dominant_style": look.dominant_style, "occasion_tags": look.occasion_tags,
+            "seasonality": look.seasonality, "color_palette": look.color_palette,
+            "pattern_mix": look.pattern_mix, "silhouette": look.silhouette,
+            "layering_level": look.layering_level, "image_url": look.image_url,
+            "rating": look.rating, "is_favorite": look.is_favorite, "wear_count": look.wear_count,
+            "created_at": look.created_at.isoformat() if look.created_at else None,
+            "pieces": [
+                {
+                    "id": str(item.item_id), "position": item.position, "bounding_box": item.bounding_box,
+                    "piece_type": item.item.piece_type if hasattr(item, 'item') and item.item else None,
+                    "name": item.item.name if hasattr(item, 'item') and item.item else None,
+                    "colors": item.item.colors if hasattr(item, 'item') and item.item else None,
+                    "image_url": item.item.image_url if hasattr(item, 'item') and item.item else None
+                }
+                for item in look.items
+            ] if hasattr(look, 'items') and look.items else []
+        }
+        for look in looks
+    ]}
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False).encode("utf-8")
+
+
+def make_analysis(n_pieces: int) -> CompleteLookResponse:
+    piece = {
+        "piece_type": "tshirt", "name": "T-shirt blanc",
+        "attributes": {"colors": {"primary": ["white"], "secondary": []}, "material": "coton",
+                       "pattern": "uni", "fit": "regular", "details": ["crewneck"]},
+        "style_tags": ["casual"], "occasion_tags": ["weekend"], "seasonality": ["summer"],
+        "bounding_box": {"x": 0.1, "y": 0.1, "width": 0.5, "height": 0.4},
+    }
+    return CompleteLookResponse(
+        capture_type="complete_look",
+        pieces=[dict(piece, piece_id=uuid.uuid4()) for _ in range(n_pieces)],
+        look_meta={"look_id": uuid.uuid4(), "dominant_style": ["casual"], "occasion_tags": ["weekend"],
+                   "seasonality": ["summer"], "color_palette_global": {"primary": ["white"]},
+                   "pattern_mix": ["uni"]},
+    )
+
+
+def report(label, before, after, number):
+    t_before = min(timeit.repeat(before, number=number, repeat=5)) / number * 1000
+    t_after = min(timeit.repeat(after, number=number, repeat=5)) / number * 1000
+    print(f"  {label:<22} avant {t_before:8.3f} ms | après {t_after:8.3f} ms | x{t_before / t_after:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pieces", type=int, default=2000)
+    parser.add_argument("--looks", type=int, default=500)
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+
+    pieces, looks = make_wardrobe(args.pieces, args.looks)
+    analysis = make_analysis(6)
+    union_adapter = TypeAdapter(Union[SinglePieceResponse, CompleteLookResponse])
+
+    # Vérifier que les deux chemins produisent le même JSON
+    assert json.loads(legacy_pieces(pieces)) == json.loads(dumps(serialize_pieces(pieces)))
+    assert json.loads(legacy_looks(looks)) == json.loads(dumps(serialize_looks(looks)))
+
+    print(f"⏱️  Sérialisation ({args.pieces} pièces, {args.looks} tenues, encodeur: {'orjson' if orjson else 'json'})")
+    report("pièces", lambda: legacy_pieces(pieces), lambda: dumps(serialize_pieces(pieces)), args.number)
+    report("tenues", lambda: legacy_looks(looks), lambda: dumps(serialize_looks(looks)), args.number)
+    report(
+        "analyse (Union)",
+        lambda: json.dumps(jsonable_encoder(union_adapter.validate_python(analysis.model_dump()))).encode(),
+        lambda: union_adapter.dump_json(analysis),
+        args.number * 50,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
 """
 Script pour vérifier l'état actuel de la garde-robe
+
+Lit la table matérialisée wardrobe_stats (aucun parcours complet des tables
+de vêtements). --refresh recalcule d'abord les statistiques de tous les
+utilisateurs, par exemple juste après la migration 003.
 """
 
-import os
+import argparse
 import sys
 from pathlib import Path
 
@@ -11,64 +15,67 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from database.connection import get_db
-from database.models import ClothingItem, OutfitLook
-from sqlalchemy import func
+from services.wardrobe_stats import WardrobeStatsService
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def check_wardrobe_status():
+def check_wardrobe_status(refresh: bool = False):
     """Vérifie l'état actuel de la garde-robe dans la base de données"""
-    
+
     db = next(get_db())
-    
+
     try:
-        # Compter les vêtements par utilisateur
-        clothing_stats = db.query(
-            ClothingItem.user_id,
-            func.count(ClothingItem.id).label('count'),
-            func.count(func.distinct(ClothingItem.piece_type)).label('types')
-        ).group_by(ClothingItem.user_id).all()
-        
-        # Compter les tenues par utilisateur
-        outfit_stats = db.query(
-            OutfitLook.user_id,
-            func.count(OutfitLook.id).label('count')
-        ).group_by(OutfitLook.user_id).all()
-        
+        service = WardrobeStatsService(db)
+
+        if refresh:
+            count = service.refresh_all()
+            db.commit()
+            print(f"🔄 Statistiques recalculées pour {count} utilisateurs\n")
+
+        all_stats = service.list_all()
+
         print("=== État de la garde-robe ===\n")
-        
-        if clothing_stats:
+
+        if any(stats.total_items for stats in all_stats):
             print("📦 Vêtements individuels:")
-            for stat in clothing_stats:
-                print(f"  - Utilisateur {stat.user_id}: {stat.count} pièces ({stat.types} types différents)")
+            for stats in all_stats:
+                if stats.total_items:
+                    print(f"  - Utilisateur {stats.user_id}: {stats.total_items} pièces ({len(stats.by_type)} types différents)")
         else:
             print("📦 Aucun vêtement individuel trouvé")
-        
+
         print()
-        
-        if outfit_stats:
+
+        if any(stats.total_looks for stats in all_stats):
             print("👔 Tenues complètes:")
-            for stat in outfit_stats:
-                print(f"  - Utilisateur {stat.user_id}: {stat.count} tenues")
+            for stats in all_stats:
+                if stats.total_looks:
+                    print(f"  - Utilisateur {stats.user_id}: {stats.total_looks} tenues")
         else:
             print("👔 Aucune tenue complète trouvée")
-        
-        # Afficher quelques exemples
-        sample_items = db.query(ClothingItem).limit(3).all()
-        if sample_items:
-            print("\n📋 Exemples de vêtements:")
-            for item in sample_items:
-                print(f"  - {item.name} ({item.piece_type}) - {item.colors}")
-        
+
+        # Répartition par type sur l'ensemble des utilisateurs
+        by_type = {}
+        for stats in all_stats:
+            for piece_type, count in stats.by_type.items():
+                by_type[piece_type] = by_type.get(piece_type, 0) + count
+        if by_type:
+            print("\n📋 Répartition par type:")
+            for piece_type, count in sorted(by_type.items(), key=lambda entry: -entry[1]):
+                print(f"  - {piece_type}: {count}")
+
         # Statistiques globales
-        total_items = db.query(func.count(ClothingItem.id)).scalar()
-        total_looks = db.query(func.count(OutfitLook.id)).scalar()
-        
+        total_items = sum(stats.total_items for stats in all_stats)
+        total_looks = sum(stats.total_looks for stats in all_stats)
+
         print(f"\n📊 Total: {total_items} vêtements et {total_looks} tenues")
-        
+
     finally:
         db.close()
 
 if __name__ == "__main__":
-    check_wardrobe_status()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--refresh", action="store_true", help="Recalculer les statistiques avant l'affichage")
+    args = parser.parse_args()
+    check_wardrobe_status(refresh=args.refresh)
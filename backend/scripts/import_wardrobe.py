@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Script d'import en masse d'une garde-robe depuis un fichier JSONL ou CSV
+
+Le fichier est lu en flux et chargé par paquets (COPY), les lignes invalides
+sont signalées sans interrompre l'import.
+
+Usage:
+    python scripts/import_wardrobe.py garde_robe.jsonl --user-id <uuid>
+    python scripts/import_wardrobe.py export.csv --user-id <uuid> --chunk-size 5000 --dry-run
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from uuid import UUID
+
+# Ajouter le répertoire parent au path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from database.connection import SessionLocal
+from services.wardrobe_import import WardrobeImporter, detect_format, iter_records
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", type=Path, help="Fichier .jsonl ou .csv")
+    parser.add_argument("--user-id", type=UUID, required=True, help="Utilisateur destinataire")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Format (déduit de l'extension par défaut)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Lignes par paquet chargé")
+    parser.add_argument("--dry-run", action="store_true", help="Valider sans rien écrire")
+    args = parser.parse_args()
+
+    file_format = detect_format(args.path.name, args.format)
+    print(f"=== Import de {args.path} ({file_format}) pour l'utilisateur {args.user_id} ===")
+
+    db = SessionLocal()
+    try:
+        with open(args.path, encoding="utf-8-sig", newline="") as stream:
+            importer = WardrobeImporter(db, args.user_id, chunk_size=args.chunk_size, dry_run=args.dry_run)
+            report = importer.run(iter_records(stream, file_format))
+    finally:
+        db.close()
+
+    for error in report.errors:
+        print(f"  ❌ ligne {error.line}: {error.error}")
+    if report.failed > len(report.errors):
+        print(f"  ... et {report.failed - len(report.errors)} autres erreurs")
+
+    rate = report.total / report.duration_s if report.duration_s else 0
+    print(
+        f"\n{'🔎 Validation' if args.dry_run else '✅ Import'} terminé: "
+        f"{report.imported}/{report.total} lignes, {report.failed} en erreur "
+        f"({report.duration_s:.1f}s, {rate:.0f} lignes/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
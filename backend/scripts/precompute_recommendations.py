@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Précalcul des recommandations du jour avant le pic du matin
+
+Parcourt les utilisateurs ayant demandé une recommandation récemment et
+stocke celle du jour pour ceux dont l'heure locale est dans le créneau
+(3h-7h par défaut). Les utilisateurs dont la recommandation stockée
+correspond toujours à leurs entrées sont ignorés : le script se lance sans
+risque toutes les heures, chaque fuseau étant traité pendant sa nuit :
+    0 * * * * python scripts/precompute_recommendations.py --concurrency 8
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from core.config import settings
+from database.connection import SessionLocal
+from modules.recommendations.precompute import precompute_daily_recommendations
+from modules.recommendations.router import service
+from services.weather import close_http_client
+
+
+async def run(args) -> None:
+    try:
+        metrics = await precompute_daily_recommendations(
+            SessionLocal, service,
+            concurrency=args.concurrency,
+            active_days=args.active_days,
+            start_hour=args.start_hour,
+            end_hour=args.end_hour,
+            limit=args.limit,
+            dry_run=args.dry_run,
+        )
+    finally:
+        await close_http_client()
+
+    print(f"\n{'🔎 Simulation' if args.dry_run else '✅ Précalcul'} terminé: {metrics.summary()}")
+    if metrics.failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=settings.RECOMMENDATION_PRECOMPUTE_CONCURRENCY,
+                        help="Utilisateurs calculés en parallèle (appels au modèle simultanés)")
+    parser.add_argument("--active-days", type=int, default=settings.RECOMMENDATION_PRECOMPUTE_ACTIVE_DAYS,
+                        help="Utilisateurs ayant fait une demande dans ces derniers jours")
+    parser.add_argument("--start-hour", type=int, default=settings.RECOMMENDATION_PRECOMPUTE_START_HOUR,
+                        help="Début du créneau (heure locale de la ville)")
+    parser.add_argument("--end-hour", type=int, default=settings.RECOMMENDATION_PRECOMPUTE_END_HOUR,
+                        help="Fin du créneau, exclue (heure locale de la ville)")
+    parser.add_argument("--limit", type=int, default=100000, help="Nombre maximum d'utilisateurs")
+    parser.add_argument("--dry-run", action="store_true", help="Calculer sans stocker les recommandations")
+    args = parser.parse_args()
+
+    if not 0 <= args.start_hour < args.end_hour <= 24:
+        parser.error("--start-hour et --end-hour doivent vérifier 0 <= début < fin <= 24")
+    asyncio.run(run(args))
@@ -0,0 +1,326 @@
+"""
+Journal des analyses (analysis_history) : écriture différée et partitions mensuelles
+
+Chaque sauvegarde d'analyse met une ligne en file d'attente au lieu de
+l'insérer dans la transaction de la requête ; un thread de fond l'écrit par
+lots (INSERT multi-lignes). La table est partitionnée par mois sur
+created_at (UTC) : les partitions sont créées à la demande avant chaque lot
+et les plus anciennes sont supprimées d'un bloc par la tâche de rétention
+(scripts/analysis_history_retention.py), sans DELETE ni VACUUM.
+
+Les mesures de l'appel au modèle (modèle, durée, jetons) ne viennent jamais
+du client : l'analyse les renvoie dans un jeton signé (analysis_token, HMAC)
+que la sauvegarde vérifie avant de les reprendre, sans écriture en base.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import re
+import threading
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Tuple, Union
+from uuid import UUID, uuid4
+
+from sqlalchemy import insert, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database.models import AnalysisHistory
+from schemas.clothing_analysis import CompleteLookResponse, SinglePieceResponse
+
+PARTITION_PREFIX = "analysis_history_p"
+PARTITION_PATTERN = re.compile(rf"^{PARTITION_PREFIX}(\d{{4}})(\d{{2}})$")
+
+# Partitions dont l'existence est déjà vérifiée par ce worker
+_known_partitions = set()
+
+
+def month_start(moment: Union[date, datetime]) -> date:
+    """Premier jour du mois (UTC pour les datetime avec fuseau)"""
+    if isinstance(moment, datetime) and moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return date(moment.year, moment.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+
+def ensure_partitions(db: Session, months: Iterable[date]) -> List[str]:
+    """Crée les partitions mensuelles manquantes (et valide). Retourne les partitions créées."""
+    missing = sorted({month_start(month) for month in months} - _known_partitions)
+    if not missing:
+        return []
+
+    existing = {month for _, month in list_partitions(db)}
+    created = []
+    for month in missing:
+        if month not in existing:
+            # Verrou transactionnel : plusieurs workers peuvent créer le même mois
+            db.execute(text("SELECT pg_advisory_xact_lock(hashtext('analysis_history_partitions'))"))
+            db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF analysis_history "
+                f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{add_months(month, 1).isoformat()} 00:00:00+00')"
+            ))
+            created.append(partition_name(month))
+    db.commit()
+    _known_partitions.update(missing)
+    return created
+
+
+def list_partitions(db: Session) -> List[Tuple[str, date]]:
+    """(nom, mois) des partitions mensuelles existantes, de la plus ancienne à la plus récente"""
+    names = db.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'analysis_history'::regclass"
+    )).scalars()
+    partitions = []
+    for name in names:
+        match = PARTITION_PATTERN.match(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def drop_expired_partitions(db: Session, retention_months: int, now: Optional[datetime] = None,
+                            dry_run: bool = False) -> List[str]:
+    """Supprime les partitions entièrement antérieures à la fenêtre de rétention.
+
+    Le mois courant et les `retention_months` mois précédents sont conservés.
+    """
+    cutoff = add_months(month_start(now or datetime.now(timezone.utc)), -retention_months)
+    expired = [name for name, month in list_partitions(db) if month < cutoff]
+    if not dry_run:
+        for name in expired:
+            db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        db.commit()
+        _known_partitions.difference_update(
+            month for month in list(_known_partitions) if month < cutoff
+        )
+    return expired
+
+
+def _analysis_subject(analysis: Union[SinglePieceResponse, CompleteLookResponse]) -> str:
+    """Identité de l'analyse couverte par le jeton : type de capture, tenue et pièces"""
+    look_id = analysis.look_meta.look_id if isinstance(analysis, CompleteLookResponse) else ""
+    piece_ids = ",".join(sorted(str(piece.piece_id) for piece in analysis.pieces))
+    return f"{analysis.capture_type}|{look_id}|{piece_ids}"
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _unb64(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def _signature(secret: str, payload: str) -> str:
+    return _b64(hmac.new(secret.encode(), payload.encode(), hashlib.sha256).digest())
+
+
+def sign_analysis(analysis: Union[SinglePieceResponse, CompleteLookResponse], secret: str,
+                  now: Optional[datetime] = None) -> str:
+    """Signe les mesures de l'appel (analysis_meta) et renseigne analysis.analysis_token, sans accès à la base"""
+    meta = analysis.analysis_meta
+    issued_at = int((now or datetime.now(timezone.utc)).timestamp())
+    payload = _b64(json.dumps({
+        "subject": _analysis_subject(analysis),
+        "issued_at": issued_at,
+        "model_used": meta.model_used if meta else None,
+        "duration_ms": meta.duration_ms if meta else None,
+        "prompt_tokens": meta.prompt_tokens if meta else None,
+        "completion_tokens": meta.completion_tokens if meta else None,
+    }, separators=(",", ":")).encode())
+    analysis.analysis_token = f"{payload}.{_signature(secret, payload)}"
+    return analysis.analysis_token
+
+
+def verify_analysis_token(analysis: Union[SinglePieceResponse, CompleteLookResponse], secret: str,
+                          max_age: timedelta, now: Optional[datetime] = None) -> Optional[dict]:
+    """Mesures signées à l'analyse ; None si le jeton manque, est altéré, expiré ou couvre une autre analyse"""
+    token = analysis.analysis_token
+    if not token:
+        return None
+    try:
+        payload, signature = token.split(".")
+        if not hmac.compare_digest(signature, _signature(secret, payload)):
+            return None
+        claims = json.loads(_unb64(payload))
+    except ValueError:
+        return None
+
+    age = (now or datetime.now(timezone.utc)).timestamp() - claims["issued_at"]
+    if claims["subject"] != _analysis_subject(analysis) or not 0 <= age <= max_age.total_seconds():
+        return None
+    return {key: claims[key] for key in ("model_used", "duration_ms", "prompt_tokens", "completion_tokens")}
+
+
+def build_analysis_record(
+    user_id: UUID,
+    analysis: Union[SinglePieceResponse, CompleteLookResponse],
+    created_item_id: Optional[UUID] = None,
+    created_look_id: Optional[UUID] = None,
+    run: Optional[dict] = None,
+) -> dict:
+    """Ligne analysis_history d'une analyse sauvegardée (mesures reprises du jeton vérifié, jamais du client)"""
+    run = run or {}
+    return {
+        "id": uuid4(),
+        "created_at": datetime.now(timezone.utc),
+        "user_id": user_id,
+        "capture_type": analysis.capture_type,
+        "raw_analysis": analysis.model_dump(mode="json", exclude_none=True, exclude={"analysis_token", "analysis_meta"}),
+        "created_item_id": created_item_id,
+        "created_look_id": created_look_id,
+        "analysis_duration_ms": run.get("duration_ms"),
+        "model_used": run.get("model_used"),
+        "prompt_tokens": run.get("prompt_tokens"),
+        "completion_tokens": run.get("completion_tokens"),
+    }
+
+
+class AnalysisLogQueue:
+    """File thread-safe des lignes à écrire ; les plus anciennes sont abandonnées au-delà de max_pending"""
+
+    def __init__(self, batch_size: int = 500, max_pending: int = 20000):
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._records = deque()
+        self._lock = threading.Lock()
+        self.full = threading.Event()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def enqueue(self, record: dict) -> None:
+        self._extend([record])
+
+    def drain(self) -> List[dict]:
+        """Retire et retourne toutes les lignes en attente"""
+        with self._lock:
+            records, self._records = list(self._records), deque()
+            self.full.clear()
+        return records
+
+    def restore(self, records: List[dict]) -> None:
+        """Remet en tête des lignes non écrites (après un échec de vidage)"""
+        with self._lock:
+            self._records.extendleft(reversed(records))
+            self._trim()
+
+    def _extend(self, records: List[dict]) -> None:
+        with self._lock:
+            self._records.extend(records)
+            self._trim()
+
+    def _trim(self) -> None:
+        while len(self._records) > self.max_pending:
+            self._records.popleft()
+            self.dropped += 1
+        if len(self._records) >= self.batch_size:
+            self.full.set()
+
+
+def _insert_one_by_one(db: Session, records: List[dict]) -> int:
+    """Repli après un lot refusé : une ligne par savepoint, les lignes invalides sont ignorées"""
+    written = 0
+    for record in records:
+        try:
+            with db.begin_nested():
+                db.execute(insert(AnalysisHistory.__table__), record)
+            written += 1
+        except IntegrityError as e:
+            # Typiquement : pièce ou tenue supprimée avant l'écriture différée
+            print(f"⚠️ Historique d'analyse ignoré ({record['id']}): {e.orig}")
+    db.commit()
+    return written
+
+
+def flush_analysis_log(queue: AnalysisLogQueue, session_factory) -> int:
+    """Écrit les lignes en attente par lots. Retourne le nombre de lignes écrites."""
+    records = queue.drain()
+    if not records:
+        return 0
+
+    db = session_factory()
+    pending = records
+    written = 0
+    try:
+        ensure_partitions(db, (record["created_at"] for record in records))
+        while pending:
+            batch = pending[:queue.batch_size]
+            try:
+                db.execute(insert(AnalysisHistory.__table__), batch)
+                db.commit()
+                written += len(batch)
+            except IntegrityError:
+                db.rollback()
+                written += _insert_one_by_one(db, batch)
+            pending = pending[len(batch):]
+    except Exception:
+        db.rollback()
+        queue.restore(pending)
+        raise
+    finally:
+        db.close()
+    return written
+
+
+class AnalysisLogFlusher(threading.Thread):
+    """Vide la file à intervalle régulier, plus tôt si un lot est complet, et une dernière fois à l'arrêt"""
+
+    def __init__(self, queue: AnalysisLogQueue, session_factory, interval: float):
+        super().__init__(name="analysis-log-flusher", daemon=True)
+        self.queue = queue
+        self.session_factory = session_factory
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def stop(self, timeout: Optional[float] = 10.0) -> None:
+        self._stopped.set()
+        self.queue.full.set()  # Réveiller le thread immédiatement
+        self.join(timeout)
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            self.queue.full.wait(self.interval)
+            self._flush()
+        self._flush()
+
+    def _flush(self) -> None:
+        try:
+            flush_analysis_log(self.queue, self.session_factory)
+        except Exception as e:
+            print(f"⚠️ Échec de l'écriture de l'historique d'analyse ({len(self.queue)} en attente): {type(e).__name__}: {e}")
+            self._stopped.wait(self.interval)
+
+
+analysis_log = AnalysisLogQueue()
+_flusher: Optional[AnalysisLogFlusher] = None
+
+
+def start_analysis_log_flusher(session_factory) -> None:
+    """Démarre l'écriture différée de l'historique (à appeler au démarrage de chaque worker)"""
+    from core.config import settings
+
+    global _flusher
+    if _flusher is None or not _flusher.is_alive():
+        analysis_log.batch_size = settings.ANALYSIS_LOG_BATCH_SIZE
+        analysis_log.max_pending = settings.ANALYSIS_LOG_MAX_PENDING
+        _flusher = AnalysisLogFlusher(analysis_log, session_factory, settings.ANALYSIS_LOG_FLUSH_INTERVAL)
+        _flusher.start()
+
+
+def stop_analysis_log_flusher() -> None:
+    """Arrête le thread après un dernier vidage (à appeler à l'arrêt du worker)"""
+    if _flusher is not None:
+        _flusher.stop()
@@ -1,8 +1,10 @@
 import json
+import time
 import uuid
 from typing import Dict, List, Union
 from openai import OpenAI
 from schemas.clothing_analysis import (
+    AnalysisMeta,
     SinglePieceResponse,
     CompleteLookResponse,
     ClothingPiece,
@@ -15,6 +17,8 @@ from schemas.clothing_analysis import (
 
 
 class ClothingAnalyzer:
+    MODEL = "gpt-4o"
+    
     def __init__(self, openai_client: OpenAI):
         self.client = openai_client
     
@@ -22,10 +26,11 @@ class ClothingAnalyzer:
         """Analyse une image et retourne la structure appropriée selon le type"""
         
         prompt = self._get_prompt(is_single_piece)
+        started_at = time.perf_counter()
         
         try:
             response = self.client.chat.completions.create(
-                model="gpt-4o",
+                model=self.MODEL,
                 messages=[
                     {
                         "role": "system",
@@ -78,9 +83,19 @@ class ClothingAnalyzer:
         
         # Générer les UUIDs côté serveur (pas par GPT-4)
         if is_single_piece:
-            return self._build_single_piece_response(data)
+            result = self._build_single_piece_response(data)
         else:
-            return self._build_complete_look_response(data)
+            result = self._build_complete_look_response(data)
+        
+        # Mesures réelles de l'appel, reprises dans analysis_history à la sauvegarde
+        usage = getattr(response, "usage", None)
+        result.analysis_meta = AnalysisMeta(
+            model_used=getattr(response, "model", None) or self.MODEL,
+            duration_ms=int((time.perf_counter() - started_at) * 1000),
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            completion_tokens=getattr(usage, "completion_tokens", None),
+        )
+        return result
     
     def _get_prompt(self, is_single_piece: bool) -> str:
         """Retourne le prompt approprié selon le type d'analyse"""
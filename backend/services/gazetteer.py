@@ -0,0 +1,197 @@
+"""
+Répertoire de villes embarqué (data/gazetteer.tsv) : résolution hors ligne
+
+Les villes sont chargées une fois dans des tableaux compacts (noms et fuseaux
+partagés, coordonnées numpy). La recherche par nom ignore la casse, les
+accents, les tirets et les apostrophes (recherche exacte et par préfixe dans
+les clés triées) ; la recherche inverse depuis des coordonnées GPS parcourt
+une grille de cellules de 1° autour de la position. Le lever et le coucher du
+soleil sont calculés localement (équation du lever du soleil, précision de
+l'ordre de la minute) dans le fuseau de la ville.
+"""
+import bisect
+import math
+import sys
+import unicodedata
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+GAZETTEER_PATH = Path(__file__).resolve().parent.parent / "data" / "gazetteer.tsv"
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.2
+
+COUNTRY_NAMES = {
+    "FR": "France", "RE": "La Réunion", "MQ": "Martinique", "GP": "Guadeloupe", "GF": "Guyane",
+    "YT": "Mayotte", "NC": "Nouvelle-Calédonie", "PF": "Polynésie française", "MC": "Monaco",
+    "BE": "Belgique", "CH": "Suisse", "LU": "Luxembourg", "GB": "Royaume-Uni", "IE": "Irlande",
+    "ES": "Espagne", "PT": "Portugal", "IT": "Italie", "DE": "Allemagne", "NL": "Pays-Bas",
+    "AT": "Autriche", "CZ": "Tchéquie", "PL": "Pologne", "HU": "Hongrie", "DK": "Danemark",
+    "SE": "Suède", "NO": "Norvège", "FI": "Finlande", "GR": "Grèce", "TR": "Turquie",
+    "RU": "Russie", "UA": "Ukraine", "RO": "Roumanie", "IS": "Islande", "MA": "Maroc",
+    "DZ": "Algérie", "TN": "Tunisie", "SN": "Sénégal", "CI": "Côte d'Ivoire", "ML": "Mali",
+    "BF": "Burkina Faso", "NE": "Niger", "GN": "Guinée", "TG": "Togo", "BJ": "Bénin",
+    "CM": "Cameroun", "GA": "Gabon", "CD": "RD Congo", "CG": "Congo", "MG": "Madagascar",
+    "MU": "Maurice", "EG": "Égypte", "NG": "Nigeria", "KE": "Kenya", "ZA": "Afrique du Sud",
+    "AE": "Émirats arabes unis", "LB": "Liban", "IL": "Israël", "SA": "Arabie saoudite",
+    "QA": "Qatar", "JP": "Japon", "KR": "Corée du Sud", "CN": "Chine", "HK": "Hong Kong",
+    "SG": "Singapour", "TH": "Thaïlande", "VN": "Viêt Nam", "IN": "Inde", "ID": "Indonésie",
+    "PH": "Philippines", "MY": "Malaisie", "TW": "Taïwan", "AU": "Australie",
+    "NZ": "Nouvelle-Zélande", "US": "États-Unis", "CA": "Canada", "MX": "Mexique",
+    "BR": "Brésil", "AR": "Argentine", "CL": "Chili", "PE": "Pérou", "CO": "Colombie",
+}
+
+
+class City(NamedTuple):
+    name: str
+    country_code: str
+    latitude: float
+    longitude: float
+    timezone: str
+
+    @property
+    def country(self) -> str:
+        return COUNTRY_NAMES.get(self.country_code, self.country_code)
+
+
+def normalize_name(name: str) -> str:
+    """Clé de recherche : minuscules, sans accents, tirets et apostrophes remplacés par des espaces"""
+    decomposed = unicodedata.normalize("NFKD", name.strip().lower())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    for separator in "-'’.":
+        stripped = stripped.replace(separator, " ")
+    return " ".join(stripped.split())
+
+
+def haversine_km(lat1: float, lon1: float, lat2, lon2):
+    """Distance orthodromique (lat2/lon2 peuvent être des tableaux numpy)"""
+    lat1, lon1, lat2, lon2 = np.radians(lat1), np.radians(lon1), np.radians(lat2), np.radians(lon2)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class Gazetteer:
+    """Index des villes : recherche par nom (exacte, préfixe) et par position"""
+
+    def __init__(self, rows: List[Tuple[str, str, float, float, str]]):
+        self.names = [row[0] for row in rows]
+        # Codes pays et fuseaux partagés entre les villes (chaînes internées)
+        self.countries = [sys.intern(row[1].upper()) for row in rows]
+        self.timezones = [sys.intern(row[4]) for row in rows]
+        self.latitudes = np.array([row[2] for row in rows], dtype=np.float64)
+        self.longitudes = np.array([row[3] for row in rows], dtype=np.float64)
+
+        # Clés normalisées triées ; à clé égale, l'ordre du fichier (priorité des homonymes)
+        entries = sorted((normalize_name(name), index) for index, name in enumerate(self.names))
+        self._keys = [key for key, _ in entries]
+        self._indexes = np.array([index for _, index in entries], dtype=np.int32)
+
+        self._grid: Dict[Tuple[int, int], List[int]] = {}
+        for index, (lat, lon) in enumerate(zip(self.latitudes, self.longitudes)):
+            self._grid.setdefault(self._cell(lat, lon), []).append(index)
+
+    @classmethod
+    def load(cls, path: Path = GAZETTEER_PATH) -> "Gazetteer":
+        rows = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                name, country, lat, lon, tz = line.rstrip("\n").split("\t")
+                rows.append((name, country, float(lat), float(lon), tz))
+        return cls(rows)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def city(self, index: int) -> City:
+        return City(self.names[index], self.countries[index], float(self.latitudes[index]),
+                    float(self.longitudes[index]), self.timezones[index])
+
+    @staticmethod
+    def _cell(lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat), math.floor(lon)
+
+    def _matches(self, key: str, prefix: bool) -> List[int]:
+        start = bisect.bisect_left(self._keys, key)
+        end = start
+        while end < len(self._keys) and (self._keys[end].startswith(key) if prefix else self._keys[end] == key):
+            end += 1
+        return [int(index) for index in self._indexes[start:end]]
+
+    def lookup(self, name: str, country_code: Optional[str] = None) -> Optional[City]:
+        """Ville de ce nom (du pays demandé en priorité), None si absente du répertoire"""
+        indexes = self._matches(normalize_name(name), prefix=False)
+        if country_code:
+            country_code = country_code.upper()
+            indexes = sorted(indexes, key=lambda index: self.countries[index] != country_code)
+        return self.city(indexes[0]) if indexes else None
+
+    def search(self, prefix: str, country_code: Optional[str] = None, limit: int = 10) -> List[City]:
+        """Villes dont le nom commence par prefix (autocomplétion), les plus courts d'abord"""
+        key = normalize_name(prefix)
+        if not key:
+            return []
+        indexes = self._matches(key, prefix=True)
+        country_code = country_code.upper() if country_code else None
+        indexes.sort(key=lambda index: (country_code is not None and self.countries[index] != country_code,
+                                        len(self.names[index]), index))
+        return [self.city(index) for index in indexes[:limit]]
+
+    def nearest(self, latitude: float, longitude: float, max_distance_km: float = 50) -> Optional[City]:
+        """Ville la plus proche d'une position, None au-delà de max_distance_km"""
+        # Cellules à parcourir : rayon en degrés de latitude, élargi en longitude selon la latitude
+        lat_cells = math.ceil(max_distance_km / KM_PER_DEGREE)
+        cos_lat = max(math.cos(math.radians(min(abs(latitude) + lat_cells, 89.0))), 0.01)
+        lon_cells = min(math.ceil(max_distance_km / (KM_PER_DEGREE * cos_lat)), 180)
+        row, col = self._cell(latitude, longitude)
+
+        candidates = [
+            index
+            for d_lat in range(-lat_cells, lat_cells + 1)
+            for d_lon in range(-lon_cells, lon_cells + 1)
+            for index in self._grid.get((row + d_lat, (col + d_lon + 180) % 360 - 180), ())
+        ]
+        if not candidates:
+            return None
+        candidates = np.array(candidates)
+        distances = haversine_km(latitude, longitude, self.latitudes[candidates], self.longitudes[candidates])
+        best = int(np.argmin(distances))
+        return self.city(int(candidates[best])) if distances[best] <= max_distance_km else None
+
+
+@lru_cache(maxsize=1)
+def get_gazetteer() -> Gazetteer:
+    """Répertoire embarqué, chargé au premier usage"""
+    return Gazetteer.load()
+
+
+def sun_times(latitude: float, longitude: float, day: date, tz: str) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Lever et coucher du soleil (heure locale du fuseau tz) ; None pendant la nuit ou le jour polaire"""
+    # Jours depuis J2000 (1er janvier 2000, 12h UTC), corrigés de la longitude
+    j_star = (day - date(2000, 1, 1)).days - longitude / 360
+    anomaly = math.radians((357.5291 + 0.98560028 * j_star) % 360)
+    center = 1.9148 * math.sin(anomaly) + 0.0200 * math.sin(2 * anomaly) + 0.0003 * math.sin(3 * anomaly)
+    ecliptic = math.radians((math.degrees(anomaly) + center + 180 + 102.9372) % 360)
+    transit = j_star + 0.0053 * math.sin(anomaly) - 0.0069 * math.sin(2 * ecliptic)
+
+    declination = math.asin(math.sin(ecliptic) * math.sin(math.radians(23.4397)))
+    phi = math.radians(latitude)
+    cos_hour_angle = (math.sin(math.radians(-0.833)) - math.sin(phi) * math.sin(declination)) / (
+        math.cos(phi) * math.cos(declination)
+    )
+    if not -1 <= cos_hour_angle <= 1:
+        return None, None
+    hour_angle = math.degrees(math.acos(cos_hour_angle)) / 360
+
+    j2000 = datetime(2000, 1, 1, 12, tzinfo=timezone.utc)
+    zone = ZoneInfo(tz)
+    return (
+        (j2000 + timedelta(days=transit - hour_angle)).astimezone(zone),
+        (j2000 + timedelta(days=transit + hour_angle)).astimezone(zone),
+    )
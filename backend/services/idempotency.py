@@ -0,0 +1,288 @@
+"""
+Clés d'idempotence des écritures (en-tête Idempotency-Key)
+
+La première requête portant une clé la réserve (INSERT ... ON CONFLICT, validé
+aussitôt : visible de tous les workers), exécute le traitement puis enregistre
+sa réponse. Une requête répétée avec la même clé rejoue cette réponse ; une
+requête concurrente attend qu'elle soit disponible au lieu de refaire le
+travail. Une clé réutilisée avec un autre contenu est refusée. En cas d'échec
+la réservation est libérée pour permettre une nouvelle tentative ; une
+réservation abandonnée (worker arrêté) est reprise après IDEMPOTENCY_LOCK_TIMEOUT.
+Tant que le traitement dure, la réservation est rafraîchie (locked_at) au tiers
+de ce délai : un traitement lent n'est jamais repris par une autre requête.
+
+Les accès à la base sont synchrones (IdempotencyBackend) et exécutés hors de la
+boucle d'événements ; le backend est injecté, IdempotencyStore se teste sans base.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Awaitable, Callable, NamedTuple, Optional, Protocol
+from uuid import UUID
+
+from sqlalchemy import text
+
+# Attente entre deux lectures d'une clé en cours de traitement (progressive)
+POLL_INITIAL_DELAY = 0.05
+POLL_MAX_DELAY = 1.0
+
+# Clés expirées supprimées au passage par chaque réservation
+PURGE_BATCH_SIZE = 20
+
+# Tentatives d'enregistrement de la réponse une fois le traitement validé
+COMPLETE_ATTEMPTS = 3
+
+CLAIM_SQL = text("""
+INSERT INTO idempotency_keys (user_id, scope, key, request_hash, status, locked_at, expires_at)
+VALUES (:user_id, :scope, :key, :request_hash, 'in_progress', now(), now() + make_interval(secs => :ttl))
+ON CONFLICT (user_id, scope, key) DO UPDATE
+SET request_hash = EXCLUDED.request_hash,
+    status = 'in_progress',
+    response_status = NULL,
+    response_body = NULL,
+    locked_at = now(),
+    expires_at = EXCLUDED.expires_at
+WHERE idempotency_keys.expires_at < now()
+   OR (idempotency_keys.status = 'in_progress'
+       AND idempotency_keys.locked_at < now() - make_interval(secs => :lock_timeout))
+RETURNING 1
+""")
+
+PURGE_SQL = text("""
+DELETE FROM idempotency_keys
+WHERE ctid = ANY(ARRAY(
+    SELECT ctid FROM idempotency_keys WHERE expires_at < now()
+    LIMIT :limit FOR UPDATE SKIP LOCKED
+))
+""")
+
+LOOKUP_SQL = text("""
+SELECT status, request_hash, response_status, response_body
+FROM idempotency_keys
+WHERE user_id = :user_id AND scope = :scope AND key = :key
+""")
+
+COMPLETE_SQL = text("""
+UPDATE idempotency_keys
+SET status = 'completed', response_status = :status_code, response_body = CAST(:body AS jsonb)
+WHERE user_id = :user_id AND scope = :scope AND key = :key AND status = 'in_progress'
+""")
+
+REFRESH_SQL = text("""
+UPDATE idempotency_keys
+SET locked_at = now()
+WHERE user_id = :user_id AND scope = :scope AND key = :key AND status = 'in_progress'
+""")
+
+RELEASE_SQL = text("""
+DELETE FROM idempotency_keys
+WHERE user_id = :user_id AND scope = :scope AND key = :key AND status = 'in_progress'
+""")
+
+
+class IdempotencyKeyMismatch(Exception):
+    """La clé a déjà servi pour une requête différente"""
+    http_status = 422
+
+
+class IdempotencyKeyInProgress(Exception):
+    """La requête d'origine est toujours en cours après le délai d'attente"""
+    http_status = 409
+
+
+class StoredResponse(NamedTuple):
+    status_code: int
+    body: Any
+
+
+class IdempotentOutcome(NamedTuple):
+    status_code: int
+    body: Any
+    replayed: bool  # Réponse rejouée d'une requête précédente
+
+
+class KeyState(NamedTuple):
+    status: str  # 'in_progress' | 'completed'
+    request_hash: str
+    response_status: Optional[int]
+    response_body: Any
+
+
+def request_fingerprint(payload: Any) -> str:
+    """Empreinte stable du contenu d'une requête (indépendante de l'ordre des clés)"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class IdempotencyBackend(Protocol):
+    """Accès synchrones aux clés d'un endpoint"""
+
+    def claim(self, user_id: UUID, key: str, request_hash: str) -> bool:
+        """Réserve la clé si elle est libre, expirée ou abandonnée"""
+        ...
+
+    def lookup(self, user_id: UUID, key: str) -> Optional[KeyState]:
+        ...
+
+    def refresh(self, user_id: UUID, key: str) -> None:
+        """Prolonge la réservation d'un traitement en cours"""
+        ...
+
+    def complete(self, user_id: UUID, key: str, status_code: int, body: Any) -> bool:
+        """Enregistre la réponse ; False si la réservation n'existe plus"""
+        ...
+
+    def release(self, user_id: UUID, key: str) -> None:
+        ...
+
+
+class DatabaseIdempotencyBackend:
+    """Clés stockées dans idempotency_keys, une session courte par accès"""
+
+    def __init__(self, session_factory, scope: str):
+        from core.config import settings
+
+        self.session_factory = session_factory
+        self.scope = scope
+        self.ttl = settings.IDEMPOTENCY_KEY_TTL
+        self.lock_timeout = settings.IDEMPOTENCY_LOCK_TIMEOUT
+
+    def _execute(self, statement, params: dict, fetch: bool = False):
+        db = self.session_factory()
+        try:
+            result = db.execute(statement, {"scope": self.scope, **params})
+            outcome = result.first() if fetch else result.rowcount
+            db.commit()
+            return outcome
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def claim(self, user_id: UUID, key: str, request_hash: str) -> bool:
+        db = self.session_factory()
+        try:
+            db.execute(PURGE_SQL, {"limit": PURGE_BATCH_SIZE})
+            claimed = db.execute(CLAIM_SQL, {
+                "user_id": user_id, "scope": self.scope, "key": key, "request_hash": request_hash,
+                "ttl": self.ttl, "lock_timeout": self.lock_timeout,
+            }).first() is not None
+            db.commit()
+            return claimed
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def lookup(self, user_id: UUID, key: str) -> Optional[KeyState]:
+        row = self._execute(LOOKUP_SQL, {"user_id": user_id, "key": key}, fetch=True)
+        return KeyState(*row) if row is not None else None
+
+    def refresh(self, user_id: UUID, key: str) -> None:
+        self._execute(REFRESH_SQL, {"user_id": user_id, "key": key})
+
+    def complete(self, user_id: UUID, key: str, status_code: int, body: Any) -> bool:
+        return self._execute(COMPLETE_SQL, {
+            "user_id": user_id, "key": key, "status_code": status_code,
+            "body": json.dumps(body, default=str),
+        }) > 0
+
+    def release(self, user_id: UUID, key: str) -> None:
+        self._execute(RELEASE_SQL, {"user_id": user_id, "key": key})
+
+
+class IdempotencyStore:
+    """Réservation, rafraîchissement et rejeu des réponses pour un endpoint"""
+
+    def __init__(self, backend: IdempotencyBackend, wait_timeout: Optional[float] = None,
+                 lock_timeout: Optional[float] = None):
+        if wait_timeout is None or lock_timeout is None:
+            from core.config import settings
+
+            wait_timeout = settings.IDEMPOTENCY_WAIT_TIMEOUT if wait_timeout is None else wait_timeout
+            lock_timeout = settings.IDEMPOTENCY_LOCK_TIMEOUT if lock_timeout is None else lock_timeout
+        self.backend = backend
+        self.wait_timeout = wait_timeout
+        self.lock_timeout = lock_timeout
+
+    async def begin(self, user_id: UUID, key: str, request_hash: str) -> Optional[StoredResponse]:
+        """Réserve la clé (retourne None : l'appelant traite la requête) ou retourne la réponse à rejouer.
+
+        Lève IdempotencyKeyMismatch si la clé a servi pour un autre contenu,
+        IdempotencyKeyInProgress si la requête d'origine ne se termine pas à temps.
+        """
+        deadline = time.monotonic() + self.wait_timeout
+        delay = POLL_INITIAL_DELAY
+        while True:
+            if await asyncio.to_thread(self.backend.claim, user_id, key, request_hash):
+                return None
+
+            state = await asyncio.to_thread(self.backend.lookup, user_id, key)
+            if state is not None:
+                if state.request_hash != request_hash:
+                    raise IdempotencyKeyMismatch(f"La clé d'idempotence {key} a déjà été utilisée pour une autre requête")
+                if state.status == "completed":
+                    return StoredResponse(state.response_status, state.response_body)
+
+            # Requête d'origine en cours (ou réservation libérée entre-temps : nouvelle tentative)
+            if time.monotonic() >= deadline:
+                raise IdempotencyKeyInProgress(f"Une requête avec la clé {key} est déjà en cours de traitement")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, POLL_MAX_DELAY)
+
+    async def _keep_alive(self, user_id: UUID, key: str) -> None:
+        """Rafraîchit la réservation au tiers du délai de reprise, jusqu'à annulation"""
+        interval = max(self.lock_timeout / 3, POLL_INITIAL_DELAY)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.backend.refresh, user_id, key)
+            except Exception as e:
+                print(f"⚠️ Réservation d'idempotence {key} non rafraîchie: {type(e).__name__}: {e}")
+
+    async def complete(self, user_id: UUID, key: str, status_code: int, body: Any) -> None:
+        """Enregistre la réponse à rejouer ; un échec est journalisé, jamais propagé.
+
+        Le traitement est déjà validé : la réponse doit parvenir au client. Sans
+        réponse enregistrée, la réservation est reprise après le délai de reprise.
+        """
+        delay = POLL_INITIAL_DELAY
+        for attempt in range(1, COMPLETE_ATTEMPTS + 1):
+            try:
+                if not await asyncio.to_thread(self.backend.complete, user_id, key, status_code, body):
+                    print(f"⚠️ Réservation d'idempotence {key} reprise avant la fin du traitement : réponse non enregistrée")
+                return
+            except Exception as e:
+                print(f"⚠️ Réponse d'idempotence {key} non enregistrée (tentative {attempt}/{COMPLETE_ATTEMPTS}): {type(e).__name__}: {e}")
+                if attempt < COMPLETE_ATTEMPTS:
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, POLL_MAX_DELAY)
+
+    async def release(self, user_id: UUID, key: str) -> None:
+        """Libère la réservation après un échec, pour qu'une nouvelle tentative puisse traiter la requête"""
+        try:
+            await asyncio.to_thread(self.backend.release, user_id, key)
+        except Exception as e:
+            # L'erreur du traitement reste celle renvoyée ; la clé sera reprise après le délai de reprise
+            print(f"⚠️ Réservation d'idempotence {key} non libérée: {type(e).__name__}: {e}")
+
+    async def run(self, user_id: UUID, key: str, request_hash: str,
+                  work: Callable[[], Awaitable[Any]], status_code: int = 200) -> IdempotentOutcome:
+        """Exécute work une seule fois pour la clé, ou rejoue la réponse de la première exécution"""
+        stored = await self.begin(user_id, key, request_hash)
+        if stored is not None:
+            return IdempotentOutcome(stored.status_code, stored.body, replayed=True)
+
+        keep_alive = asyncio.create_task(self._keep_alive(user_id, key))
+        try:
+            body = await work()
+        except BaseException:
+            await self.release(user_id, key)
+            raise
+        finally:
+            keep_alive.cancel()
+        await self.complete(user_id, key, status_code, body)
+        return IdempotentOutcome(status_code, body, replayed=False)
@@ -0,0 +1,369 @@
+"""
+Générateur local de tenues : combinaisons valides et score vectorisé
+
+Les règles de composition du prompt sont appliquées par construction :
+- un haut et un bas, ou une robe seule ;
+- jamais de robe avec un haut ou un bas, jamais deux bas ;
+- au plus une couche extérieure (veste, manteau...) et une paire de chaussures.
+
+Chaque pièce reçoit un score propre (adéquation météo, favori, fraîcheur,
+correspondance avec le besoin exprimé) et chaque paire un score de
+compatibilité (harmonie des couleurs, recouvrement des styles et des
+occasions), calculés en matrices NumPy. Les pièces les moins bien notées de
+chaque rôle sont élaguées avant de noter la grille haut x bas ; les
+meilleures bases reçoivent ensuite, si elle améliore le score, la meilleure
+couche extérieure et les meilleures chaussures. Les tenues complètes
+enregistrées sont candidates telles quelles.
+
+Les tenues déjà recommandées (clé canonique : ids triés des pièces, ou id de
+la tenue enregistrée) sont écartées pendant la génération. Seuls les K
+meilleurs candidats sont proposés au modèle ; le premier sert de
+recommandation en mode entièrement local.
+"""
+import re
+from typing import Any, Container, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Rôles des pièces (vocabulaire normalisé de l'analyse et variantes courantes)
+TOPS = frozenset({"tshirt", "t-shirt", "shirt", "top", "blouse", "polo", "tank", "debardeur",
+                  "sweater", "pullover", "hoodie", "sweatshirt", "pull", "sweat"})
+BOTTOMS = frozenset({"pants", "jeans", "shorts", "skirt", "trousers", "pantalon", "jupe", "short"})
+DRESSES = frozenset({"dress", "robe", "jumpsuit", "combinaison"})
+LAYERS = frozenset({"jacket", "blazer", "coat", "vest", "cardigan", "veste", "manteau", "doudoune", "parka", "trench"})
+SHOES = frozenset({"shoes", "sneakers", "boots", "sandals", "chaussures", "baskets", "bottes"})
+
+# Chaleur relative (0 : très léger, 1 : très chaud)
+TYPE_WARMTH = {
+    "tank": 0.0, "debardeur": 0.0, "shorts": 0.05, "short": 0.05, "sandals": 0.05,
+    "tshirt": 0.15, "t-shirt": 0.15, "top": 0.15, "polo": 0.2, "skirt": 0.25, "jupe": 0.25,
+    "dress": 0.25, "robe": 0.25, "shirt": 0.3, "blouse": 0.3, "sneakers": 0.4, "shoes": 0.4,
+    "pants": 0.45, "trousers": 0.45, "pantalon": 0.45, "jeans": 0.5, "vest": 0.5, "blazer": 0.55,
+    "jacket": 0.6, "veste": 0.6, "cardigan": 0.6, "hoodie": 0.7, "sweatshirt": 0.7, "sweat": 0.7,
+    "sweater": 0.8, "pullover": 0.8, "pull": 0.8, "boots": 0.8, "trench": 0.7,
+    "coat": 0.95, "manteau": 0.95, "parka": 1.0, "doudoune": 1.0,
+}
+MATERIAL_WARMTH = {
+    "lin": 0.0, "soie": 0.15, "viscose": 0.15, "coton": 0.3, "synthétique": 0.4, "polyester": 0.45,
+    "nylon": 0.45, "denim": 0.5, "cuir": 0.65, "velours": 0.75, "laine": 0.9, "cachemire": 0.9,
+}
+
+# Harmonie des couleurs (vocabulaire normalisé de l'analyse)
+COLORS = ("white", "black", "grey", "light-grey", "dark-grey", "navy", "blue", "light-blue", "red",
+          "burgundy", "pink", "green", "khaki", "olive", "yellow", "orange", "purple", "brown", "beige", "cream")
+NEUTRAL_COLORS = frozenset({"white", "black", "grey", "light-grey", "dark-grey", "navy", "beige", "cream"})
+COLOR_FAMILIES = {
+    "warm": frozenset({"red", "burgundy", "pink", "orange", "yellow"}),
+    "cool": frozenset({"blue", "light-blue", "green", "purple"}),
+    "earth": frozenset({"khaki", "olive", "brown"}),
+}
+CLASHING_COLORS = frozenset(map(frozenset, [("red", "pink"), ("red", "orange"), ("pink", "orange"),
+                                            ("purple", "yellow"), ("red", "green"), ("orange", "purple")]))
+
+# Pondérations du score d'une combinaison
+WEIGHTS = {"weather": 0.35, "color": 0.25, "style": 0.2, "occasion": 0.1, "preference": 0.1}
+
+# Élagage : pièces conservées par rôle, bases étendues (veste / chaussures)
+MAX_PER_ROLE = 12
+MAX_BASES = 60
+
+# En dessous de cette température une couche extérieure est attendue
+LAYER_TEMPERATURE = 18
+# Au-dessus, une couche facultative doit être bien adaptée à la météo (adéquation 0-1)
+MIN_OPTIONAL_LAYER_FIT = 0.7
+
+
+class OutfitCandidate(NamedTuple):
+    id: str  # id de la tenue enregistrée, ou "combo-<ids triés>"
+    item_ids: tuple
+    score: int  # 0-100
+    features: Dict[str, float]
+    is_look: bool = False
+
+
+def combo_key(item_ids: Iterable[str]) -> Tuple[str, ...]:
+    """Clé canonique d'une combinaison : ids des pièces triés"""
+    return tuple(sorted(str(item_id) for item_id in item_ids))
+
+
+def combo_id(item_ids: Iterable[str]) -> str:
+    """Identifiant de combinaison du prompt : "combo-" + ids triés"""
+    return "combo-" + "-".join(combo_key(item_ids))
+
+
+def _build_harmony_matrix() -> np.ndarray:
+    size = len(COLORS)
+    matrix = np.full((size, size), 0.4, dtype=np.float32)
+    for i, a in enumerate(COLORS):
+        for j, b in enumerate(COLORS):
+            if a == b:
+                matrix[i, j] = 0.8
+            elif a in NEUTRAL_COLORS or b in NEUTRAL_COLORS:
+                matrix[i, j] = 1.0
+            elif frozenset((a, b)) in CLASHING_COLORS:
+                matrix[i, j] = 0.05
+            elif a in COLOR_FAMILIES["earth"] or b in COLOR_FAMILIES["earth"]:
+                matrix[i, j] = 0.75
+            elif any(a in family and b in family for family in COLOR_FAMILIES.values()):
+                matrix[i, j] = 0.65
+    return matrix
+
+
+HARMONY = _build_harmony_matrix()
+COLOR_INDEX = {color: index for index, color in enumerate(COLORS)}
+
+
+def target_warmth(temperature: float) -> float:
+    """Chaleur attendue : 1 à 0°C et moins, 0 à 30°C et plus"""
+    return float(np.clip((30.0 - temperature) / 30.0, 0.0, 1.0))
+
+
+def _normalized(values) -> List[str]:
+    if isinstance(values, str):
+        values = [values]
+    return [str(value).strip().lower() for value in values or [] if value]
+
+
+def _role(item: Dict[str, Any]) -> Optional[str]:
+    category = str(item.get("category") or "").lower()
+    for role, types in (("top", TOPS), ("bottom", BOTTOMS), ("dress", DRESSES), ("layer", LAYERS), ("shoes", SHOES)):
+        if category in types:
+            return role
+    return None
+
+
+def _warmth(item: Dict[str, Any]) -> float:
+    if item.get("isLook"):
+        warmths = [TYPE_WARMTH.get(str(piece.get("category")).lower(), 0.4) for piece in item.get("pieces") or []]
+        return float(np.mean(warmths)) if warmths else 0.4
+    type_warmth = TYPE_WARMTH.get(str(item.get("category")).lower(), 0.4)
+    materials = [MATERIAL_WARMTH[m] for m in _normalized(item.get("materials")) if m in MATERIAL_WARMTH]
+    return 0.5 * type_warmth + 0.5 * float(np.mean(materials)) if materials else type_warmth
+
+
+class _Features:
+    """Matrices de caractéristiques d'un ensemble de pièces (une ligne par pièce)"""
+
+    def __init__(self, items: Sequence[Dict[str, Any]], style_vocab: Dict[str, int], occasion_vocab: Dict[str, int],
+                 temperature: float, needs: frozenset):
+        self.items = list(items)
+        n = len(self.items)
+        self.colors = np.zeros((n, len(COLORS)), dtype=np.float32)
+        self.styles = np.zeros((n, len(style_vocab)), dtype=np.float32)
+        self.occasions = np.zeros((n, len(occasion_vocab)), dtype=np.float32)
+        warmth = np.zeros(n, dtype=np.float32)
+        favorite = np.zeros(n, dtype=np.float32)
+        wear = np.zeros(n, dtype=np.float32)
+        need = np.zeros(n, dtype=np.float32)
+
+        for row, item in enumerate(self.items):
+            for color in _normalized(item.get("colors")):
+                if color in COLOR_INDEX:
+                    self.colors[row, COLOR_INDEX[color]] = 1.0
+            styles = _normalized(item.get("styleTags"))
+            occasions = _normalized(item.get("occasionTags"))
+            for tag in styles:
+                self.styles[row, style_vocab[tag]] = 1.0
+            for tag in occasions:
+                self.occasions[row, occasion_vocab[tag]] = 1.0
+            warmth[row] = _warmth(item)
+            favorite[row] = 1.0 if item.get("isFavorite") else 0.0
+            wear[row] = float(item.get("wearCount") or 0)
+            need[row] = 1.0 if needs and needs.intersection(styles + occasions) else 0.0
+
+        self.weather = 1.0 - np.abs(warmth - target_warmth(temperature))
+        # Favoris, pièces peu portées et correspondance au besoin exprimé
+        self.preference = 0.4 * favorite + 0.3 / (1.0 + wear / 10.0) + 0.3 * need
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def take(self, indexes: np.ndarray) -> "_Features":
+        subset = object.__new__(_Features)
+        subset.items = [self.items[i] for i in indexes]
+        for name in ("colors", "styles", "occasions", "weather", "preference"):
+            setattr(subset, name, getattr(self, name)[indexes])
+        return subset
+
+    def unary(self) -> np.ndarray:
+        return WEIGHTS["weather"] * self.weather + WEIGHTS["preference"] * self.preference
+
+
+def _jaccard(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Indice de Jaccard entre chaque ligne de a et chaque ligne de b"""
+    inter = a @ b.T
+    union = a.sum(axis=1)[:, None] + b.sum(axis=1)[None, :] - inter
+    # Sans étiquette d'un côté : neutre plutôt que pénalisant
+    return np.divide(inter, union, out=np.full_like(inter, 0.5), where=union > 0)
+
+
+def _harmony(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Harmonie moyenne des couleurs entre chaque ligne de a et chaque ligne de b"""
+    total = a @ HARMONY @ b.T
+    pairs = a.sum(axis=1)[:, None] * b.sum(axis=1)[None, :]
+    return np.divide(total, pairs, out=np.full_like(total, 0.7), where=pairs > 0)
+
+
+def pair_scores(a: _Features, b: _Features) -> Dict[str, np.ndarray]:
+    """Compatibilité de chaque pièce de a avec chaque pièce de b (matrices len(a) x len(b))"""
+    return {
+        "color": _harmony(a.colors, b.colors),
+        "style": _jaccard(a.styles, b.styles),
+        "occasion": _jaccard(a.occasions, b.occasions),
+    }
+
+
+def _pair_total(scores: Dict[str, np.ndarray]) -> np.ndarray:
+    return sum(WEIGHTS[name] * matrix for name, matrix in scores.items())
+
+
+def _prune(features: _Features, limit: int) -> _Features:
+    if len(features) <= limit:
+        return features
+    keep = np.argsort(-features.unary(), kind="stable")[:limit]
+    return features.take(np.sort(keep))
+
+
+def _vocab(items: Iterable[Dict[str, Any]], field: str) -> Dict[str, int]:
+    vocab: Dict[str, int] = {}
+    for item in items:
+        for tag in _normalized(item.get(field)):
+            vocab.setdefault(tag, len(vocab))
+    return vocab
+
+
+def _need_terms(user_needs: Optional[str]) -> frozenset:
+    return frozenset(re.findall(r"[\wàâçéèêëîïôûùüÿœ-]+", (user_needs or "").lower()))
+
+
+PAIR_FEATURES = ("color", "style", "occasion")
+
+# Robe seule : aucune paire à évaluer, compatibilité neutre
+NEUTRAL_PAIR = {"color": 0.8, "style": 0.5, "occasion": 0.5}
+
+# Tenue enregistrée : composée par l'utilisateur, cohérence présumée
+CURATED_PAIR = {"color": 0.9, "style": 0.9, "occasion": 0.9}
+
+
+class _Combo:
+    """Combinaison en cours de construction : sommes des scores unitaires et des paires"""
+
+    def __init__(self, members: List[tuple], unary_sum: float, pair_sums: Dict[str, float], pair_count: int):
+        self.members = members
+        self.unary_sum = unary_sum
+        self.pair_sums = pair_sums
+        self.pair_count = pair_count
+
+    def pair_means(self) -> Dict[str, float]:
+        if not self.pair_count:
+            return dict(NEUTRAL_PAIR)
+        return {name: value / self.pair_count for name, value in self.pair_sums.items()}
+
+    def score(self) -> float:
+        return self.unary_sum / len(self.members) + _pair_total(self.pair_means())
+
+
+def generate_outfits(
+    items: List[Dict[str, Any]],
+    temperature: float,
+    user_needs: Optional[str] = None,
+    exclude: Container[Tuple[str, ...]] = (),
+    top_k: int = 5,
+) -> List[OutfitCandidate]:
+    """Meilleures tenues réalisables avec la garde-robe (éléments au format client, déjà pré-filtrés).
+    
+    exclude : clés canoniques des tenues à écarter, combo_key(ids) ou (id de tenue,)
+    """
+    needs = _need_terms(user_needs)
+    pieces = [item for item in items if not item.get("isLook")]
+    looks = [item for item in items if item.get("isLook") and (str(item.get("id")),) not in exclude]
+    style_vocab, occasion_vocab = _vocab(items, "styleTags"), _vocab(items, "occasionTags")
+
+    def features(role_items):
+        return _Features(role_items, style_vocab, occasion_vocab, temperature, needs)
+
+    by_role: Dict[str, List[Dict[str, Any]]] = {}
+    for item in pieces:
+        role = _role(item)
+        if role is not None:
+            by_role.setdefault(role, []).append(item)
+    roles = {role: _prune(features(role_items), MAX_PER_ROLE) for role, role_items in by_role.items()}
+    unary = {role: role_features.unary() for role, role_features in roles.items()}
+
+    # Bases : grille haut x bas notée en une fois, puis robes seules
+    bases: List[_Combo] = []
+    if "top" in roles and "bottom" in roles:
+        scores = pair_scores(roles["top"], roles["bottom"])
+        grid = _pair_total(scores) + (unary["top"][:, None] + unary["bottom"][None, :]) / 2
+        for flat in np.argsort(-grid, axis=None, kind="stable")[:MAX_BASES]:
+            t, b = (int(index) for index in np.unravel_index(flat, grid.shape))
+            bases.append(_Combo(
+                [("top", t), ("bottom", b)], float(unary["top"][t] + unary["bottom"][b]),
+                {name: float(scores[name][t, b]) for name in PAIR_FEATURES}, 1,
+            ))
+    for d in range(len(roles["dress"]) if "dress" in roles else 0):
+        bases.append(_Combo([("dress", d)], float(unary["dress"][d]), {name: 0.0 for name in PAIR_FEATURES}, 0))
+    bases.sort(key=lambda combo: -combo.score())
+    bases = bases[:MAX_BASES]
+
+    # Extensions : couche extérieure puis chaussures, ajoutées si elles améliorent le score
+    pair_cache: Dict[tuple, Dict[str, np.ndarray]] = {}
+    for combo in bases:
+        for role in ("layer", "shoes"):
+            if role not in roles:
+                continue
+            sums = {name: np.full(len(roles[role]), combo.pair_sums[name], dtype=np.float32) for name in PAIR_FEATURES}
+            for member_role, index in combo.members:
+                key = (role, member_role)
+                if key not in pair_cache:
+                    pair_cache[key] = pair_scores(roles[role], roles[member_role])
+                for name in PAIR_FEATURES:
+                    sums[name] += pair_cache[key][name][:, index]
+            pair_count = combo.pair_count + len(combo.members)
+            gains = (combo.unary_sum + unary[role]) / (len(combo.members) + 1) + sum(
+                WEIGHTS[name] * sums[name] / pair_count for name in PAIR_FEATURES
+            )
+            # Par temps frais, la couche extérieure est attendue même si elle baisse un peu le score ;
+            # sinon seule une couche adaptée à la météo peut s'ajouter
+            required = role == "layer" and temperature < LAYER_TEMPERATURE
+            if role == "layer" and not required:
+                gains = np.where(roles[role].weather >= MIN_OPTIONAL_LAYER_FIT, gains, -np.inf)
+            choice = int(np.argmax(gains))
+            if required or gains[choice] >= combo.score():
+                combo.members.append((role, choice))
+                combo.unary_sum += float(unary[role][choice])
+                combo.pair_sums = {name: float(sums[name][choice]) for name in PAIR_FEATURES}
+                combo.pair_count = pair_count
+
+    candidates: Dict[str, OutfitCandidate] = {}
+    for combo in bases:
+        item_ids = tuple(str(roles[role].items[index].get("id")) for role, index in combo.members)
+        identifier = combo_id(item_ids)
+        if identifier in candidates or combo_key(item_ids) in exclude:
+            continue
+        weather = float(np.mean([roles[role].weather[index] for role, index in combo.members]))
+        candidates[identifier] = OutfitCandidate(
+            id=identifier,
+            item_ids=item_ids,
+            score=_percent(combo.score()),
+            features={"weather": round(weather, 3), **{k: round(v, 3) for k, v in combo.pair_means().items()}},
+        )
+
+    if looks:
+        look_features = features(looks)
+        curated = _pair_total(CURATED_PAIR)
+        for row, look_unary in enumerate(look_features.unary()):
+            look = looks[row]
+            candidates[str(look.get("id"))] = OutfitCandidate(
+                id=str(look.get("id")),
+                item_ids=tuple(str(piece.get("id")) for piece in look.get("pieces") or []),
+                score=_percent(float(look_unary) + curated),
+                features={"weather": round(float(look_features.weather[row]), 3), **CURATED_PAIR},
+                is_look=True,
+            )
+
+    return sorted(candidates.values(), key=lambda candidate: -candidate.score)[:top_k]
+
+
+def _percent(score: float) -> int:
+    return int(round(min(max(score, 0.0), 1.0) * 100))
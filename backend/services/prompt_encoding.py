@@ -0,0 +1,138 @@
+"""
+Encodage compact de la garde-robe pour les prompts
+
+Chaque élément tient sur une ligne, champs séparés par "|" sous un en-tête
+de colonnes unique (les noms de clés ne sont plus répétés). Les UUID sont
+remplacés par des alias courts (p1, p2... pour les pièces, t1... pour les
+tenues enregistrées), remis en correspondance après l'analyse de la réponse.
+Seuls les attributs utiles aux règles et au choix sont conservés (catégorie,
+nom, couleurs, matières, motif, saisons, tags) ; les tags de style et
+d'occasion forment un vocabulaire dédupliqué, référencé par numéro, les plus
+fréquents recevant les numéros les plus courts.
+"""
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Sequence
+
+from services.outfit_engine import combo_id
+
+PIECE_COLUMNS = "id|catégorie|nom|couleurs|matières|motif|saisons|tags"
+LOOK_COLUMNS = "id|nom|saisons|tags|pièces"
+OPTION_COLUMNS = "id|score local|pièces"
+
+# Séparateurs tolérés entre les alias d'une combinaison renvoyée par le modèle
+ALIAS_SEPARATORS = re.compile(r"[\s,+\-]+")
+
+
+def _scalar(value: Any) -> str:
+    return " ".join(str(value or "").replace("|", "/").split())
+
+
+def _values(values: Any) -> List[str]:
+    if isinstance(values, str):
+        values = [values]
+    return [_scalar(value).replace(",", " ") for value in values or [] if value]
+
+
+def _tags(item: Dict[str, Any]) -> List[str]:
+    return list(dict.fromkeys(_values(item.get("styleTags")) + _values(item.get("occasionTags"))))
+
+
+class PromptWardrobe:
+    """Garde-robe encodée pour un prompt, avec la correspondance alias -> id"""
+
+    def __init__(self, items: Sequence[Dict[str, Any]]):
+        self._ids: Dict[str, str] = {}  # alias -> id réel
+        self._aliases: Dict[str, str] = {}  # id réel -> alias
+        self._pieces: Dict[str, List[str]] = {}  # alias -> ids réels des pièces
+        pieces = [item for item in items if not item.get("isLook")]
+        looks = [item for item in items if item.get("isLook")]
+        for number, piece in enumerate(pieces, 1):
+            self._register(f"p{number}", piece.get("id"), [str(piece.get("id"))])
+        for number, look in enumerate(looks, 1):
+            self._register(f"t{number}", look.get("id"), [str(piece.get("id")) for piece in look.get("pieces") or []])
+
+        counts = Counter(tag for item in items for tag in _tags(item))
+        self._tag_codes = {tag: str(code) for code, (tag, _) in enumerate(counts.most_common(), 1)}
+
+        lines = []
+        if self._tag_codes:
+            lines.append("TAGS: " + " ".join(f"{code}={tag}" for tag, code in self._tag_codes.items()))
+        if pieces:
+            lines.append(f"PIÈCES {PIECE_COLUMNS}")
+            lines.extend(self.piece_line(piece) for piece in pieces)
+        if looks:
+            lines.append(f"TENUES {LOOK_COLUMNS}")
+            lines.extend(self._look_line(look) for look in looks)
+        self.text = "\n".join(lines)
+
+    def _register(self, alias: str, item_id: Any, piece_ids: List[str]) -> None:
+        self._ids[alias] = str(item_id)
+        self._aliases[str(item_id)] = alias
+        self._pieces[alias] = piece_ids
+
+    def alias(self, item_id: Any) -> str:
+        return self._aliases.get(str(item_id), _scalar(item_id))
+
+    def _tag_cell(self, item: Dict[str, Any]) -> str:
+        return ",".join(self._tag_codes[tag] for tag in _tags(item))
+
+    def piece_line(self, piece: Dict[str, Any]) -> str:
+        return "|".join((
+            self.alias(piece.get("id")),
+            _scalar(piece.get("category")),
+            _scalar(piece.get("name")),
+            ",".join(_values(piece.get("colors"))),
+            ",".join(_values(piece.get("materials"))),
+            _scalar(piece.get("pattern")),
+            ",".join(_values(piece.get("seasons"))),
+            self._tag_cell(piece),
+        ))
+
+    def line(self, item: Dict[str, Any]) -> str:
+        """Ligne encodée d'un élément (pièce ou tenue enregistrée)"""
+        return self._look_line(item) if item.get("isLook") else self.piece_line(item)
+
+    def _look_line(self, look: Dict[str, Any]) -> str:
+        # Pièce absente du tableau (élaguée) : décrite par sa catégorie
+        pieces = [
+            self._aliases.get(str(piece.get("id"))) or _scalar(piece.get("category") or piece.get("name"))
+            for piece in look.get("pieces") or []
+        ]
+        return "|".join((
+            self.alias(look.get("id")),
+            _scalar(look.get("name")),
+            ",".join(_values(look.get("seasons"))),
+            self._tag_cell(look),
+            ",".join(pieces),
+        ))
+
+    def _combo_aliases(self, outfit_id: str) -> List[str]:
+        if not outfit_id.startswith("combo-"):
+            return []
+        aliases = [alias for alias in ALIAS_SEPARATORS.split(outfit_id[len("combo-"):]) if alias]
+        return aliases if all(alias in self._ids for alias in aliases) else []
+
+    def resolve(self, outfit_id: Any) -> str:
+        """Id réel d'un alias ("p3", "t1") ou d'une combinaison d'alias ("combo-p1-p3") ; inchangé sinon"""
+        outfit_id = str(outfit_id or "").strip()
+        if outfit_id in self._ids:
+            return self._ids[outfit_id]
+        aliases = self._combo_aliases(outfit_id)
+        if aliases:
+            return combo_id(self._ids[alias] for alias in aliases)
+        return outfit_id
+
+    def item_ids(self, outfit_id: Any) -> List[str]:
+        """Ids réels des pièces d'un alias ou d'une combinaison d'alias (pièces d'une tenue enregistrée) ; [] sinon"""
+        outfit_id = str(outfit_id or "").strip()
+        aliases = [outfit_id] if outfit_id in self._ids else self._combo_aliases(outfit_id)
+        return list(dict.fromkeys(piece_id for alias in aliases for piece_id in self._pieces[alias]))
+
+
+def encode_options(wardrobe: PromptWardrobe, options: Iterable[Sequence[Any]]) -> str:
+    """Tenues candidates : "o<n>|score|alias des pièces", options = (score, ids des pièces)"""
+    lines = [f"OPTIONS {OPTION_COLUMNS}"]
+    for number, (score, item_ids) in enumerate(options, 1):
+        lines.append(f"o{number}|{score}|" + ",".join(wardrobe.alias(item_id) for item_id in item_ids))
+    return "\n".join(lines)
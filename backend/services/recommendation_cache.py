@@ -0,0 +1,162 @@
+"""
+Signature des entrées d'une recommandation quotidienne
+
+Deux demandes de la même journée avec la même garde-robe (version), une météo
+comparable et les mêmes préférences donnent la même recommandation : elles
+partagent une clé. La météo est celle de la journée (prévision), pas celle
+du moment : tranches de 5°C des températures minimale et maximale (bornes
+alignées sur les règles météo), pluie prévue et famille du code météo du
+jour. Une recommandation précalculée tôt le matin garde ainsi la même clé
+qu'une demande au pic de 7-9 h. Les besoins sont normalisés et les
+exclusions (portés et recommandés récemment) résumées par une empreinte. La
+recommandation reste valable jusqu'à minuit, heure locale de la ville. Une
+recommandation précalculée est comparée sans les exclusions, qui sont
+vérifiées sur son résultat.
+"""
+import hashlib
+import json
+import math
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+from zoneinfo import ZoneInfo
+
+from services.recommendation_history import RecommendationHistory, recommendation_outfit_key
+
+TEMPERATURE_BAND = 5
+
+
+class RecommendationKey(NamedTuple):
+    owner: str  # user_id, ou "anonymous"
+    wardrobe: str  # "v<version>" (garde-robe serveur) ou empreinte des éléments envoyés
+    day: str  # date locale de la ville
+    weather: str  # ex: "min 10..15|max 20..25|dry|clear"
+    season: str
+    needs: str
+    exclusions: str
+    mode: str
+
+    def digest(self, with_exclusions: bool = True) -> str:
+        """Forme compacte et stable (stockage) ; sans les exclusions : vérifiées sur le résultat"""
+        parts = self if with_exclusions else self._replace(exclusions="")
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def _fingerprint(payload: Any) -> str:
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+def weather_family(code: int) -> str:
+    """Famille du code météo WMO"""
+    if code <= 1:
+        return "clear"
+    if code <= 48:
+        return "cloudy"
+    if 71 <= code <= 77 or 85 <= code <= 86:
+        return "snow"
+    if code >= 95:
+        return "storm"
+    return "rain"
+
+
+def is_raining(weather: Dict[str, Any]) -> bool:
+    """Même critère que le pré-filtre : précipitations actuelles ou prévues dans la journée"""
+    return max(weather["current"]["precipitation"] or 0, weather["daily"]["precipitation"] or 0) > 0
+
+
+def _band(temperature: float) -> str:
+    low = math.floor(temperature / TEMPERATURE_BAND) * TEMPERATURE_BAND
+    return f"{low}..{low + TEMPERATURE_BAND}"
+
+
+def _daily_weather_code(weather: Dict[str, Any]) -> int:
+    code = weather["daily"].get("weather_code")
+    return weather["current"]["weather_code"] if code is None else code
+
+
+def weather_bucket(weather: Dict[str, Any]) -> str:
+    """Signature de la météo de la journée : identique de la nuit au soir tant que la prévision ne change pas"""
+    daily = weather["daily"]
+    return "|".join((
+        f"min {_band(daily['min_temp'])}",
+        f"max {_band(daily['max_temp'])}",
+        "rain" if (daily["precipitation"] or 0) > 0 else "dry",
+        weather_family(_daily_weather_code(weather)),
+    ))
+
+
+def daytime_weather(weather: Dict[str, Any]) -> Dict[str, Any]:
+    """Conditions de la journée à la place de celles du moment (calcul à l'avance, la nuit)"""
+    daily = weather["daily"]
+    current = {
+        **weather["current"],
+        "temperature": round((daily["max_temp"] + daily["min_temp"]) / 2, 1),
+        "precipitation": daily["precipitation"],
+        "weather_code": _daily_weather_code(weather),
+    }
+    return {**weather, "current": current}
+
+
+def local_today(tz: str, now: Optional[datetime] = None) -> date:
+    return (now or datetime.now(ZoneInfo(tz))).astimezone(ZoneInfo(tz)).date()
+
+
+def seconds_until_local_midnight(tz: str, now: Optional[datetime] = None) -> float:
+    zone = ZoneInfo(tz)
+    now = (now or datetime.now(zone)).astimezone(zone)
+    midnight = datetime.combine(now.date() + timedelta(days=1), time(0), tzinfo=zone)
+    return max((midnight - now).total_seconds(), 1.0)
+
+
+def _normalize_needs(user_needs: Optional[str]) -> str:
+    return " ".join((user_needs or "").lower().split())
+
+
+def recommendation_key(
+    weather: Dict[str, Any],
+    wardrobe_items: Iterable[Dict[str, Any]],
+    user_id: Optional[Any] = None,
+    wardrobe_version: Optional[int] = None,
+    season: Optional[str] = None,
+    user_needs: Optional[str] = None,
+    recently_worn_ids: Iterable[str] = (),
+    recently_recommended_ids: Iterable[str] = (),
+    recently_recommended_combos: Iterable[str] = (),
+    mode: str = "auto",
+    now: Optional[datetime] = None,
+) -> RecommendationKey:
+    """Clé des entrées d'une recommandation (wardrobe_version : garde-robe chargée côté serveur)"""
+    wardrobe = f"v{wardrobe_version}" if wardrobe_version is not None else _fingerprint(list(wardrobe_items))
+    exclusions = _fingerprint([
+        sorted(set(map(str, recently_worn_ids))),
+        sorted(set(map(str, recently_recommended_ids))),
+        sorted(set(map(str, recently_recommended_combos))),
+    ])
+    return RecommendationKey(
+        owner=str(user_id) if user_id else "anonymous",
+        wardrobe=wardrobe,
+        day=local_today(weather.get("timezone") or "UTC", now).isoformat(),
+        weather=weather_bucket(weather),
+        season=(season or "all_season").strip().lower(),
+        needs=_normalize_needs(user_needs),
+        exclusions=exclusions,
+        mode=mode,
+    )
+
+
+def conflicts_with_exclusions(
+    result: Dict[str, Any],
+    recently_worn_ids: Iterable[str] = (),
+    recently_recommended_ids: Iterable[str] = (),
+    recently_recommended_combos: Iterable[str] = (),
+) -> bool:
+    """Vrai si une recommandation calculée à l'avance propose un élément exclu depuis"""
+    # Mêmes règles que le calcul en direct : tenue déjà recommandée, ou pièce portée récemment
+    recommended = RecommendationHistory(0).with_outfit_ids([*recently_recommended_ids, *recently_recommended_combos])
+    worn = set(map(str, recently_worn_ids))
+    for recommendation in result.get("recommendations") or []:
+        if str(recommendation.get("id")) in worn or recommendation_outfit_key(recommendation) in recommended:
+            return True
+        if worn.intersection(map(str, recommendation.get("item_ids") or [])):
+            return True
+    return False
@@ -0,0 +1,93 @@
+"""
+Historique des recommandations par utilisateur (côté serveur)
+
+Une tenue est identifiée par sa clé canonique : les ids triés de ses pièces
+pour une combinaison, (id,) pour une tenue enregistrée. Les ids envoyés par
+le client ("combo-<ids>" dans un ordre quelconque) sont ramenés une fois à
+cette clé. L'historique garde les N dernières tenues recommandées sous forme
+d'empreintes de 8 octets dans un anneau borné (la plus ancienne sort quand il
+est plein), avec un compteur par empreinte pour vérifier l'appartenance en
+O(1). Il est stocké tel quel en base (8 octets par tenue) et appliqué à la
+génération locale des tenues : les tenues déjà recommandées ne sont ni
+proposées au modèle ni listées dans le prompt.
+"""
+import hashlib
+import re
+from collections import deque
+from typing import Any, Dict, Iterable, Tuple
+
+from services.outfit_engine import combo_key
+
+DIGEST_SIZE = 8
+UUID_PATTERN = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.IGNORECASE)
+
+
+def outfit_key(outfit_id: str) -> Tuple[str, ...]:
+    """Clé canonique d'un id envoyé par le client : "combo-<ids>" ou id de tenue enregistrée"""
+    outfit_id = str(outfit_id)
+    if not outfit_id.startswith("combo-"):
+        return (outfit_id,)
+    ids = outfit_id[len("combo-"):]
+    # Les UUID contiennent des tirets : ils sont extraits entiers, sinon séparés aux tirets
+    return combo_key(UUID_PATTERN.findall(ids) or ids.split("-"))
+
+
+def recommendation_outfit_key(recommendation: Dict[str, Any]) -> Tuple[str, ...]:
+    """Clé canonique d'une recommandation (item_ids d'une combinaison générée localement si présents)"""
+    outfit_id = str(recommendation.get("id"))
+    if outfit_id.startswith("combo-") and recommendation.get("item_ids"):
+        return combo_key(recommendation["item_ids"])
+    return outfit_key(outfit_id)
+
+
+def outfit_digest(key: Tuple[str, ...]) -> int:
+    return int.from_bytes(hashlib.blake2b("\x1f".join(key).encode("utf-8"), digest_size=DIGEST_SIZE).digest(), "big")
+
+
+class RecommendationHistory:
+    """Dernières tenues recommandées : anneau borné d'empreintes, appartenance en O(1)"""
+
+    def __init__(self, capacity: int = 30, digests: Iterable[int] = ()):
+        self._ring: deque = deque(maxlen=max(capacity, 0))
+        self._counts: Dict[int, int] = {}
+        for digest in digests:
+            self._push(digest)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, capacity: int = 30) -> "RecommendationHistory":
+        digests = (int.from_bytes(data[i:i + DIGEST_SIZE], "big") for i in range(0, len(data), DIGEST_SIZE))
+        return cls(capacity, digests)
+
+    def to_bytes(self) -> bytes:
+        """Forme stockée : empreintes de 8 octets, de la plus ancienne à la plus récente"""
+        return b"".join(digest.to_bytes(DIGEST_SIZE, "big") for digest in self._ring)
+
+    def __len__(self) -> int:
+        return len(self._ring)
+
+    def __contains__(self, key: Tuple[str, ...]) -> bool:
+        return outfit_digest(key) in self._counts
+
+    def _push(self, digest: int) -> None:
+        if self._ring.maxlen == 0:
+            return
+        if len(self._ring) == self._ring.maxlen:
+            oldest = self._ring.popleft()
+            self._counts[oldest] -= 1
+            if not self._counts[oldest]:
+                del self._counts[oldest]
+        self._ring.append(digest)
+        self._counts[digest] = self._counts.get(digest, 0) + 1
+
+    def add(self, key: Tuple[str, ...]) -> bool:
+        """Ajoute une tenue ; False si elle est déjà dans l'historique"""
+        digest = outfit_digest(key)
+        if digest in self._counts:
+            return False
+        self._push(digest)
+        return True
+
+    def with_outfit_ids(self, outfit_ids: Iterable[str]) -> "RecommendationHistory":
+        """Copie complétée des ids envoyés par le client (exclusions d'une demande)"""
+        digests = [outfit_digest(outfit_key(outfit_id)) for outfit_id in outfit_ids]
+        return RecommendationHistory(len(self._ring) + len(digests), list(self._ring) + digests)
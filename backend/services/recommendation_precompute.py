@@ -0,0 +1,163 @@
+"""
+Précalcul des recommandations du jour (scripts/precompute_recommendations.py)
+
+Les demandes arrivent en pic le matin. Le précalcul parcourt les utilisateurs
+actifs (table daily_recommendations), tôt le matin dans le fuseau de leur
+ville, et stocke leur recommandation du jour avec la clé de ses entrées :
+/recommendations/daily la sert tant que la garde-robe, la météo du jour et
+le contexte n'ont pas changé. Les utilisateurs sont traités en parallèle avec
+une concurrence bornée (appels au modèle simultanés limités) ; si le modèle
+est indisponible, le choix local prend le relais (validité courte, recalculé
+au passage suivant).
+
+Le service de recommandations, la lecture de la garde-robe et l'écriture du
+résultat sont injectés : le précalcul se teste sans base ni modèle
+(modules/recommendations/precompute.py branche la base).
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Protocol, Tuple
+from zoneinfo import ZoneInfo
+
+from services.recommendation_history import RecommendationHistory
+
+
+class PrecomputeStore(Protocol):
+    def load(self, user_id) -> Tuple[int, List[Dict[str, Any]], RecommendationHistory]:
+        """Garde-robe (version, candidats) et historique des recommandations de l'utilisateur"""
+        ...
+
+    def save(self, user_id, key, result: Dict[str, Any], valid_until: datetime) -> None:
+        ...
+
+
+class PrecomputeMetrics:
+    """Compteurs de débit du précalcul"""
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.users_seen = 0
+        self.computed = 0
+        self.unchanged = 0
+        self.outside_window = 0
+        self.failed = 0
+        self.by_mode: Dict[str, int] = {}
+        self.durations: List[float] = []
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def percentile(self, fraction: float) -> float:
+        if not self.durations:
+            return 0.0
+        durations = sorted(self.durations)
+        return durations[min(int(len(durations) * fraction), len(durations) - 1)]
+
+    def summary(self) -> str:
+        elapsed = max(self.elapsed, 1e-9)
+        modes = ", ".join(f"{mode}: {count}" for mode, count in sorted(self.by_mode.items())) or "aucun"
+        return (
+            f"{self.users_seen} utilisateurs ({self.computed} calculés, {self.unchanged} inchangés, "
+            f"{self.outside_window} hors créneau, {self.failed} en échec), choix {modes}, "
+            f"en {self.elapsed:.1f}s ({self.users_seen / elapsed:.1f} utilisateurs/s, "
+            f"p50 {self.percentile(0.5) * 1000:.0f}ms, p95 {self.percentile(0.95) * 1000:.0f}ms par calcul)"
+        )
+
+
+class RecommendationPrecomputer:
+    """Calcule et stocke la recommandation du jour des utilisateurs actifs"""
+
+    def __init__(
+        self,
+        service,
+        store: PrecomputeStore,
+        request_factory: Callable[..., Any],
+        concurrency: int = 8,
+        start_hour: int = 3,
+        end_hour: int = 7,
+        dry_run: bool = False,
+        progress_every: int = 100,
+    ):
+        self.service = service
+        self.store = store
+        self.request_factory = request_factory
+        self.concurrency = max(1, concurrency)
+        self.start_hour = start_hour
+        self.end_hour = end_hour
+        self.dry_run = dry_run
+        self.progress_every = progress_every
+        self.metrics = PrecomputeMetrics()
+
+    async def run(self, profiles: Iterable[Any], now: Optional[datetime] = None) -> PrecomputeMetrics:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        workers = [asyncio.create_task(self._worker(queue, now)) for _ in range(self.concurrency)]
+        try:
+            for profile in profiles:
+                await queue.put(profile)
+        finally:
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        return self.metrics
+
+    async def _worker(self, queue: asyncio.Queue, now: Optional[datetime]) -> None:
+        while True:
+            profile = await queue.get()
+            if profile is None:
+                return
+            try:
+                await self.process(profile, now)
+            except Exception as e:
+                self.metrics.failed += 1
+                print(f"  ❌ Utilisateur {profile.user_id}: {type(e).__name__}: {e}")
+            self.metrics.users_seen += 1
+            if self.progress_every and self.metrics.users_seen % self.progress_every == 0:
+                print(f"  ⏳ {self.metrics.users_seen} utilisateurs "
+                      f"({self.metrics.users_seen / max(self.metrics.elapsed, 1e-9):.1f}/s)")
+
+    async def _timezone(self, profile) -> str:
+        weather_service = self.service.weather_service
+        if profile.latitude is not None and profile.longitude is not None:
+            location = weather_service.locate(profile.latitude, profile.longitude)
+        else:
+            location = await weather_service.resolve(profile.city, profile.country_code)
+        return weather_service.timezone(location) if location is not None else "UTC"
+
+    async def process(self, profile, now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        """Précalcule la recommandation d'un utilisateur ; None si rien n'a été calculé"""
+        now = now or datetime.now(timezone.utc)
+        tz = await self._timezone(profile)
+        if not self.start_hour <= now.astimezone(ZoneInfo(tz)).hour < self.end_hour:
+            self.metrics.outside_window += 1
+            return None
+
+        wardrobe_version, items, history = await asyncio.to_thread(self.store.load, profile.user_id)
+        request = self.request_factory(
+            user_id=profile.user_id,
+            city=profile.city,
+            country_code=profile.country_code,
+            latitude=profile.latitude,
+            longitude=profile.longitude,
+            current_season=profile.current_season,
+            mode=profile.mode,
+            wardrobe_items=items,
+        )
+        # Recommandation déjà stockée pour ces entrées (passage précédent) : rien à refaire
+        current_key = profile.input_key if profile.valid_until and profile.valid_until > now else None
+
+        started = time.monotonic()
+        precomputed = await self.service.precompute(request, wardrobe_version, current_key, history)
+        if precomputed is None:
+            self.metrics.unchanged += 1
+            return None
+        key, result, ttl = precomputed
+        self.metrics.durations.append(time.monotonic() - started)
+        self.metrics.by_mode[result["mode"]] = self.metrics.by_mode.get(result["mode"], 0) + 1
+
+        if not self.dry_run:
+            valid_until = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+            await asyncio.to_thread(self.store.save, profile.user_id, key, result, valid_until)
+        self.metrics.computed += 1
+        return result
@@ -0,0 +1,190 @@
+"""
+Pré-filtre déterministe des recommandations (météo, saison, ports récents)
+
+Les règles météo du prompt sont décrites ici comme des données portant sur
+le type de pièce, la matière et la saisonnalité, et appliquées localement
+avant la construction du prompt : les pièces qui ne peuvent pas être retenues
+ne sont plus envoyées au modèle. Une règle "exclude" retire l'élément, une
+règle "prefer" le place en tête de la garde-robe envoyée. Les tenues
+complètes sont évaluées sur les types de leurs pièces.
+
+Les éléments sont au format envoyé par le client (category, materials,
+seasons, isLook, pieces...) et ne sont jamais modifiés.
+"""
+import math
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional
+
+from services.prompt_encoding import PromptWardrobe
+
+EXCLUDE = "exclude"
+PREFER = "prefer"
+
+# Vocabulaire normalisé de l'analyse (services/clothing_analyzer.py) et variantes courantes
+HEAVY_KNITS = frozenset({"sweater", "pullover", "hoodie", "sweatshirt", "pull", "sweat"})
+WARM_OUTERWEAR = frozenset({"coat", "manteau", "doudoune", "puffer", "parka"})
+WARM_MATERIALS = frozenset({"laine", "cachemire", "velours", "wool", "cashmere", "velvet"})
+LIGHT_MATERIALS = frozenset({"coton", "lin", "soie", "viscose", "cotton", "linen", "silk"})
+WATERPROOF_TYPES = frozenset({"raincoat", "impermeable", "imperméable", "trench", "boots", "parka"})
+WATERPROOF_MATERIALS = frozenset({"nylon", "polyester", "synthétique", "cuir", "gore-tex"})
+
+
+class WeatherRule(NamedTuple):
+    """Règle météo : s'applique si min_temp <= température < max_temp (et s'il pleut, si rain est vrai).
+
+    Un élément est concerné si son type figure dans piece_types ou sa matière
+    dans materials ; si les deux sont renseignés, les deux doivent correspondre.
+    """
+    name: str
+    effect: str
+    min_temp: Optional[float] = None
+    max_temp: Optional[float] = None
+    rain: bool = False
+    piece_types: FrozenSet[str] = frozenset()
+    materials: FrozenSet[str] = frozenset()
+
+    def applies(self, temperature: float, raining: bool) -> bool:
+        if self.min_temp is not None and temperature < self.min_temp:
+            return False
+        if self.max_temp is not None and temperature >= self.max_temp:
+            return False
+        return raining or not self.rain
+
+    def matches(self, piece_types: Iterable[str], materials: Iterable[str]) -> bool:
+        type_match = bool(self.piece_types) and any(t in self.piece_types for t in piece_types)
+        material_match = bool(self.materials) and any(m in self.materials for m in materials)
+        if self.piece_types and self.materials:
+            return type_match and material_match
+        return type_match or material_match
+
+
+WEATHER_RULES = (
+    # ≥ 30°C : ni pulls, sweats, manteaux, ni laine, cachemire ou velours
+    WeatherRule("hot_no_warm_materials", EXCLUDE, min_temp=30, materials=WARM_MATERIALS),
+    WeatherRule("hot_no_warm_layers", EXCLUDE, min_temp=30, piece_types=HEAVY_KNITS | WARM_OUTERWEAR),
+    # > 25°C : jamais de pull, sweat ou veste chaude
+    WeatherRule("warm_no_heavy_knits", EXCLUDE, min_temp=25, piece_types=HEAVY_KNITS),
+    # 20-29°C : pas de doudoune ni de manteau, pas de pull en laine épaisse
+    WeatherRule("mild_no_warm_outerwear", EXCLUDE, min_temp=20, piece_types=WARM_OUTERWEAR),
+    WeatherRule("mild_no_wool_knits", EXCLUDE, min_temp=20, piece_types=HEAVY_KNITS, materials=WARM_MATERIALS),
+    # > 25°C : matières respirantes en tête ; < 15°C : matières chaudes en tête
+    WeatherRule("heat_prefer_light_materials", PREFER, min_temp=25, materials=LIGHT_MATERIALS),
+    WeatherRule("cold_prefer_warm_layers", PREFER, max_temp=15, piece_types=HEAVY_KNITS | WARM_OUTERWEAR),
+    WeatherRule("cold_prefer_warm_materials", PREFER, max_temp=15, materials=WARM_MATERIALS),
+    # Pluie : imperméables et matières résistantes à l'eau en tête
+    WeatherRule("rain_prefer_waterproof_types", PREFER, rain=True, piece_types=WATERPROOF_TYPES),
+    WeatherRule("rain_prefer_waterproof_materials", PREFER, rain=True, materials=WATERPROOF_MATERIALS),
+)
+
+OUT_OF_SEASON = "out_of_season"
+RECENTLY_WORN = "recently_worn"
+
+ALL_SEASON = "all_season"
+
+
+class PrefilterResult(NamedTuple):
+    items: List[Dict[str, Any]]
+    excluded: Dict[str, List[str]]  # règle -> ids retirés (première règle qui s'applique)
+    preferred: int
+    tokens_saved: int  # Lignes des éléments retirés, dans l'encodage du prompt (services/prompt_encoding.py)
+
+    def summary(self) -> dict:
+        return {
+            "kept": len(self.items),
+            "removed": sum(len(ids) for ids in self.excluded.values()),
+            "removed_by_rule": {rule: len(ids) for rule, ids in self.excluded.items()},
+            "preferred": self.preferred,
+            "estimated_tokens_saved": self.tokens_saved,
+        }
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimation sans tokenizer : ~4 caractères par jeton"""
+    return math.ceil(len(text) / 4)
+
+
+def _normalize(values: Iterable[Any]) -> List[str]:
+    return [str(value).strip().lower() for value in values if value]
+
+
+def _piece_types(item: Dict[str, Any]) -> List[str]:
+    if item.get("isLook"):
+        return _normalize(piece.get("category") for piece in item.get("pieces") or [])
+    return _normalize([item.get("category")])
+
+
+def _materials(item: Dict[str, Any]) -> List[str]:
+    materials = item.get("materials") or []
+    if isinstance(materials, str):
+        materials = [materials]
+    return _normalize(materials)
+
+
+def _is_recently_worn(item: Dict[str, Any], worn: FrozenSet[str]) -> bool:
+    if str(item.get("id")) in worn:
+        return True
+    # Une tenue contenant une pièce portée récemment est écartée aussi
+    return any(str(piece.get("id")) in worn for piece in item.get("pieces") or [])
+
+
+def _is_out_of_season(item: Dict[str, Any], season: Optional[str]) -> bool:
+    if not season or season == ALL_SEASON:
+        return False
+    seasons = _normalize(item.get("seasons") or [])
+    # Sans saison renseignée ou "toutes saisons" (valeur par défaut du client) : portable toute l'année
+    return bool(seasons) and ALL_SEASON not in seasons and season not in seasons
+
+
+def prefilter_wardrobe(
+    items: List[Dict[str, Any]],
+    temperature: float,
+    raining: bool = False,
+    season: Optional[str] = None,
+    recently_worn_ids: Iterable[str] = (),
+    rules: Iterable[WeatherRule] = WEATHER_RULES,
+) -> PrefilterResult:
+    """Retire les éléments inéligibles et place les éléments préférés en tête (ordre stable)"""
+    active = [rule for rule in rules if rule.applies(temperature, raining)]
+    worn = frozenset(str(item_id) for item_id in recently_worn_ids)
+    season = season.strip().lower() if season else None
+
+    excluded: Dict[str, List[str]] = {}
+    removed: List[Dict[str, Any]] = []
+    preferred, others = [], []
+    for item in items:
+        piece_types, materials = _piece_types(item), _materials(item)
+
+        reason = None
+        if _is_recently_worn(item, worn):
+            reason = RECENTLY_WORN
+        elif _is_out_of_season(item, season):
+            reason = OUT_OF_SEASON
+        else:
+            reason = next(
+                (rule.name for rule in active if rule.effect == EXCLUDE and rule.matches(piece_types, materials)),
+                None,
+            )
+        if reason is not None:
+            excluded.setdefault(reason, []).append(str(item.get("id")))
+            removed.append(item)
+            continue
+
+        if any(rule.effect == PREFER and rule.matches(piece_types, materials) for rule in active):
+            preferred.append(item)
+        else:
+            others.append(item)
+
+    kept = preferred + others
+    return PrefilterResult(
+        items=kept,
+        excluded=excluded,
+        preferred=len(preferred),
+        tokens_saved=_encoded_tokens(removed),
+    )
+
+
+def _encoded_tokens(items: List[Dict[str, Any]]) -> int:
+    """Jetons des lignes que ces éléments occuperaient dans le prompt (seuls les éléments retirés sont encodés)"""
+    if not items:
+        return 0
+    wardrobe = PromptWardrobe(items)
+    return estimate_tokens("\n".join(wardrobe.line(item) for item in items))
@@ -0,0 +1,81 @@
+"""
+Candidats de recommandation issus de la garde-robe serveur
+
+Conversion de l'instantané de garde-robe au format envoyé par le client et
+limitation du nombre de candidats par catégorie. Fonctions pures : testables
+sans base.
+"""
+from typing import Any, Dict, List
+
+
+def _compact(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Retire les champs vides : ils n'apportent rien au prompt"""
+    return {key: value for key, value in item.items() if value not in (None, "", [], {})}
+
+
+def wardrobe_items_from_snapshot(snapshot) -> List[Dict[str, Any]]:
+    """Garde-robe serveur au format envoyé par le client (pièces puis tenues complètes)"""
+    items = []
+    for piece in snapshot.pieces:
+        colors = piece.colors or {}
+        items.append({
+            "id": str(piece.id),
+            "name": piece.name or "",
+            "category": piece.piece_type,
+            "itemType": "SINGLE_PIECE",
+            "colors": colors.get("primary", []),
+            "secondaryColors": colors.get("secondary", []),
+            "materials": [piece.material] if piece.material else [],
+            "pattern": piece.pattern or "uni",
+            "fit": piece.fit or "regular",
+            "details": piece.details or [],
+            "styleTags": piece.style_tags or [],
+            "occasionTags": piece.occasion_tags or [],
+            "seasons": piece.seasonality or [],
+            "isFavorite": bool(piece.is_favorite),
+            "wearCount": piece.wear_count or 0,
+            "isLook": False
+        })
+    for look in snapshot.looks:
+        items.append({
+            "id": str(look.id),
+            "name": look.name or "",
+            "itemType": "OUTFIT",
+            "styleTags": look.dominant_style or [],
+            "occasionTags": look.occasion_tags or [],
+            "seasons": look.seasonality or [],
+            "colorPalette": look.color_palette,
+            "patternMix": look.pattern_mix or [],
+            "silhouette": look.silhouette,
+            "layeringLevel": look.layering_level or 1,
+            "isFavorite": bool(look.is_favorite),
+            "wearCount": look.wear_count or 0,
+            "isLook": True,
+            "pieces": [
+                {"id": str(item.item_id), "category": item.item.piece_type, "name": item.item.name or ""}
+                for item in look.items
+            ]
+        })
+    return [_compact(item) for item in items]
+
+
+def prune_candidates(items: List[Dict[str, Any]], max_per_category: int, max_looks: int,
+                     preferred: int = 0) -> List[Dict[str, Any]]:
+    """Limite le nombre de candidats envoyés au modèle par catégorie.
+
+    Appliqué après le pré-filtre : les `preferred` premiers éléments (adaptés à
+    la météo, cf. prefilter_wardrobe) passent d'abord, puis les favoris et les
+    moins portés. L'ordre d'origine est conservé.
+    """
+    def priority(entry):
+        index, item = entry
+        return (index >= preferred, not item.get("isFavorite", False), item.get("wearCount", 0))
+
+    kept, counts = set(), {}
+    for index, item in sorted(enumerate(items), key=priority):
+        group = "OUTFIT" if item.get("isLook") else item.get("category")
+        limit = max_looks if group == "OUTFIT" else max_per_category
+        if counts.get(group, 0) < limit:
+            counts[group] = counts.get(group, 0) + 1
+            kept.add(index)
+    return [item for index, item in enumerate(items) if index in kept]
@@ -0,0 +1,198 @@
+"""
+Export en flux de la garde-robe d'un utilisateur (RGPD / sauvegarde)
+
+Les lignes sont lues avec un curseur serveur (yield_per) et émises une par
+une en NDJSON : la mémoire ne dépend pas de la taille de la garde-robe. En
+mode ZIP, l'archive est écrite au fil de l'eau (descripteurs de données,
+aucun retour en arrière) : d'abord wardrobe.ndjson, puis chaque image. Une
+entrée écrite ne peut plus être retirée : chaque image est donc d'abord
+téléchargée entièrement dans un fichier temporaire (en mémoire jusqu'à
+IMAGE_SPOOL_MAX_MEMORY, sur disque au-delà), puis copiée dans son entrée. Une
+image dont le téléchargement échoue n'a aucune entrée dans l'archive et figure
+dans export_report.json.
+
+Les générateurs ouvrent leur propre session : ils s'exécutent pendant
+l'envoi de la réponse, après la fin de la requête.
+"""
+import itertools
+import os
+import tempfile
+import zipfile
+from collections import deque
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+from urllib.parse import urlparse
+from uuid import UUID
+
+import httpx
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from core.serialization import dumps
+from database.models import ClothingItem, LookItem, OutfitLook, WardrobeVersion
+
+# Lignes lues par aller-retour du curseur serveur
+EXPORT_BATCH_SIZE = 500
+
+# Taille des morceaux lus depuis le stockage d'images
+IMAGE_CHUNK_SIZE = 64 * 1024
+
+# Au-delà, l'image en cours de téléchargement passe de la mémoire au disque
+IMAGE_SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+EXPORTED_ITEM_COLUMNS = [
+    column for column in ClothingItem.__table__.columns if column.name != "user_id"
+]
+EXPORTED_LOOK_COLUMNS = [
+    column for column in OutfitLook.__table__.columns if column.name != "user_id"
+]
+
+
+def iter_export_records(db: Session, user_id: UUID) -> Iterator[dict]:
+    """Produit les enregistrements de l'export : en-tête, pièces puis tenues avec leurs liens"""
+    version = db.query(WardrobeVersion.version).filter(WardrobeVersion.user_id == user_id).scalar() or 0
+    yield {
+        "type": "export",
+        "user_id": user_id,
+        "wardrobe_version": version,
+        "exported_at": datetime.now(timezone.utc),
+    }
+
+    items = db.execute(
+        select(*EXPORTED_ITEM_COLUMNS)
+        .where(ClothingItem.user_id == user_id)
+        .order_by(ClothingItem.created_at, ClothingItem.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    for row in items:
+        yield {"type": "piece", **row._asdict()}
+
+    # Tenues jointes à leurs liens, triées par tenue : regroupement sans tout charger
+    looks = db.execute(
+        select(*EXPORTED_LOOK_COLUMNS, LookItem.item_id, LookItem.position, LookItem.bounding_box)
+        .outerjoin(LookItem, LookItem.look_id == OutfitLook.id)
+        .where(OutfitLook.user_id == user_id)
+        .order_by(OutfitLook.created_at, OutfitLook.id, LookItem.position)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    for _, rows in itertools.groupby(looks, key=lambda row: row.id):
+        rows = list(rows)
+        look = rows[0]._asdict()
+        for key in ("item_id", "position", "bounding_box"):
+            look.pop(key)
+        look["items"] = [
+            {"item_id": row.item_id, "position": row.position, "bounding_box": row.bounding_box}
+            for row in rows if row.item_id is not None
+        ]
+        yield {"type": "look", **look}
+
+
+def iter_image_refs(db: Session, user_id: UUID) -> Iterator[tuple]:
+    """(type, id, url) des images référencées par les pièces et les tenues"""
+    for kind, model in (("pieces", ClothingItem), ("looks", OutfitLook)):
+        rows = db.execute(
+            select(model.id, model.image_url)
+            .where(model.user_id == user_id, model.image_url.isnot(None))
+            .order_by(model.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        for row in rows:
+            yield kind, row.id, row.image_url
+
+
+def image_archive_path(kind: str, entity_id: UUID, url: str) -> str:
+    extension = os.path.splitext(urlparse(url).path)[1].lower() or ".jpg"
+    return f"images/{kind}/{entity_id}{extension}"
+
+
+def stream_ndjson(session_factory, user_id: UUID) -> Iterator[bytes]:
+    """Export NDJSON, une ligne par enregistrement"""
+    db = session_factory()
+    try:
+        for record in iter_export_records(db, user_id):
+            yield dumps(record) + b"\n"
+    finally:
+        db.close()
+
+
+def _spool_image(http_client: httpx.Client, url: str):
+    """Télécharge une image entière dans un fichier temporaire rembobiné ; httpx.HTTPError en cas d'échec"""
+    spool = tempfile.SpooledTemporaryFile(max_size=IMAGE_SPOOL_MAX_MEMORY)
+    try:
+        with http_client.stream("GET", url) as response:
+            response.raise_for_status()
+            for chunk in response.iter_bytes(IMAGE_CHUNK_SIZE):
+                spool.write(chunk)
+        spool.seek(0)
+        return spool
+    except BaseException:
+        spool.close()
+        raise
+
+
+class _ChunkSink:
+    """Fichier en écriture seule et non positionnable : zipfile y écrit, le générateur vide"""
+
+    def __init__(self):
+        self.chunks = deque()
+        self.position = 0
+
+    def write(self, data: bytes) -> int:
+        if data:
+            self.chunks.append(bytes(data))
+            self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> Iterator[bytes]:
+        while self.chunks:
+            yield self.chunks.popleft()
+
+
+def stream_zip(session_factory, user_id: UUID, include_images: bool = True,
+               http_client: Optional[httpx.Client] = None) -> Iterator[bytes]:
+    """Archive ZIP : wardrobe.ndjson, les images et un rapport d'export"""
+    sink = _ChunkSink()
+    owns_client = http_client is None
+    if owns_client:
+        http_client = httpx.Client(timeout=httpx.Timeout(30.0, connect=5.0), follow_redirects=True)
+
+    db = session_factory()
+    report = {"images_exported": 0, "images_failed": []}
+    try:
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+            with archive.open("wardrobe.ndjson", mode="w", force_zip64=True) as entry:
+                for record in iter_export_records(db, user_id):
+                    entry.write(dumps(record) + b"\n")
+                    yield from sink.drain()
+
+            if include_images:
+                for kind, entity_id, url in iter_image_refs(db, user_id):
+                    path = image_archive_path(kind, entity_id, url)
+                    try:
+                        spool = _spool_image(http_client, url)
+                    except httpx.HTTPError as e:
+                        report["images_failed"].append({"path": path, "url": url, "error": f"{type(e).__name__}: {e}"})
+                        continue
+
+                    with spool:
+                        # Les images sont déjà compressées : stockage sans deflate
+                        info = zipfile.ZipInfo(path, date_time=datetime.now().timetuple()[:6])
+                        info.compress_type = zipfile.ZIP_STORED
+                        with archive.open(info, mode="w", force_zip64=True) as entry:
+                            for chunk in iter(lambda: spool.read(IMAGE_CHUNK_SIZE), b""):
+                                entry.write(chunk)
+                                yield from sink.drain()
+                    report["images_exported"] += 1
+
+            archive.writestr("export_report.json", dumps(report))
+        yield from sink.drain()
+    finally:
+        db.close()
+        if owns_client:
+            http_client.close()
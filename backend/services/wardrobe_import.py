@@ -0,0 +1,245 @@
+"""
+Import en masse de garde-robe (JSONL / CSV)
+
+Les lignes sont lues en flux, validées par paquets contre ImportedClothingItem
+puis chargées par COPY dans une table temporaire et insérées d'un coup dans
+clothing_items (ON CONFLICT DO NOTHING pour signaler les doublons). Une ligne
+invalide n'interrompt jamais l'import, et la mémoire reste bornée par la
+taille d'un paquet quelle que soit la taille du fichier.
+"""
+import csv
+import io
+import json
+import time
+import uuid
+from contextlib import closing
+from datetime import date
+from typing import Iterable, Iterator, List, NamedTuple, Optional, TextIO, Tuple
+from uuid import UUID
+
+from pydantic import ValidationError
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from database.models import ClothingItem
+from schemas.wardrobe_import import ImportedClothingItem
+
+IMPORT_COLUMNS = (
+    "id", "user_id", "piece_type", "name", "colors", "material", "pattern", "fit",
+    "details", "style_tags", "occasion_tags", "seasonality", "image_url", "thumbnail_url",
+    "brand", "price_range", "notes", "last_worn", "wear_count", "is_favorite", "is_active",
+)
+
+# Nombre maximal d'erreurs détaillées conservées (les suivantes sont seulement comptées)
+MAX_REPORTED_ERRORS = 100
+
+STAGING_TABLE = "clothing_items_import"
+
+
+class RowError(NamedTuple):
+    line: int
+    error: str
+
+
+class ImportReport:
+    """Bilan d'un import : compteurs + premières erreurs par ligne"""
+
+    def __init__(self):
+        self.total = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors: List[RowError] = []
+        self.started_at = time.monotonic()
+
+    def add_error(self, line: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(RowError(line, error))
+
+    @property
+    def duration_s(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def as_dict(self) -> dict:
+        return {
+            "total": self.total,
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": [error._asdict() for error in self.errors],
+            "errors_truncated": self.failed > len(self.errors),
+            "duration_ms": int(self.duration_s * 1000),
+        }
+
+
+def detect_format(filename: Optional[str], explicit: Optional[str] = None) -> str:
+    """Détermine le format (jsonl ou csv) à partir du paramètre ou de l'extension"""
+    candidate = (explicit or (filename or "").rsplit(".", 1)[-1]).lower()
+    if candidate in ("jsonl", "ndjson", "json"):
+        return "jsonl"
+    if candidate == "csv":
+        return "csv"
+    raise ValueError(f"Format d'import non supporté: {candidate or 'inconnu'} (jsonl ou csv)")
+
+
+def iter_records(stream: TextIO, file_format: str) -> Iterator[Tuple[int, object]]:
+    """Lit le flux ligne par ligne et produit (numéro de ligne, dict ou exception de parsing)"""
+    if file_format == "jsonl":
+        for line_no, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, e
+                continue
+            yield line_no, record if isinstance(record, dict) else ValueError("objet JSON attendu")
+    else:
+        reader = csv.DictReader(stream)
+        for row in reader:
+            # Cellules vides -> valeur par défaut du schéma
+            yield reader.line_num, {key: value for key, value in row.items() if key and value not in ("", None)}
+
+
+def _format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc']) or 'ligne'}: {detail['msg']}"
+        for detail in error.errors()
+    )
+
+
+def _array_literal(values: List[str]) -> str:
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"') for value in values)
+    return "{" + ",".join(f'"{value}"' for value in escaped) + "}"
+
+
+def encode_copy_value(value) -> str:
+    """Encode une valeur au format texte de COPY (NULL = \\N, tabulations et sauts de ligne échappés)"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        encoded = "t" if value else "f"
+    elif isinstance(value, list):
+        encoded = _array_literal([str(item) for item in value])
+    elif isinstance(value, dict):
+        encoded = json.dumps(value, ensure_ascii=False)
+    elif isinstance(value, date):
+        encoded = value.isoformat()
+    else:
+        encoded = str(value)
+    return (
+        encoded.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+class WardrobeImporter:
+    """Importe des lignes validées dans clothing_items par paquets"""
+
+    def __init__(self, db: Session, user_id: UUID, chunk_size: int = 1000, dry_run: bool = False):
+        self.db = db
+        self.user_id = user_id
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+
+    def run(self, records: Iterable[Tuple[int, object]]) -> ImportReport:
+        report = ImportReport()
+        chunk: List[Tuple[int, tuple]] = []
+
+        for line_no, record in records:
+            report.total += 1
+            if isinstance(record, Exception):
+                report.add_error(line_no, f"Ligne illisible: {record}")
+                continue
+            try:
+                item = ImportedClothingItem.model_validate(record)
+            except ValidationError as e:
+                report.add_error(line_no, _format_validation_error(e))
+                continue
+
+            chunk.append((line_no, self._to_row(item)))
+            if len(chunk) >= self.chunk_size:
+                self._load_chunk(chunk, report)
+                chunk = []
+
+        if chunk:
+            self._load_chunk(chunk, report)
+        return report
+
+    def _to_row(self, item: ImportedClothingItem) -> tuple:
+        data = item.model_dump(mode="python")
+        data["id"] = item.id or uuid.uuid4()
+        data["user_id"] = self.user_id
+        data["colors"] = item.colors.model_dump()
+        data["is_active"] = True
+        return tuple(data[column] for column in IMPORT_COLUMNS)
+
+    def _load_chunk(self, chunk: List[Tuple[int, tuple]], report: ImportReport) -> None:
+        # Un même id répété dans le paquet ne serait inséré qu'une fois sans erreur
+        seen_ids = set()
+        unique_chunk = []
+        for line_no, row in chunk:
+            if row[0] in seen_ids:
+                report.add_error(line_no, f"id en double dans le fichier: {row[0]}")
+            else:
+                seen_ids.add(row[0])
+                unique_chunk.append((line_no, row))
+        chunk = unique_chunk
+
+        if self.dry_run:
+            report.imported += len(chunk)
+            return
+
+        try:
+            inserted_ids = self._insert_chunk([row for _, row in chunk])
+            if inserted_ids:
+                from services.wardrobe_service import WardrobeService
+                WardrobeService(self.db)._mark_wardrobe_changed(self.user_id)
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            for line_no, _ in chunk:
+                report.add_error(line_no, f"Échec du chargement du paquet: {type(e).__name__}: {e}")
+            return
+
+        report.imported += len(inserted_ids)
+        for line_no, row in chunk:
+            if row[0] not in inserted_ids:
+                report.add_error(line_no, f"id déjà existant: {row[0]}")
+
+    def _insert_chunk(self, rows: List[tuple]) -> set:
+        """Charge un paquet et retourne les ids réellement insérés"""
+        raw = self.db.connection().connection
+        # Curseur DBAPI fermé dans tous les cas (closing : tous les drivers ne sont pas des context managers)
+        with closing(raw.cursor()) as cursor:
+            if not hasattr(cursor, "copy_expert"):
+                # Driver sans COPY (psycopg2 uniquement) : INSERT multi-lignes
+                return self._insert_multirow(rows)
+
+            buffer = io.StringIO()
+            for row in rows:
+                buffer.write("\t".join(encode_copy_value(value) for value in row))
+                buffer.write("\n")
+            buffer.seek(0)
+
+            columns = ", ".join(IMPORT_COLUMNS)
+            self.db.execute(text(
+                f"CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} "
+                f"(LIKE clothing_items INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+            ))
+            cursor.copy_expert(f"COPY {STAGING_TABLE} ({columns}) FROM STDIN", buffer)
+        result = self.db.execute(text(
+            f"INSERT INTO clothing_items ({columns}) SELECT {columns} FROM {STAGING_TABLE} "
+            f"ON CONFLICT (id) DO NOTHING RETURNING id"
+        ))
+        # La table de staging est vidée au commit (ON COMMIT DELETE ROWS)
+        return {UUID(str(row[0])) for row in result}
+
+    def _insert_multirow(self, rows: List[tuple]) -> set:
+        stmt = pg_insert(ClothingItem).values(
+            [dict(zip(IMPORT_COLUMNS, row)) for row in rows]
+        ).on_conflict_do_nothing(index_elements=["id"]).returning(ClothingItem.id)
+        return set(self.db.execute(stmt).scalars())
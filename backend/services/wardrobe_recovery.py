@@ -0,0 +1,385 @@
+"""
+Pipeline de récupération de garde-robe depuis le bucket storage
+
+Le bucket est plat : les découpes de pièces sont à la racine sous
+"piece_<user>_<pièce>_<ts>.jpg" (backend) et les photos de tenue sous
+"outfit_<user>_<ts>.jpg" (client) ; seules les photos d'analyse sont rangées
+dans un dossier "<user>/". La racine est listée page par page (triée par
+nom) et consommée au fil de l'eau : les fichiers consécutifs d'un même
+utilisateur et d'une même source (découpes "piece_", photos "outfit_" ou
+dossier, listé par le worker) forment un groupe, placé dans une file bornée
+dès qu'il est complet. Le listing n'avance qu'au rythme des workers et n'est
+jamais chargé en entier. Les fichiers sans utilisateur identifiable
+("<ts>_<aléa>.jpg") sont comptés puis ignorés. Les groupes sont traités en
+parallèle avec une concurrence bornée, les insertions sont validées par lots
+(commit par lot) et un point de reprise est enregistré après chaque groupe.
+Le listing et l'écriture sont injectés : le pipeline se teste avec un faux
+storage et un faux puits, sans réseau ni base.
+"""
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Protocol, Set, Tuple, Union
+
+import httpx
+
+UUID_PATTERN = r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+# "piece_<user>_<pièce>_<ts>.jpg" ou "outfit_<user>_<ts>.jpg" à la racine du bucket
+FLAT_FILE_PATTERN = re.compile(rf"^(?:piece_(?P<piece_user>{UUID_PATTERN})_(?P<piece>{UUID_PATTERN})|outfit_(?P<outfit_user>{UUID_PATTERN}))_", re.IGNORECASE)
+USER_FOLDER_PATTERN = re.compile(rf"^{UUID_PATTERN}$", re.IGNORECASE)
+
+# Sources des fichiers d'un utilisateur, traitées et notées séparément dans le point de reprise
+SOURCE_FOLDER = "folder"
+SOURCE_OUTFIT = "outfit"
+SOURCE_PIECE = "piece"
+
+
+class StorageLister(Protocol):
+    async def list_page(self, prefix: str, limit: int, offset: int) -> List[dict]:
+        """Retourne une page d'entrées ({"name": ..., "id": ...}) sous le préfixe"""
+        ...
+
+
+class RecoverySink(Protocol):
+    def existing_image_urls(self, user_id: str) -> Set[str]:
+        ...
+
+    def insert_items(self, user_id: str, items: List[dict]) -> int:
+        """Insère un lot (commit inclus) et retourne le nombre de lignes créées"""
+        ...
+
+
+class SupabaseStorageLister:
+    """Listing paginé de l'API Storage de Supabase (POST /object/list/{bucket})"""
+
+    def __init__(self, client: httpx.AsyncClient, supabase_url: str, api_key: str, bucket: str = "wardrobe"):
+        self.client = client
+        self.url = f"{supabase_url}/storage/v1/object/list/{bucket}"
+        self.headers = {"apikey": api_key, "Authorization": f"Bearer {api_key}"}
+
+    async def list_page(self, prefix: str, limit: int, offset: int) -> List[dict]:
+        response = await self.client.post(
+            self.url,
+            headers=self.headers,
+            json={"prefix": prefix, "limit": limit, "offset": offset, "sortBy": {"column": "name", "order": "asc"}},
+        )
+        response.raise_for_status()
+        return response.json()
+
+
+async def iter_listing(lister: StorageLister, prefix: str, page_size: int) -> AsyncIterator[dict]:
+    """Parcourt toutes les pages d'un préfixe"""
+    offset = 0
+    while True:
+        page = await lister.list_page(prefix, page_size, offset)
+        for entry in page:
+            yield entry
+        if len(page) < page_size:
+            return
+        offset += len(page)
+
+
+async def _aiter(values: Union[Iterable, AsyncIterable]) -> AsyncIterator:
+    if hasattr(values, "__aiter__"):
+        async for value in values:
+            yield value
+    else:
+        for value in values:
+            yield value
+
+
+def guess_piece_type(file_name: str) -> Tuple[str, str]:
+    """Devine le type de vêtement et un nom par défaut à partir du nom de fichier"""
+    file_lower = file_name.lower()
+    if any(word in file_lower for word in ["shirt", "chemise", "tshirt", "t-shirt", "haut", "top"]):
+        return "shirt", "Haut importé"
+    if any(word in file_lower for word in ["pants", "pantalon", "jean", "jeans", "trouser"]):
+        return "pants", "Pantalon importé"
+    if any(word in file_lower for word in ["dress", "robe"]):
+        return "dress", "Robe importée"
+    if any(word in file_lower for word in ["skirt", "jupe"]):
+        return "skirt", "Jupe importée"
+    if any(word in file_lower for word in ["jacket", "veste", "blazer", "coat", "manteau"]):
+        return "jacket", "Veste importée"
+    if any(word in file_lower for word in ["shoe", "chaussure", "sneaker", "boot"]):
+        return "shoes", "Chaussures importées"
+    return "unknown", "Vêtement importé"
+
+
+def parse_file_owner(file_name: str) -> Tuple[Optional[str], Optional[str]]:
+    """(utilisateur, pièce) d'après un nom de fichier à la racine ; (None, None) si anonyme"""
+    match = FLAT_FILE_PATTERN.match(file_name)
+    if not match:
+        return None, None
+    user_id = match.group("piece_user") or match.group("outfit_user")
+    piece_id = match.group("piece")
+    return user_id.lower(), piece_id.lower() if piece_id else None
+
+
+def create_clothing_item_from_image(user_id: str, file_path: str, image_url: str) -> Dict:
+    """Crée les données d'un ClothingItem basique à partir d'une image"""
+    piece_type, name = guess_piece_type(file_path.rsplit("/", 1)[-1])
+    # Découpe d'une pièce : l'id de la pièce d'origine est repris (pas de doublon à la relance)
+    _, piece_id = parse_file_owner(file_path)
+    return {
+        "id": uuid.UUID(piece_id) if piece_id else uuid.uuid4(),
+        "user_id": user_id,
+        "piece_type": piece_type,
+        "name": name,
+        "colors": {"primary": [], "secondary": []},
+        "material": None,
+        "pattern": "uni",
+        "fit": "regular",
+        "details": [],
+        "style_tags": ["imported"],
+        "occasion_tags": ["casual"],
+        "seasonality": ["all_season"],
+        "image_url": image_url,
+        "brand": None,
+        "notes": f"Importé automatiquement le {datetime.now().strftime('%Y-%m-%d')}",
+        "is_active": True,
+        "is_favorite": False,
+        "wear_count": 0,
+    }
+
+
+class RecoveryCheckpoint:
+    """Point de reprise : groupes "<user>:<source>" entièrement traités, réécrit atomiquement"""
+
+    def __init__(self, path: Optional[Path]):
+        self.path = path
+        self.completed: Set[str] = set()
+        if path and path.exists():
+            self.completed = set(json.loads(path.read_text()).get("completed_users", []))
+
+    def is_done(self, user_id: str, source: str) -> bool:
+        # Entrée sans source (ancien point de reprise) : utilisateur entièrement traité
+        return user_id in self.completed or f"{user_id}:{source}" in self.completed
+
+    def mark_done(self, user_id: str, source: str) -> None:
+        self.completed.add(f"{user_id}:{source}")
+        if not self.path:
+            return
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp_path.write_text(json.dumps({"completed_users": sorted(self.completed)}))
+        os.replace(tmp_path, self.path)
+
+
+class RecoveryMetrics:
+    """Compteurs de débit du pipeline"""
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.groups_done = 0
+        self.groups_skipped = 0
+        self.groups_failed = 0
+        self.files_seen = 0
+        self.files_unattributed = 0
+        self.items_created = 0
+        self.items_existing = 0
+        self.batches = 0
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def summary(self) -> str:
+        elapsed = max(self.elapsed, 1e-9)
+        return (
+            f"{self.groups_done} groupes utilisateur/source traités ({self.groups_skipped} déjà faits, {self.groups_failed} en échec), "
+            f"{self.files_seen} fichiers ({self.files_unattributed} sans utilisateur ignorés), {self.items_created} créés, {self.items_existing} existants, "
+            f"{self.batches} lots en {self.elapsed:.1f}s "
+            f"({self.files_seen / elapsed:.0f} fichiers/s, {self.items_created / elapsed:.0f} créations/s)"
+        )
+
+
+class RecoveryPipeline:
+    """Récupère les vêtements du bucket et crée les entrées manquantes"""
+
+    def __init__(
+        self,
+        lister: StorageLister,
+        sink: RecoverySink,
+        public_url_base: str,
+        checkpoint: Optional[RecoveryCheckpoint] = None,
+        concurrency: int = 4,
+        batch_size: int = 500,
+        page_size: int = 1000,
+        dry_run: bool = False,
+    ):
+        self.lister = lister
+        self.sink = sink
+        self.public_url_base = public_url_base.rstrip("/")
+        self.checkpoint = checkpoint or RecoveryCheckpoint(None)
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.page_size = page_size
+        self.dry_run = dry_run
+        self.metrics = RecoveryMetrics()
+
+    async def run(self) -> RecoveryMetrics:
+        # File bornée : le listing n'avance qu'au rythme des workers
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.concurrency)]
+
+        try:
+            async for user_id, source, file_paths in self._iter_groups():
+                if self.checkpoint.is_done(user_id, source):
+                    self.metrics.groups_skipped += 1
+                    continue
+                await queue.put((user_id, source, file_paths))
+        finally:
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+
+        if self.metrics.files_unattributed:
+            print(f"  ⚠️ {self.metrics.files_unattributed} fichiers sans utilisateur dans leur nom ignorés")
+        return self.metrics
+
+    async def _iter_groups(self) -> AsyncIterator[Tuple[str, str, Union[List[str], AsyncIterator[str]]]]:
+        """(utilisateur, source, chemins) au fil du listing de la racine.
+
+        Le listing étant trié par nom, les fichiers plats d'un utilisateur et d'une
+        source sont consécutifs : seul le groupe en cours est gardé en mémoire. Un
+        dossier "<user>/" est émis dès qu'il est rencontré, ses fichiers étant listés
+        par le worker qui le traite.
+        """
+        current: Optional[Tuple[str, str]] = None
+        file_paths: List[str] = []
+
+        async for entry in iter_listing(self.lister, "", self.page_size):
+            name = entry.get("name")
+            if not name or name.startswith("."):
+                continue
+            if entry.get("id") is None:
+                # Dossier (id null) : seuls les dossiers nommés par un id utilisateur sont parcourus
+                if USER_FOLDER_PATTERN.match(name):
+                    yield name.lower(), SOURCE_FOLDER, self._iter_folder(name)
+                continue
+            user_id, piece_id = parse_file_owner(name)
+            if user_id is None:
+                self.metrics.files_unattributed += 1
+                continue
+            group = (user_id, SOURCE_PIECE if piece_id else SOURCE_OUTFIT)
+            if group != current:
+                if file_paths:
+                    yield (*current, file_paths)
+                current, file_paths = group, []
+            file_paths.append(name)
+
+        if file_paths:
+            yield (*current, file_paths)
+
+    async def _iter_folder(self, folder: str) -> AsyncIterator[str]:
+        async for entry in iter_listing(self.lister, f"{folder}/", self.page_size):
+            name = entry.get("name")
+            if name and not name.startswith(".") and entry.get("id") is not None:
+                yield f"{folder}/{name}"
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            job = await queue.get()
+            if job is None:
+                return
+            user_id, source, file_paths = job
+            try:
+                await self.process_user(user_id, source, file_paths)
+            except Exception as e:
+                self.metrics.groups_failed += 1
+                print(f"  ❌ Utilisateur {user_id} ({source}): {type(e).__name__}: {e}")
+
+    async def process_user(self, user_id: str, source: str,
+                           file_paths: Union[Iterable[str], AsyncIterable[str]]) -> int:
+        """Crée les pièces manquantes d'un groupe de fichiers (liste ou itérateur asynchrone)"""
+        existing_urls = await asyncio.to_thread(self.sink.existing_image_urls, user_id)
+        batch: List[dict] = []
+        seen_ids: Set[uuid.UUID] = set()
+        created = 0
+
+        async for file_path in _aiter(file_paths):
+            self.metrics.files_seen += 1
+            image_url = f"{self.public_url_base}/{file_path}"
+            if image_url in existing_urls:
+                self.metrics.items_existing += 1
+                continue
+
+            item = create_clothing_item_from_image(user_id, file_path, image_url)
+            # Plusieurs découpes d'une même pièce : une seule entrée
+            if item["id"] in seen_ids:
+                self.metrics.items_existing += 1
+                continue
+            seen_ids.add(item["id"])
+
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                created += await self._flush(user_id, batch)
+                batch = []
+
+        if batch:
+            created += await self._flush(user_id, batch)
+
+        if not self.dry_run:
+            self.checkpoint.mark_done(user_id, source)
+        self.metrics.groups_done += 1
+        print(f"  ✅ Utilisateur {user_id} ({source}): {created} vêtements {'à créer' if self.dry_run else 'créés'}")
+        return created
+
+    async def _flush(self, user_id: str, batch: List[dict]) -> int:
+        self.metrics.batches += 1
+        if self.dry_run:
+            count = len(batch)
+        else:
+            count = await asyncio.to_thread(self.sink.insert_items, user_id, batch)
+        self.metrics.items_created += count
+        return count
+
+
+class DatabaseRecoverySink:
+    """Puits SQL : une session par opération, un commit par lot"""
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+
+    def existing_image_urls(self, user_id: str) -> Set[str]:
+        from database.models import ClothingItem, OutfitLook
+
+        db = self.session_factory()
+        try:
+            # Les photos de tenue déjà rattachées à une tenue ne sont pas recréées en pièces
+            urls = set()
+            for model in (ClothingItem, OutfitLook):
+                rows = db.query(model.image_url).filter(
+                    model.user_id == user_id,
+                    model.image_url.isnot(None)
+                ).all()
+                urls.update(row.image_url for row in rows)
+            return urls
+        finally:
+            db.close()
+
+    def insert_items(self, user_id: str, items: List[dict]) -> int:
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        from database.models import ClothingItem
+        from services.wardrobe_service import WardrobeService
+
+        db = self.session_factory()
+        try:
+            stmt = pg_insert(ClothingItem).values(items).on_conflict_do_nothing(
+                index_elements=["id"]
+            ).returning(ClothingItem.id)
+            created = len(db.execute(stmt).all())
+            if created:
+                WardrobeService(db)._mark_wardrobe_changed(uuid.UUID(user_id))
+            db.commit()
+            return created
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
@@ -0,0 +1,179 @@
+"""
+Recherche à facettes dans la garde-robe
+
+Les filtres sont combinés en ET entre facettes et en OU à l'intérieur d'une
+facette (ex: couleur noire ou blanche, ET saison été). Les compteurs sont
+disjonctifs : ceux d'une facette sont calculés avec tous les filtres sauf le
+sien, pour que les autres valeurs de la facette restent proposées avec leur
+nombre de résultats si on les ajoute. Les pièces de la page demandée et les
+compteurs de toutes les facettes sont produits par une seule requête
+agrégée (chaque filtre est évalué une fois par pièce). Les compteurs ne
+dépendent que des filtres et du contenu de la garde-robe : ils sont mis en
+cache par version, et une recherche déjà vue ne recalcule que la page.
+"""
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+from sqlalchemy.types import String
+
+from core.cache import LRUCache
+from core.config import settings
+from services.wardrobe_stats import count_object_sql, primary_colors_sql
+
+# Facettes filtrables et comptées, par type de colonne
+SCALAR_FACETS = ("piece_type", "material", "pattern")
+ARRAY_FACETS = ("seasonality", "style_tags", "occasion_tags")
+COLOR_FACET = "colors"
+FACETS = SCALAR_FACETS + (COLOR_FACET,) + ARRAY_FACETS
+
+# Champs de pièce renvoyés (mêmes clés que la liste des pièces)
+ITEM_FIELDS = {
+    "piece_id": "id",
+    "piece_type": "piece_type",
+    "name": "name",
+    "colors": "colors",
+    "material": "material",
+    "pattern": "pattern",
+    "fit": "fit",
+    "details": "details",
+    "style_tags": "style_tags",
+    "occasion_tags": "occasion_tags",
+    "seasonality": "seasonality",
+    "image_url": "image_url",
+    "is_favorite": "is_favorite",
+    "wear_count": "wear_count",
+    "look_count": "look_count",
+    "created_at": "created_at",
+}
+# Champs calculés pour les seules pièces de la page : nombre de tenues contenant la pièce
+# (même sous-requête que la liste des pièces, servie par l'index look_items.item_id)
+PAGE_FIELDS = {
+    "look_count": "(SELECT count(*) FROM look_items li WHERE li.item_id = p.id)",
+}
+BASE_COLUMNS = [column for column in ITEM_FIELDS.values() if column not in PAGE_FIELDS]
+
+facet_cache = LRUCache(maxsize=settings.WARDROBE_SEARCH_CACHE_SIZE)
+
+
+def _facet_filter(facet: str) -> str:
+    param = f":f_{facet}"
+    if facet in SCALAR_FACETS:
+        return f"i.{facet} = ANY({param})"
+    if facet == COLOR_FACET:
+        return f"({primary_colors_sql('i')}) ?| {param}"
+    return f"i.{facet} && {param}"
+
+
+def _all_of(flags: List[str]) -> str:
+    return " AND ".join(flags) or "TRUE"
+
+
+def _facet_count(facet: str, condition: str) -> str:
+    """Compteurs d'une facette sur les pièces de base qui satisfont `condition` (les autres filtres)"""
+    if facet in SCALAR_FACETS:
+        return count_object_sql(
+            f"SELECT m.{facet}, count(*) FROM base m WHERE {condition} AND m.{facet} IS NOT NULL GROUP BY 1"
+        )
+    if facet == COLOR_FACET:
+        return count_object_sql(
+            f"SELECT c.v, count(*) FROM base m, jsonb_array_elements_text({primary_colors_sql('m')}) AS c(v) "
+            f"WHERE {condition} GROUP BY 1"
+        )
+    return count_object_sql(f"SELECT t.v, count(*) FROM base m, unnest(m.{facet}) AS t(v) WHERE {condition} GROUP BY 1")
+
+
+def _text_match(trigram: bool) -> Tuple[str, str]:
+    """Condition et score de pertinence pour la recherche texte sur name / notes"""
+    if trigram:
+        # word_similarity : tolère les fautes de frappe, s'appuie sur les index GIN gin_trgm_ops
+        return (
+            "(:q <% coalesce(i.name, '') OR :q <% coalesce(i.notes, ''))",
+            "greatest(word_similarity(:q, coalesce(m.name, '')), word_similarity(:q, coalesce(m.notes, '')))",
+        )
+    return "(i.name ILIKE :q_like OR i.notes ILIKE :q_like)", "0"
+
+
+def build_search_sql(filters: Dict[str, List[str]], query: Optional[str], with_facets: bool, trigram: bool):
+    """Construit la requête de recherche (une ligne : items, puis total et facettes si demandés)"""
+    conditions = ["i.user_id = :user_id", "i.is_active"]
+    # Un indicateur par filtre de facette, évalué une fois par pièce de base
+    active = [facet for facet in FACETS if filters.get(facet)]
+    flags = {facet: f"m.ok_{facet}" for facet in active}
+    flag_columns = "".join(f", {_facet_filter(facet)} AS ok_{facet}" for facet in active)
+
+    rank = "0"
+    if query:
+        match, rank = _text_match(trigram)
+        conditions.append(match)
+
+    item_object = ", ".join(f"'{key}', {PAGE_FIELDS.get(column, f'p.{column}')}" for key, column in ITEM_FIELDS.items())
+    columns = [
+        f"(SELECT COALESCE(jsonb_agg(jsonb_build_object({item_object}) ORDER BY p.rank DESC, p.created_at DESC), '[]'::jsonb) "
+        f"FROM page p) AS items"
+    ]
+    if with_facets:
+        facets = ", ".join(
+            f"'{facet}', {_facet_count(facet, _all_of([flag for other, flag in flags.items() if other != facet]))}"
+            for facet in FACETS
+        )
+        columns.append("(SELECT count(*) FROM matched) AS total")
+        columns.append(f"jsonb_build_object({facets}) AS facets")
+
+    sql = f"""
+WITH base AS (
+    SELECT {', '.join(f'i.{column}' for column in BASE_COLUMNS)}, i.notes{flag_columns}
+    FROM clothing_items i
+    WHERE {' AND '.join(conditions)}
+),
+matched AS (
+    SELECT m.* FROM base m WHERE {_all_of(list(flags.values()))}
+),
+page AS (
+    SELECT m.*, {rank} AS rank FROM matched m
+    ORDER BY rank DESC, m.created_at DESC
+    LIMIT :limit OFFSET :offset
+)
+SELECT {', '.join(columns)}
+"""
+    params = [bindparam(f"f_{facet}", type_=ARRAY(String)) for facet in active]
+    return text(sql).bindparams(*params)
+
+
+class WardrobeSearchService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def search(
+        self,
+        user_id: UUID,
+        version: int,
+        filters: Dict[str, List[str]],
+        query: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> dict:
+        """Pièces correspondant aux filtres + compteurs par facette (mis en cache par version)"""
+        filters = {facet: sorted(set(values)) for facet, values in filters.items() if facet in FACETS and values}
+        query = (query or "").strip() or None
+
+        cache_key = (user_id, version, tuple(sorted((facet, tuple(values)) for facet, values in filters.items())), query)
+        cached = facet_cache.get(cache_key)
+
+        params = {"user_id": user_id, "limit": limit, "offset": offset}
+        params.update({f"f_{facet}": values for facet, values in filters.items()})
+        if query:
+            params["q"] = query
+            params["q_like"] = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+        stmt = build_search_sql(filters, query, with_facets=cached is None, trigram=settings.WARDROBE_SEARCH_TRIGRAM)
+        row = self.db.execute(stmt, params).one()
+
+        if cached is None:
+            cached = (row.total, row.facets)
+            facet_cache.set(cache_key, cached)
+
+        total, facets = cached
+        return {"total": total, "items": row.items, "facets": facets, "limit": limit, "offset": offset}
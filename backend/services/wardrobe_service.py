@@ -1,13 +1,388 @@
-from typing import List, Optional, Union
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
 from uuid import UUID
+from datetime import datetime, timedelta
 import time
 import io
 import base64
+import select as fd_select
+import threading
 import httpx
 from PIL import Image
+from pydantic import TypeAdapter
+from sqlalchemy import String, bindparam, cast, event, func, literal, select, update
 from sqlalchemy.orm import Session
-from database.models import ClothingItem, OutfitLook, LookItem, AnalysisHistory
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from database.models import ClothingItem, OutfitLook, LookItem, WardrobeVersion
 from schemas.clothing_analysis import SinglePieceResponse, CompleteLookResponse, ClothingPiece as ClothingPieceSchema
+from services.analysis_history import analysis_log, build_analysis_record, verify_analysis_token
+from core.cache import LRUCache
+from core.config import settings
+
+
+# Colonnes projetées pour la liste des pièces
+PIECE_COLUMNS = (
+    ClothingItem.id,
+    ClothingItem.piece_type,
+    ClothingItem.name,
+    ClothingItem.colors,
+    ClothingItem.material,
+    ClothingItem.pattern,
+    ClothingItem.fit,
+    ClothingItem.details,
+    ClothingItem.style_tags,
+    ClothingItem.occasion_tags,
+    ClothingItem.seasonality,
+    ClothingItem.image_url,
+    ClothingItem.is_favorite,
+    ClothingItem.wear_count,
+    ClothingItem.created_at,
+)
+
+# Colonnes renvoyées après la modification d'une pièce
+ITEM_COLUMNS = PIECE_COLUMNS + (
+    ClothingItem.user_id,
+    ClothingItem.brand,
+    ClothingItem.updated_at,
+)
+
+# Colonnes modifiables par PATCH (les clés système ne le sont jamais)
+UPDATABLE_ITEM_COLUMNS = frozenset(
+    column.name for column in ClothingItem.__table__.columns
+) - {"id", "user_id", "created_at", "updated_at", "change_seq"}
+
+# Colonnes projetées pour la liste des tenues (évite de charger les entités complètes)
+LOOK_COLUMNS = (
+    OutfitLook.id,
+    OutfitLook.user_id,
+    OutfitLook.name,
+    OutfitLook.dominant_style,
+    OutfitLook.occasion_tags,
+    OutfitLook.seasonality,
+    OutfitLook.color_palette,
+    OutfitLook.pattern_mix,
+    OutfitLook.silhouette,
+    OutfitLook.layering_level,
+    OutfitLook.image_url,
+    OutfitLook.rating,
+    OutfitLook.is_favorite,
+    OutfitLook.wear_count,
+    OutfitLook.created_at,
+)
+
+# Nombre de tenues contenant la pièce (sous-requête servie par l'index look_items.item_id)
+LOOK_COUNT_COLUMN = select(func.count()).where(
+    LookItem.item_id == ClothingItem.id
+).correlate(ClothingItem).scalar_subquery().label("look_count")
+
+# Colonnes des tenues contenant une pièce donnée, avec la position de la pièce dans la tenue
+PIECE_LOOK_COLUMNS = (
+    OutfitLook.id,
+    OutfitLook.name,
+    OutfitLook.dominant_style,
+    OutfitLook.occasion_tags,
+    OutfitLook.image_url,
+    OutfitLook.is_favorite,
+    OutfitLook.wear_count,
+    OutfitLook.created_at,
+    LookItem.position,
+    LookItem.bounding_box,
+)
+
+# Seules colonnes de ClothingItem nécessaires pour afficher les pièces d'une tenue
+LOOK_PIECE_COLUMNS = (
+    ClothingItem.piece_type,
+    ClothingItem.name,
+    ClothingItem.colors,
+    ClothingItem.image_url,
+)
+
+
+class LookPiece(NamedTuple):
+    """Pièce référencée par une tenue (partagée entre les tenues qui la contiennent)"""
+    piece_type: Optional[str]
+    name: Optional[str]
+    colors: Optional[dict]
+    image_url: Optional[str]
+
+
+class LookItemRow(NamedTuple):
+    """Lien tenue-pièce avec ses coordonnées dans l'image"""
+    item_id: UUID
+    position: Optional[int]
+    bounding_box: Optional[dict]
+    item: LookPiece
+
+
+class LookRow(NamedTuple):
+    """Tenue chargée avec ses pièces, prête à être sérialisée"""
+    id: UUID
+    user_id: UUID
+    name: Optional[str]
+    dominant_style: Optional[List[str]]
+    occasion_tags: Optional[List[str]]
+    seasonality: Optional[List[str]]
+    color_palette: Optional[dict]
+    pattern_mix: Optional[List[str]]
+    silhouette: Optional[str]
+    layering_level: Optional[int]
+    image_url: Optional[str]
+    rating: Optional[int]
+    is_favorite: Optional[bool]
+    wear_count: Optional[int]
+    created_at: Optional[datetime]
+    items: Tuple[LookItemRow, ...] = ()
+
+
+class PieceRow(NamedTuple):
+    """Pièce active d'une garde-robe, telle que renvoyée par la liste des pièces"""
+    id: UUID
+    piece_type: str
+    name: Optional[str]
+    colors: Optional[dict]
+    material: Optional[str]
+    pattern: Optional[str]
+    fit: Optional[str]
+    details: Optional[List[str]]
+    style_tags: Optional[List[str]]
+    occasion_tags: Optional[List[str]]
+    seasonality: Optional[List[str]]
+    image_url: Optional[str]
+    is_favorite: Optional[bool]
+    wear_count: Optional[int]
+    created_at: Optional[datetime]
+    look_count: int = 0
+
+
+class WardrobeSnapshot(NamedTuple):
+    """Instantané immuable de la garde-robe d'un utilisateur à une version donnée.
+
+    Les valeurs JSON (colors, bounding_box...) sont partagées entre les requêtes :
+    elles ne doivent jamais être modifiées en place.
+    """
+    user_id: UUID
+    version: int
+    pieces: Tuple[PieceRow, ...]
+    looks: Tuple[LookRow, ...]
+    wear_version: int = 0  # Version des compteurs de port (wear_count), rafraîchis sans recharger le reste
+    
+    def pieces_of_type(self, piece_type: Optional[str] = None) -> List[PieceRow]:
+        if not piece_type:
+            return list(self.pieces)
+        return [piece for piece in self.pieces if piece.piece_type == piece_type]
+
+
+# Préfixe du NOTIFY émis quand seuls les compteurs de port changent (l'instantané reste valide)
+WEAR_NOTIFY_PREFIX = "wear:"
+
+# Instantanés du cache partagé : JSON validé à la lecture (jamais de pickle depuis un service partagé)
+snapshot_adapter = TypeAdapter(WardrobeSnapshot)
+
+
+class RedisSnapshotBackend:
+    """Backend partagé optionnel : les instantanés sont indexés par (utilisateur, version),
+    une écriture crée donc une nouvelle clé et n'a rien à invalider"""
+    
+    def __init__(self, url: str, ttl: int):
+        import redis  # Dépendance optionnelle
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+    
+    @staticmethod
+    def _key(user_id: UUID, version: int) -> str:
+        return f"wardrobe:{user_id}:{version}"
+    
+    def get(self, user_id: UUID, version: int) -> Optional[WardrobeSnapshot]:
+        data = self.client.get(self._key(user_id, version))
+        return snapshot_adapter.validate_json(data) if data else None
+    
+    def set(self, snapshot: WardrobeSnapshot) -> None:
+        self.client.set(
+            self._key(snapshot.user_id, snapshot.version),
+            snapshot_adapter.dump_json(snapshot),
+            ex=self.ttl
+        )
+
+
+class WardrobeCache:
+    """Cache des instantanés de garde-robe : LRU local + backend partagé optionnel.
+
+    Le LRU local n'est utilisé sans vérification que tant que le listener
+    LISTEN/NOTIFY est connecté (les autres workers nous préviennent alors de
+    chaque écriture). Sinon, chaque lecture relit la version en base (lookup par
+    clé primaire) et n'utilise que des instantanés de cette version. Un port
+    (mark_worn) ne jette pas l'instantané : seuls ses compteurs de port sont
+    relus à la lecture suivante.
+    """
+    
+    def __init__(self, maxsize: int, shared: Optional[RedisSnapshotBackend] = None):
+        self._local = LRUCache(maxsize)
+        self.shared = shared
+        self.listening = False
+        self._lock = threading.Lock()
+        self._epoch = 0
+        self._generations: Dict[UUID, int] = {}
+        self._worn = set()
+    
+    def generation(self, user_id: UUID) -> Tuple[int, int]:
+        """Jeton à capturer avant un chargement, pour ne pas stocker un instantané invalidé entre-temps"""
+        with self._lock:
+            return self._epoch, self._generations.get(user_id, 0)
+    
+    def get(self, user_id: UUID) -> Optional[WardrobeSnapshot]:
+        """Instantané local, seulement si l'invalidation inter-workers est active et ses compteurs de port à jour"""
+        if not self.listening or user_id in self._worn:
+            return None
+        return self._local.get(user_id)
+    
+    def get_version(self, user_id: UUID, version: int) -> Optional[WardrobeSnapshot]:
+        """Instantané d'une version précise (local puis partagé)"""
+        snapshot = self._local.get(user_id)
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        if self.shared is None:
+            return None
+        try:
+            return self.shared.get(user_id, version)
+        except Exception as e:
+            print(f"⚠️ Cache partagé indisponible (lecture): {e}")
+            return None
+    
+    def store(self, snapshot: WardrobeSnapshot, generation: Tuple[int, int]) -> None:
+        with self._lock:
+            if (self._epoch, self._generations.get(snapshot.user_id, 0)) != generation:
+                return  # Invalidé pendant le chargement
+            self._local.set(snapshot.user_id, snapshot)
+            self._worn.discard(snapshot.user_id)
+    
+    def store_shared(self, snapshot: WardrobeSnapshot) -> None:
+        if self.shared is None:
+            return
+        try:
+            self.shared.set(snapshot)
+        except Exception as e:
+            print(f"⚠️ Cache partagé indisponible (écriture): {e}")
+    
+    def invalidate(self, user_id: UUID) -> None:
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            self._local.pop(user_id)
+            self._worn.discard(user_id)
+    
+    def mark_worn(self, user_id: UUID) -> None:
+        """Compteurs de port modifiés : l'instantané est gardé, la prochaine lecture relit wear_version"""
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            self._worn.add(user_id)
+    
+    def invalidate_all(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._generations.clear()
+            self._local.clear()
+            self._worn.clear()
+
+
+class WardrobeInvalidationListener(threading.Thread):
+    """Écoute les NOTIFY émis par les écritures des autres workers et invalide le cache local"""
+    
+    def __init__(self, engine, cache: WardrobeCache, channel: str, retry_delay: float = 5.0):
+        super().__init__(name="wardrobe-invalidation", daemon=True)
+        self.engine = engine
+        self.cache = cache
+        self.channel = channel
+        self.retry_delay = retry_delay
+        self._stopped = threading.Event()
+    
+    def stop(self) -> None:
+        self._stopped.set()
+    
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                print(f"⚠️ Listener d'invalidation déconnecté: {type(e).__name__}: {e}")
+            finally:
+                self.cache.listening = False
+            self._stopped.wait(self.retry_delay)
+    
+    def _listen(self) -> None:
+        # Connexion dédiée hors pool : elle reste ouverte tant que le worker tourne
+        dialect = self.engine.dialect
+        cargs, cparams = dialect.create_connect_args(self.engine.url)
+        conn = dialect.loaded_dbapi.connect(*cargs, **cparams)
+        try:
+            if not hasattr(conn, "poll"):
+                # Seul psycopg2 est supporté : on reste en mode vérifié par version
+                print("⚠️ Driver sans support LISTEN/NOTIFY, cache local vérifié par version")
+                self._stopped.set()
+                return
+            conn.autocommit = True
+            cursor = conn.cursor()
+            cursor.execute(f"LISTEN {self.channel}")
+            
+            # Des notifications ont pu être manquées pendant la déconnexion
+            self.cache.invalidate_all()
+            self.cache.listening = True
+            print(f"👂 Invalidation du cache de garde-robe via LISTEN {self.channel}")
+            
+            while not self._stopped.is_set():
+                if fd_select.select([conn], [], [], 5.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    try:
+                        if notify.payload.startswith(WEAR_NOTIFY_PREFIX):
+                            self.cache.mark_worn(UUID(notify.payload[len(WEAR_NOTIFY_PREFIX):]))
+                        else:
+                            self.cache.invalidate(UUID(notify.payload))
+                    except ValueError:
+                        self.cache.invalidate_all()
+        finally:
+            conn.close()
+
+
+def _build_shared_backend() -> Optional[RedisSnapshotBackend]:
+    if not settings.WARDROBE_CACHE_REDIS_URL:
+        return None
+    try:
+        return RedisSnapshotBackend(settings.WARDROBE_CACHE_REDIS_URL, settings.WARDROBE_CACHE_SHARED_TTL)
+    except ImportError:
+        print("⚠️ WARDROBE_CACHE_REDIS_URL défini mais le paquet redis n'est pas installé")
+        return None
+
+
+wardrobe_cache = WardrobeCache(settings.WARDROBE_CACHE_SIZE, shared=_build_shared_backend())
+_listener: Optional[WardrobeInvalidationListener] = None
+
+
+def start_wardrobe_cache_listener(engine) -> None:
+    """Démarre l'écoute des invalidations (à appeler au démarrage de chaque worker)"""
+    global _listener
+    if _listener is None or not _listener.is_alive():
+        _listener = WardrobeInvalidationListener(engine, wardrobe_cache, settings.WARDROBE_NOTIFY_CHANNEL)
+        _listener.start()
+
+
+def stop_wardrobe_cache_listener() -> None:
+    if _listener is not None:
+        _listener.stop()
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    # Invalidation locale immédiate ; les autres workers reçoivent le NOTIFY au commit
+    for user_id in session.info.pop("wardrobe_changed", ()):
+        wardrobe_cache.invalidate(user_id)
+    for user_id in session.info.pop("wardrobe_worn", ()):
+        wardrobe_cache.mark_worn(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop("wardrobe_changed", None)
+    session.info.pop("wardrobe_worn", None)
 
 
 class WardrobeService:
@@ -121,7 +496,6 @@ class WardrobeService:
     def save_single_piece(self, user_id: UUID, piece_data: SinglePieceResponse, image_url: Optional[str] = None) -> ClothingItem:
         """Sauvegarde une pièce unique dans la base de données"""
         
-        start_time = time.time()
         piece = piece_data.pieces[0]  # Une pièce unique a toujours exactement 1 pièce
         
         # Utiliser le nom généré par l'IA ou fallback sur piece_type
@@ -148,28 +522,23 @@ class WardrobeService:
         )
         
         self.db.add(db_piece)
-        self.db.flush()  # Pour obtenir l'ID avant le commit
         
-        # Sauvegarder l'historique d'analyse
-        analysis_history = AnalysisHistory(
-            user_id=user_id,
-            capture_type="single_piece",
-            raw_analysis=piece_data.model_dump(mode='json'),  # Utiliser mode='json' pour sérialiser les UUID
-            created_item_id=db_piece.id,
-            analysis_duration_ms=int((time.time() - start_time) * 1000)
+        # Mesures de l'analyse signées par le serveur (jamais celles envoyées en clair par le client)
+        run = verify_analysis_token(
+            piece_data, settings.ANALYSIS_TOKEN_SECRET, timedelta(hours=settings.ANALYSIS_TOKEN_MAX_AGE_HOURS)
         )
-        self.db.add(analysis_history)
-        
+        self._mark_wardrobe_changed(user_id)
         self.db.commit()
         self.db.refresh(db_piece)
         
+        # Historique d'analyse écrit hors de la requête, une fois la pièce validée
+        analysis_log.enqueue(build_analysis_record(user_id, piece_data, created_item_id=db_piece.id, run=run))
+        
         return db_piece
     
     async def save_complete_look(self, user_id: UUID, look_data: CompleteLookResponse, image_url: Optional[str] = None) -> OutfitLook:
         """Sauvegarde une tenue complète dans la base de données"""
         
-        start_time = time.time()
-        
         # Créer le nom du look basé sur le style dominant
         look_name = f"Look {look_data.look_meta.dominant_style[0]}" if look_data.look_meta.dominant_style else "Look"
         
@@ -191,19 +560,10 @@ class WardrobeService:
             image_url=image_url
         )
         
-        self.db.add(db_look)
-        self.db.flush()
-        
-        # Sauvegarder chaque pièce et créer les liens
-        for idx, piece in enumerate(look_data.pieces):
-            # Vérifier si la pièce existe déjà
-            existing_piece = self.db.query(ClothingItem).filter_by(
-                id=piece.piece_id
-            ).first()
-            
-            piece_image_url = None
-            
-            # Découper et sauvegarder l'image de la pièce si elle a des coordonnées
+        # Découpage et envoi des images avant toute écriture : la première écriture verrouille
+        # la version de garde-robe de l'utilisateur jusqu'au commit (change_seq, migration 013)
+        piece_image_urls = {}
+        for piece in look_data.pieces:
             if piece.bounding_box and image_url:
                 print(f"🎯 Découpage de la pièce {piece.piece_type} (ID: {piece.piece_id})")
                 print(f"   - Coordonnées: {piece.bounding_box}")
@@ -213,16 +573,30 @@ class WardrobeService:
                     'width': piece.bounding_box.width,
                     'height': piece.bounding_box.height
                 }
-                piece_image_url = await self.crop_and_save_piece_image(
+                piece_image_urls[piece.piece_id] = await self.crop_and_save_piece_image(
                     image_url, 
                     bounding_box_dict, 
                     piece.piece_id, 
                     user_id
                 )
-                if piece_image_url:
-                    print(f"   ✅ Image de pièce sauvegardée: {piece_image_url}")
+                if piece_image_urls[piece.piece_id]:
+                    print(f"   ✅ Image de pièce sauvegardée: {piece_image_urls[piece.piece_id]}")
                 else:
                     print(f"   ❌ Échec sauvegarde image pour {piece.piece_type}")
+        
+        # Pièces déjà enregistrées (une lecture, avant d'ajouter quoi que ce soit à la session)
+        existing_pieces = {
+            piece.id: piece for piece in self.db.query(ClothingItem).filter(
+                ClothingItem.id.in_([piece.piece_id for piece in look_data.pieces])
+            ).all()
+        }
+        
+        self.db.add(db_look)
+        
+        # Sauvegarder chaque pièce et créer les liens
+        for idx, piece in enumerate(look_data.pieces):
+            existing_piece = existing_pieces.get(piece.piece_id)
+            piece_image_url = piece_image_urls.get(piece.piece_id)
             
             if not existing_piece:
                 # Utiliser le nom généré par l'IA ou fallback sur piece_type
@@ -248,13 +622,13 @@ class WardrobeService:
                     image_url=piece_image_url  # URL de l'image découpée
                 )
                 self.db.add(db_piece)
+                existing_pieces[piece.piece_id] = db_piece
                 item_id = db_piece.id
             else:
                 # Mettre à jour l'image de la pièce existante si une nouvelle a été générée
                 if piece_image_url:
                     existing_piece.image_url = piece_image_url
                     print(f"   📝 Mise à jour image_url pour pièce existante {existing_piece.id}: {piece_image_url}")
-                    self.db.flush()  # S'assurer que la mise à jour est persistée
                 item_id = existing_piece.id
             
             # Préparer les coordonnées de la bounding box si disponibles
@@ -276,41 +650,276 @@ class WardrobeService:
             )
             self.db.add(look_item)
         
-        # Sauvegarder l'historique d'analyse
-        analysis_history = AnalysisHistory(
-            user_id=user_id,
-            capture_type="complete_look",
-            raw_analysis=look_data.model_dump(mode='json'),  # Utiliser mode='json' pour sérialiser les UUID
-            created_look_id=db_look.id,
-            analysis_duration_ms=int((time.time() - start_time) * 1000)
+        # Mesures de l'analyse signées par le serveur (jamais celles envoyées en clair par le client)
+        run = verify_analysis_token(
+            look_data, settings.ANALYSIS_TOKEN_SECRET, timedelta(hours=settings.ANALYSIS_TOKEN_MAX_AGE_HOURS)
         )
-        self.db.add(analysis_history)
-        
+        self._mark_wardrobe_changed(user_id)
         self.db.commit()
         self.db.refresh(db_look)
         
+        # Historique d'analyse écrit hors de la requête, une fois la tenue validée
+        analysis_log.enqueue(build_analysis_record(user_id, look_data, created_look_id=db_look.id, run=run))
+        
         return db_look
     
-    def get_user_pieces(self, user_id: UUID, piece_type: Optional[str] = None) -> List[ClothingItem]:
-        """Récupère les pièces d'un utilisateur"""
+    def update_clothing_item(self, item_id: UUID, changes: dict):
+        """Met à jour les champs fournis d'un vêtement, None s'il n'existe pas"""
+        rows = self.update_clothing_items([item_id], changes)
+        return rows[0] if rows else None
+    
+    def update_clothing_items(self, item_ids: List[UUID], changes: dict, user_id: Optional[UUID] = None) -> list:
+        """Applique les mêmes modifications à plusieurs vêtements en une seule instruction.
+
+        UPDATE ... RETURNING (colonnes modifiées uniquement) et incrément de version
+        + NOTIFY sont chaînés dans des CTE : un seul aller-retour avant le commit.
+        Retourne les lignes mises à jour (colonnes ITEM_COLUMNS + wardrobe_version).
+        """
+        changes = self._validated_item_changes(changes)
         
-        query = self.db.query(ClothingItem).filter_by(
-            user_id=user_id,
-            is_active=True
+        conditions = [ClothingItem.id.in_(item_ids)]
+        if user_id is not None:
+            conditions.append(ClothingItem.user_id == user_id)
+        
+        if not changes:
+            return self.db.query(*ITEM_COLUMNS).filter(*conditions).all()
+        
+        updated = update(ClothingItem).where(*conditions).values(**changes).returning(
+            *ITEM_COLUMNS
+        ).cte("updated")
+        bumped = self._version_bump_statement(
+            select(updated.c.user_id, literal(1)).distinct()
+        ).cte("bumped")
+        
+        rows = self.db.execute(
+            select(updated, bumped.c.version.label("wardrobe_version")).join(
+                bumped, bumped.c.user_id == updated.c.user_id
+            )
+        ).all()
+        
+        for changed_user_id in {row.user_id for row in rows}:
+            self._track_wardrobe_change(changed_user_id)
+        self.db.commit()
+        
+        return rows
+    
+    def _validated_item_changes(self, changes: dict) -> dict:
+        """Vérifie que les champs modifiés sont des colonnes modifiables du modèle"""
+        invalid = set(changes) - UPDATABLE_ITEM_COLUMNS
+        if invalid:
+            raise ValueError(f"Champs non modifiables: {', '.join(sorted(invalid))}")
+        return changes
+    
+    def get_wardrobe_version(self, user_id: UUID) -> int:
+        """Version courante de la garde-robe (0 si l'utilisateur n'a jamais rien enregistré)"""
+        return self.get_wardrobe_versions(user_id)[0]
+    
+    def get_wardrobe_versions(self, user_id: UUID) -> Tuple[int, int]:
+        """(version, wear_version) courantes : la seconde ne bouge qu'avec les compteurs de port"""
+        
+        snapshot = wardrobe_cache.get(user_id)
+        if snapshot is not None:
+            return snapshot.version, snapshot.wear_version
+        
+        return self._read_versions(user_id)
+    
+    def _read_versions(self, user_id: UUID) -> Tuple[int, int]:
+        row = self.db.query(WardrobeVersion.version, WardrobeVersion.wear_version).filter(
+            WardrobeVersion.user_id == user_id
+        ).first()
+        return (row.version, row.wear_version) if row else (0, 0)
+    
+    def bump_wardrobe_version(self, user_id: UUID) -> int:
+        """Incrémente la version de la garde-robe dans la transaction courante"""
+        
+        stmt = self._version_bump_statement(
+            select(literal(user_id, type_=WardrobeVersion.user_id.type), literal(1))
+        )
+        return self.db.execute(stmt).first().version
+    
+    def _version_bump_statement(self, user_ids):
+        """INSERT ... ON CONFLICT qui incrémente la version des utilisateurs sélectionnés.
+
+        Le NOTIFY inter-workers est émis dans le RETURNING (délivré au commit).
+        """
+        stmt = pg_insert(WardrobeVersion).from_select(["user_id", "version"], user_ids)
+        return stmt.on_conflict_do_update(
+            index_elements=[WardrobeVersion.user_id],
+            set_={"version": WardrobeVersion.version + 1, "updated_at": func.now()}
+        ).returning(
+            WardrobeVersion.user_id,
+            WardrobeVersion.version,
+            func.pg_notify(settings.WARDROBE_NOTIFY_CHANNEL, cast(WardrobeVersion.user_id, String)).label("notified")
+        )
+    
+    def _mark_wardrobe_changed(self, user_id: UUID) -> int:
+        """Point d'entrée unique des chemins d'écriture : à appeler avant le commit.
+
+        Incrémente la version, programme le NOTIFY inter-workers (délivré au commit)
+        et l'invalidation du cache local après le commit. Les lignes en attente sont
+        écrites d'abord : leur change_seq (version + 1) doit être publié par ce bump.
+        """
+        self.db.flush()
+        version = self.bump_wardrobe_version(user_id)
+        self._track_wardrobe_change(user_id)
+        return version
+    
+    def _mark_wardrobes_changed(self, user_ids) -> None:
+        """Variante groupée de _mark_wardrobe_changed : une seule instruction pour tous les utilisateurs"""
+        user_ids = list(user_ids)
+        self.db.flush()
+        self.db.execute(self._version_bump_statement(
+            select(func.unnest(bindparam("user_ids", user_ids, type_=ARRAY(WardrobeVersion.user_id.type))), literal(1))
+        ))
+        for user_id in user_ids:
+            self._track_wardrobe_change(user_id)
+    
+    def _track_wardrobe_change(self, user_id: UUID) -> None:
+        """Programme l'invalidation du cache local de l'utilisateur au commit"""
+        self.db.info.setdefault("wardrobe_changed", set()).add(user_id)
+    
+    def _mark_wardrobes_worn(self, user_ids) -> None:
+        """Compteurs de port modifiés (à appeler avant le commit) : seule wear_version est incrémentée.
+
+        La version de garde-robe, et donc les recommandations et les caches qui en
+        dépendent, reste inchangée ; les instantanés en cache ne relisent que leurs compteurs.
+        """
+        user_ids = list(user_ids)
+        stmt = pg_insert(WardrobeVersion).from_select(
+            ["user_id", "version", "wear_version"],
+            select(func.unnest(bindparam("user_ids", user_ids, type_=ARRAY(WardrobeVersion.user_id.type))), literal(0), literal(1))
         )
+        self.db.execute(stmt.on_conflict_do_update(
+            index_elements=[WardrobeVersion.user_id],
+            set_={"wear_version": WardrobeVersion.wear_version + 1}
+        ).returning(
+            func.pg_notify(
+                settings.WARDROBE_NOTIFY_CHANNEL, WEAR_NOTIFY_PREFIX + cast(WardrobeVersion.user_id, String)
+            )
+        ))
+        self.db.info.setdefault("wardrobe_worn", set()).update(user_ids)
+    
+    def get_wardrobe_snapshot(self, user_id: UUID) -> WardrobeSnapshot:
+        """Instantané de la garde-robe, servi depuis le cache quand il est à jour"""
+        
+        snapshot = wardrobe_cache.get(user_id)
+        if snapshot is not None:
+            return snapshot
+        
+        generation = wardrobe_cache.generation(user_id)
+        # Lire les versions AVANT les lignes : un instantané n'est jamais plus ancien que ses versions
+        version, wear_version = self._read_versions(user_id)
+        
+        snapshot = wardrobe_cache.get_version(user_id, version)
+        if snapshot is None:
+            snapshot = WardrobeSnapshot(
+                user_id=user_id,
+                version=version,
+                pieces=tuple(self._load_user_pieces(user_id)),
+                looks=tuple(self._load_user_looks(user_id)),
+                wear_version=wear_version
+            )
+            wardrobe_cache.store_shared(snapshot)
+        elif snapshot.wear_version != wear_version:
+            snapshot = self._with_wear_counters(snapshot, wear_version)
+            wardrobe_cache.store_shared(snapshot)
+        
+        wardrobe_cache.store(snapshot, generation)
+        return snapshot
+    
+    def _with_wear_counters(self, snapshot: WardrobeSnapshot, wear_version: int) -> WardrobeSnapshot:
+        """Instantané dont seuls les compteurs de port sont relus (deux requêtes id, wear_count)"""
         
-        if piece_type:
-            query = query.filter_by(piece_type=piece_type)
+        item_wears = dict(self.db.query(ClothingItem.id, ClothingItem.wear_count).filter(
+            ClothingItem.user_id == snapshot.user_id,
+            ClothingItem.is_active.is_(True)
+        ).all())
+        look_wears = dict(self.db.query(OutfitLook.id, OutfitLook.wear_count).filter(
+            OutfitLook.user_id == snapshot.user_id
+        ).all())
         
-        return query.order_by(ClothingItem.created_at.desc()).all()
+        return snapshot._replace(
+            pieces=tuple(
+                piece._replace(wear_count=item_wears.get(piece.id, piece.wear_count)) for piece in snapshot.pieces
+            ),
+            looks=tuple(
+                look._replace(wear_count=look_wears.get(look.id, look.wear_count)) for look in snapshot.looks
+            ),
+            wear_version=wear_version
+        )
     
-    def get_user_looks(self, user_id: UUID) -> List[OutfitLook]:
+    def get_user_pieces(self, user_id: UUID, piece_type: Optional[str] = None) -> List[PieceRow]:
+        """Récupère les pièces d'un utilisateur"""
+        return self.get_wardrobe_snapshot(user_id).pieces_of_type(piece_type)
+    
+    def get_user_looks(self, user_id: UUID) -> List[LookRow]:
         """Récupère les tenues d'un utilisateur avec les pièces et leurs coordonnées"""
+        return list(self.get_wardrobe_snapshot(user_id).looks)
+    
+    def get_looks_with_piece(self, user_id: UUID, item_id: UUID) -> list:
+        """Tenues contenant une pièce : une requête indexée sur look_items.item_id"""
+        
+        return self.db.query(*PIECE_LOOK_COLUMNS).join(
+            LookItem, LookItem.look_id == OutfitLook.id
+        ).filter(
+            LookItem.item_id == item_id,
+            OutfitLook.user_id == user_id
+        ).order_by(OutfitLook.created_at.desc()).all()
+    
+    def _load_user_pieces(self, user_id: UUID) -> List[PieceRow]:
+        """Charge les pièces actives d'un utilisateur (colonnes projetées + nombre de tenues)"""
         
-        from sqlalchemy.orm import joinedload
+        rows = self.db.query(*PIECE_COLUMNS, LOOK_COUNT_COLUMN).filter(
+            ClothingItem.user_id == user_id,
+            ClothingItem.is_active.is_(True)
+        ).order_by(ClothingItem.created_at.desc()).all()
+        
+        return [PieceRow(*row) for row in rows]
+    
+    def _load_user_looks(self, user_id: UUID, look_ids: Optional[Sequence[UUID]] = None) -> List[LookRow]:
+        """Charge les tenues d'un utilisateur (ou les seules look_ids) avec les pièces et leurs coordonnées.
+
+        Chargement en trois requêtes au lieu d'un joinedload cartésien :
+        1. les tenues de l'utilisateur,
+        2. leurs look_items (tenue, pièce, position, coordonnées),
+        3. les pièces référencées, une seule fois chacune (WHERE id IN ids distincts),
+           avec les seules colonnes utiles à la réponse.
+        Les pièces partagées entre plusieurs tenues ne sont ni retransférées ni dupliquées.
+        """
+        
+        query = self.db.query(*LOOK_COLUMNS).filter(OutfitLook.user_id == user_id)
+        if look_ids is not None:
+            query = query.filter(OutfitLook.id.in_(look_ids))
+        looks = query.order_by(OutfitLook.created_at.desc()).all()
+        
+        if not looks:
+            return []
+        
+        look_ids = [look.id for look in looks]
+        links = self.db.query(
+            LookItem.look_id,
+            LookItem.item_id,
+            LookItem.position,
+            LookItem.bounding_box
+        ).filter(
+            LookItem.look_id.in_(look_ids)
+        ).order_by(LookItem.look_id, LookItem.position).all()
+        
+        item_ids = list({link.item_id for link in links})
+        pieces_by_id = {
+            row.id: LookPiece(*row[1:])
+            for row in self.db.query(ClothingItem.id, *LOOK_PIECE_COLUMNS).filter(ClothingItem.id.in_(item_ids))
+        } if item_ids else {}
+        
+        # Pièce absente (lien orphelin) : mêmes valeurs vides que l'ancienne jointure externe
+        missing = LookPiece(None, None, None, None)
+        items_by_look = {look_id: [] for look_id in look_ids}
+        for link in links:
+            items_by_look[link.look_id].append(
+                LookItemRow(link.item_id, link.position, link.bounding_box, pieces_by_id.get(link.item_id, missing))
+            )
         
-        return self.db.query(OutfitLook).filter_by(
-            user_id=user_id
-        ).options(
-            joinedload(OutfitLook.items).joinedload(LookItem.item)  # Charge les look_items avec leurs items et coordonnées
-        ).order_by(OutfitLook.created_at.desc()).all()
\ No newline at end of file
+        return [
+            LookRow(*look, items=tuple(items_by_look[look.id]))
+            for look in looks
+        ]
@@ -0,0 +1,115 @@
+"""
+Statistiques de garde-robe matérialisées
+
+Une ligne par utilisateur dans wardrobe_stats (totaux, répartition par type,
+couleur principale, saison et fréquence de port). Elle est tenue à jour par
+deltas, dans la transaction de chaque écriture, par les triggers de la
+migration 012 : seules les lignes insérées, modifiées ou supprimées sont
+lues, quel que soit le chemin d'écriture. La lecture est une recherche par
+clé primaire, sans écriture. Le recalcul complet ne sert qu'au rattrapage
+(scripts/check_wardrobe_status.py --refresh).
+"""
+from typing import Iterable, List
+from uuid import UUID
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+from sqlalchemy.orm import Session
+
+from database.models import WardrobeStats
+
+
+def primary_colors_sql(alias: str) -> str:
+    """Tableau JSONB des couleurs principales d'une ligne de clothing_items (colors est du JSON libre)"""
+    return (
+        f"CASE WHEN jsonb_typeof({alias}.colors::jsonb -> 'primary') = 'array' "
+        f"THEN {alias}.colors::jsonb -> 'primary' ELSE '[]'::jsonb END"
+    )
+
+
+def count_object_sql(select_sql: str) -> str:
+    """Agrège `SELECT clé, count(*) ... GROUP BY clé` en objet JSONB {clé: nombre}"""
+    return f"(SELECT COALESCE(jsonb_object_agg(k, n), '{{}}'::jsonb) FROM ({select_sql}) AS counts(k, n))"
+
+
+REFRESH_STATS_SQL = text(f"""
+WITH users AS (
+    SELECT DISTINCT unnest(:user_ids) AS user_id
+),
+items AS (
+    SELECT i.* FROM clothing_items i JOIN users u ON u.user_id = i.user_id
+    WHERE i.is_active
+)
+INSERT INTO wardrobe_stats (
+    user_id, version, total_items, favorite_items, total_looks, total_wears,
+    by_type, by_color, by_season, by_wear, updated_at
+)
+SELECT
+    u.user_id,
+    COALESCE((SELECT v.version FROM wardrobe_versions v WHERE v.user_id = u.user_id), 0),
+    (SELECT count(*) FROM items i WHERE i.user_id = u.user_id),
+    (SELECT count(*) FROM items i WHERE i.user_id = u.user_id AND i.is_favorite),
+    (SELECT count(*) FROM outfit_looks l WHERE l.user_id = u.user_id),
+    (SELECT COALESCE(sum(i.wear_count), 0) FROM items i WHERE i.user_id = u.user_id),
+    {count_object_sql(
+        "SELECT i.piece_type, count(*) FROM items i WHERE i.user_id = u.user_id GROUP BY 1"
+    )},
+    {count_object_sql(
+        f"SELECT c.color, count(*) FROM items i, jsonb_array_elements_text({primary_colors_sql('i')}) AS c(color) "
+        "WHERE i.user_id = u.user_id GROUP BY 1"
+    )},
+    {count_object_sql(
+        "SELECT s.season, count(*) FROM items i, unnest(i.seasonality) AS s(season) "
+        "WHERE i.user_id = u.user_id GROUP BY 1"
+    )},
+    {count_object_sql(
+        "SELECT wardrobe_wear_bucket(i.wear_count), count(*) FROM items i WHERE i.user_id = u.user_id GROUP BY 1"
+    )},
+    now()
+FROM users u
+ON CONFLICT (user_id) DO UPDATE SET
+    version = EXCLUDED.version,
+    total_items = EXCLUDED.total_items,
+    favorite_items = EXCLUDED.favorite_items,
+    total_looks = EXCLUDED.total_looks,
+    total_wears = EXCLUDED.total_wears,
+    by_type = EXCLUDED.by_type,
+    by_color = EXCLUDED.by_color,
+    by_season = EXCLUDED.by_season,
+    by_wear = EXCLUDED.by_wear,
+    updated_at = EXCLUDED.updated_at
+""").bindparams(bindparam("user_ids", type_=ARRAY(PG_UUID(as_uuid=True))))
+
+
+class WardrobeStatsService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def refresh(self, user_ids: Iterable[UUID]) -> None:
+        """Recalcule entièrement les statistiques des utilisateurs donnés dans la transaction courante"""
+        user_ids = list(user_ids)
+        if user_ids:
+            self.db.execute(REFRESH_STATS_SQL, {"user_ids": user_ids})
+
+    def refresh_all(self) -> int:
+        """Recalcule les statistiques de tous les utilisateurs (rattrapage après migration)"""
+        user_ids = self.db.execute(text(
+            "SELECT user_id FROM clothing_items UNION SELECT user_id FROM outfit_looks"
+        )).scalars().all()
+        self.refresh(user_ids)
+        return len(user_ids)
+
+    def get(self, user_id: UUID) -> WardrobeStats:
+        """Statistiques d'un utilisateur (lecture seule) ; vides s'il n'a encore rien écrit"""
+        stats = self.db.get(WardrobeStats, user_id)
+        if stats is None:
+            # Objet non ajouté à la session : rien n'est écrit
+            stats = WardrobeStats(
+                user_id=user_id, version=0, total_items=0, favorite_items=0, total_looks=0, total_wears=0,
+                by_type={}, by_color={}, by_season={}, by_wear={}, updated_at=None,
+            )
+        return stats
+
+    def list_all(self) -> List[WardrobeStats]:
+        return self.db.query(WardrobeStats).order_by(WardrobeStats.total_items.desc()).all()
+
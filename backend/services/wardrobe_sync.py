@@ -0,0 +1,128 @@
+"""
+Synchronisation incrémentale de la garde-robe (client mobile)
+
+Le client garde une copie locale (pièces et tenues) et ne télécharge que ce qui
+a changé depuis son dernier curseur, page par page. Chaque ligne porte
+change_seq, la version de garde-robe qui a publié sa dernière modification
+(triggers de la migration 013) : la ligne wardrobe_versions de l'utilisateur
+est verrouillée de la première écriture jusqu'au commit, donc toute ligne dont
+change_seq est inférieur ou égal à la version visible est déjà validée, et
+toute écriture encore en vol recevra un change_seq plus grand. Le journal est
+lu jusqu'à cette version seulement ; aucune fenêtre de sécurité n'est
+nécessaire. Les pièces désactivées (is_active = False) et les suppressions
+physiques (wardrobe_tombstones) sont renvoyées comme suppressions. Les
+compteurs de port ne passent pas par le journal (migration 015) : quand
+wear_version augmente, le client relit les listes de pièces et de tenues.
+"""
+import base64
+from typing import Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import false, literal, select, true, tuple_, union_all
+from sqlalchemy.orm import Session
+
+from database.models import ClothingItem, OutfitLook, WardrobeTombstone, WardrobeVersion
+from services.wardrobe_service import ITEM_COLUMNS, WardrobeService
+
+
+def encode_cursor(*position) -> str:
+    raw = "|".join(str(part) for part in position).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple:
+    """Décode un curseur : (change_seq,) une fois à jour, (change_seq, source, id) en cours de pagination.
+
+    ValueError s'il est invalide (anciens curseurs par date compris : le client retélécharge tout).
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        parts = raw.split("|")
+        if len(parts) == 1:
+            return (int(parts[0]),)
+        change_seq, source, entity_id = parts
+        if source not in ("item", "look", "tombstone"):
+            raise ValueError(f"source inconnue: {source}")
+        return int(change_seq), source, UUID(entity_id)
+    except Exception as e:
+        raise ValueError(f"Curseur de synchronisation invalide: {cursor}") from e
+
+
+class WardrobeSyncService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _change_stream(self, user_id: UUID):
+        """Journal de l'utilisateur : (change_seq, source, id, kind, deleted) pour pièces, tenues et suppressions"""
+        return union_all(
+            select(
+                ClothingItem.change_seq, literal("item").label("source"), ClothingItem.id,
+                literal("item").label("kind"), (ClothingItem.is_active.is_not(True)).label("deleted")
+            ).where(ClothingItem.user_id == user_id),
+            select(
+                OutfitLook.change_seq, literal("look"), OutfitLook.id, literal("look"), false()
+            ).where(OutfitLook.user_id == user_id),
+            select(
+                WardrobeTombstone.change_seq, literal("tombstone"), WardrobeTombstone.entity_id,
+                WardrobeTombstone.kind, true()
+            ).where(WardrobeTombstone.user_id == user_id),
+        ).subquery("changes")
+
+    def get_changes(self, user_id: UUID, since: Optional[str] = None, limit: int = 500) -> dict:
+        """Pièces et tenues modifiées ou supprimées depuis le curseur (tout l'existant sans curseur).
+
+        Retourne {"version": int, "wear_version": int, "upserts": lignes ITEM_COLUMNS, "looks": LookRow,
+        "deleted": ids de pièces, "deleted_looks": ids de tenues, "cursor": str, "has_more": bool}.
+        """
+        after = decode_cursor(since) if since else None
+        versions = self.db.execute(
+            select(WardrobeVersion.version, WardrobeVersion.wear_version).where(WardrobeVersion.user_id == user_id)
+        ).first()
+        version, wear_version = versions if versions else (0, 0)
+
+        stream = self._change_stream(user_id)
+        position = (stream.c.change_seq, stream.c.source, stream.c.id)
+        query = select(stream).where(stream.c.change_seq <= version)
+        if after is None:
+            # Premier téléchargement : inutile d'envoyer des suppressions
+            query = query.where(stream.c.deleted.is_(False))
+        elif len(after) == 1:
+            query = query.where(stream.c.change_seq > after[0])
+        else:
+            query = query.where(tuple_(*position) > tuple_(*after))
+
+        changes = self.db.execute(query.order_by(*position).limit(limit + 1)).all()
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        if has_more:
+            last = changes[-1]
+            cursor = encode_cursor(last.change_seq, last.source, last.id)
+        else:
+            cursor = encode_cursor(max(version, after[0] if after else 0))
+
+        deleted = {"item": [], "look": []}
+        live = {"item": [], "look": []}
+        for change in changes:
+            (deleted if change.deleted else live)[change.kind].append(change.id)
+
+        # Contenu courant des lignes (éventuellement plus récent que la version : renvoyé à nouveau plus tard)
+        upserts = []
+        if live["item"]:
+            rows = self.db.execute(
+                select(*ITEM_COLUMNS, ClothingItem.is_active).where(ClothingItem.id.in_(live["item"]))
+            ).all()
+            upserts = [row for row in rows if row.is_active]
+            deleted["item"].extend(row.id for row in rows if not row.is_active)
+        looks = WardrobeService(self.db)._load_user_looks(user_id, live["look"]) if live["look"] else []
+
+        return {
+            "version": version,
+            "wear_version": wear_version,
+            "upserts": upserts,
+            "looks": looks,
+            "deleted": deleted["item"],
+            "deleted_looks": deleted["look"],
+            "cursor": cursor,
+            "has_more": has_more,
+        }
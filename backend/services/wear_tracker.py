@@ -0,0 +1,204 @@
+"""
+Suivi des ports en écriture différée (write-behind)
+
+Les "porté aujourd'hui" sont accumulés en mémoire et fusionnés par pièce ou
+tenue (compteur additionné, date la plus récente conservée), puis écrits par
+un thread de fond en deux UPDATE groupés : un pour les pièces (y compris
+celles des tenues portées, via look_items) et un pour les tenues. Le vidage a
+lieu à intervalle régulier, dès que le tampon dépasse sa taille maximale, et
+à l'arrêt du worker. Il n'incrémente que wear_version (migration 015) : les
+recommandations et les caches indexés par version de garde-robe restent valides.
+"""
+import threading
+from datetime import date
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+from sqlalchemy.types import Date, Integer
+
+
+class WearKey(NamedTuple):
+    kind: str  # "item" ou "look"
+    user_id: UUID
+    entity_id: UUID
+
+
+class WearEntry(NamedTuple):
+    count: int
+    last_worn: date
+
+
+def _unnest_params(*names: str) -> list:
+    types = {"user_ids": PG_UUID(as_uuid=True), "ids": PG_UUID(as_uuid=True), "counts": Integer(), "dates": Date()}
+    return [
+        bindparam(f"{prefix}_{name}", type_=ARRAY(types[name]))
+        for prefix in names
+        for name in ("ids", "user_ids", "counts", "dates")
+    ]
+
+
+# Pièces portées directement + pièces des tenues portées, agrégées par pièce
+UPDATE_ITEMS_SQL = text("""
+WITH worn AS (
+    SELECT w.id AS item_id, w.user_id, w.n, w.d
+    FROM unnest(:item_ids, :item_user_ids, :item_counts, :item_dates) AS w(id, user_id, n, d)
+    UNION ALL
+    SELECT li.item_id, l.user_id, l.n, l.d
+    FROM unnest(:look_ids, :look_user_ids, :look_counts, :look_dates) AS l(id, user_id, n, d)
+    JOIN look_items li ON li.look_id = l.id
+),
+per_item AS (
+    SELECT item_id, user_id, sum(n) AS n, max(d) AS d FROM worn GROUP BY item_id, user_id
+)
+UPDATE clothing_items ci
+SET wear_count = COALESCE(ci.wear_count, 0) + p.n,
+    last_worn = GREATEST(ci.last_worn, p.d),
+    updated_at = now()
+FROM per_item p
+WHERE ci.id = p.item_id AND ci.user_id = p.user_id
+RETURNING ci.user_id
+""").bindparams(*_unnest_params("item", "look"))
+
+UPDATE_LOOKS_SQL = text("""
+UPDATE outfit_looks ol
+SET wear_count = COALESCE(ol.wear_count, 0) + l.n,
+    last_worn = GREATEST(ol.last_worn, l.d),
+    updated_at = now()
+FROM unnest(:look_ids, :look_user_ids, :look_counts, :look_dates) AS l(id, user_id, n, d)
+WHERE ol.id = l.id AND ol.user_id = l.user_id
+RETURNING ol.user_id
+""").bindparams(*_unnest_params("look"))
+
+
+class WearBuffer:
+    """Tampon thread-safe des ports en attente, fusionnés par (type, utilisateur, id)"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: Dict[WearKey, WearEntry] = {}
+        self._lock = threading.Lock()
+        self.full = threading.Event()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def record_item(self, user_id: UUID, item_id: UUID, worn_on: date, count: int = 1) -> None:
+        self._record(WearKey("item", user_id, item_id), worn_on, count)
+
+    def record_look(self, user_id: UUID, look_id: UUID, worn_on: date, count: int = 1) -> None:
+        self._record(WearKey("look", user_id, look_id), worn_on, count)
+
+    def _record(self, key: WearKey, worn_on: date, count: int) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = WearEntry(count, worn_on)
+            else:
+                self._entries[key] = WearEntry(entry.count + count, max(entry.last_worn, worn_on))
+            if len(self._entries) >= self.max_entries:
+                self.full.set()
+
+    def drain(self) -> Dict[WearKey, WearEntry]:
+        """Retire et retourne toutes les entrées en attente"""
+        with self._lock:
+            entries, self._entries = self._entries, {}
+            self.full.clear()
+        return entries
+
+    def restore(self, entries: Dict[WearKey, WearEntry]) -> None:
+        """Remet des entrées non écrites dans le tampon (après un échec de vidage)"""
+        for key, entry in entries.items():
+            self._record(key, entry.last_worn, entry.count)
+
+
+def _columns(entries: List[Tuple[WearKey, WearEntry]], prefix: str) -> dict:
+    return {
+        f"{prefix}_ids": [key.entity_id for key, _ in entries],
+        f"{prefix}_user_ids": [key.user_id for key, _ in entries],
+        f"{prefix}_counts": [entry.count for _, entry in entries],
+        f"{prefix}_dates": [entry.last_worn for _, entry in entries],
+    }
+
+
+def flush_wear_buffer(buffer: WearBuffer, session_factory) -> int:
+    """Écrit les ports en attente en une transaction. Retourne le nombre d'entrées écrites."""
+    from services.wardrobe_service import WardrobeService
+
+    entries = buffer.drain()
+    if not entries:
+        return 0
+
+    items = [(key, entry) for key, entry in entries.items() if key.kind == "item"]
+    looks = [(key, entry) for key, entry in entries.items() if key.kind == "look"]
+    params = {**_columns(items, "item"), **_columns(looks, "look")}
+
+    db = session_factory()
+    try:
+        user_ids = set(db.execute(UPDATE_ITEMS_SQL, params).scalars())
+        if looks:
+            user_ids.update(db.execute(UPDATE_LOOKS_SQL, _columns(looks, "look")).scalars())
+
+        if user_ids:
+            # Seuls les compteurs de port changent : wear_version, sans toucher à la version de garde-robe
+            WardrobeService(db)._mark_wardrobes_worn(user_ids)
+        db.commit()
+    except Exception:
+        db.rollback()
+        buffer.restore(entries)
+        raise
+    finally:
+        db.close()
+    return len(entries)
+
+
+class WearFlusher(threading.Thread):
+    """Vide le tampon à intervalle régulier, plus tôt s'il est plein, et une dernière fois à l'arrêt"""
+
+    def __init__(self, buffer: WearBuffer, session_factory, interval: float):
+        super().__init__(name="wear-flusher", daemon=True)
+        self.buffer = buffer
+        self.session_factory = session_factory
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def stop(self, timeout: Optional[float] = 10.0) -> None:
+        self._stopped.set()
+        self.buffer.full.set()  # Réveiller le thread immédiatement
+        self.join(timeout)
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            self.buffer.full.wait(self.interval)
+            self._flush()
+        self._flush()
+
+    def _flush(self) -> None:
+        try:
+            flush_wear_buffer(self.buffer, self.session_factory)
+        except Exception as e:
+            print(f"⚠️ Échec de l'écriture des ports ({len(self.buffer)} en attente): {type(e).__name__}: {e}")
+            # Ne pas boucler si le tampon restauré est encore plein
+            self._stopped.wait(self.interval)
+
+
+wear_buffer = WearBuffer()
+_flusher: Optional[WearFlusher] = None
+
+
+def start_wear_flusher(session_factory) -> None:
+    """Démarre le vidage périodique du tampon (à appeler au démarrage de chaque worker)"""
+    from core.config import settings
+
+    global _flusher
+    if _flusher is None or not _flusher.is_alive():
+        wear_buffer.max_entries = settings.WEAR_BUFFER_MAX_ENTRIES
+        _flusher = WearFlusher(wear_buffer, session_factory, settings.WEAR_FLUSH_INTERVAL)
+        _flusher.start()
+
+
+def stop_wear_flusher() -> None:
+    """Arrête le thread après un dernier vidage (à appeler à l'arrêt du worker)"""
+    if _flusher is not None:
+        _flusher.stop()
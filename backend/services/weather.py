@@ -0,0 +1,407 @@
+"""
+Météo des recommandations : fournisseurs et caches
+
+Les villes sont résolues hors ligne par le répertoire embarqué
+(services/gazetteer.py), qui fournit aussi le fuseau horaire et permet de
+partir des coordonnées GPS de l'appareil. Une ville absente du répertoire est
+géocodée par le fournisseur ; le résultat est mis en cache en mémoire et dans
+la table geocoded_cities (partagée entre workers, conservée aux redémarrages). Les prévisions sont mises en cache par
+position (coordonnées arrondies à ~1 km) pendant WEATHER_FORECAST_TTL, calé
+sur la fréquence de mise à jour du fournisseur. Passé ce délai, la prévision
+en cache reste servie jusqu'à WEATHER_STALE_TTL pendant qu'un rafraîchissement
+unique est lancé en arrière-plan (stale-while-revalidate) : une requête
+n'attend le fournisseur que si aucune prévision n'est connue pour la position.
+
+Les appels HTTP partagent un client httpx (pool de connexions) aux délais
+stricts. FakeWeatherProvider répond localement (tests, développement).
+"""
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import httpx
+from sqlalchemy import text
+
+from services.gazetteer import Gazetteer, normalize_name, sun_times
+
+# Résultat négatif (ville inconnue) gardé en mémoire seulement, moins longtemps
+NOT_FOUND = object()
+NOT_FOUND_TTL = 3600
+
+
+class Location(NamedTuple):
+    name: str
+    country: str
+    latitude: float
+    longitude: float
+    timezone: Optional[str] = None
+
+    @property
+    def key(self) -> Tuple[float, float]:
+        """Clé de cache des prévisions : ~1 km de précision"""
+        return round(self.latitude, 2), round(self.longitude, 2)
+
+
+class WeatherProviderError(Exception):
+    """Le fournisseur météo n'a pas pu répondre"""
+
+
+def geocode_key(city: str, country_code: Optional[str]) -> str:
+    """Clé normalisée d'une recherche de ville (casse, accents et ponctuation ignorés)"""
+    return f"{normalize_name(city)}|{(country_code or '').strip().lower()}"
+
+
+class WeatherProvider:
+    """Interface d'un fournisseur météo"""
+
+    name = "base"
+
+    async def geocode(self, city: str, country_code: Optional[str]) -> Optional[Location]:
+        raise NotImplementedError
+
+    async def forecast(self, location: Location) -> Dict[str, Any]:
+        """Prévision au format {"current": {...}, "daily": {...}} (voir OpenMeteoProvider)"""
+        raise NotImplementedError
+
+
+_http_client: Optional[httpx.AsyncClient] = None
+_http_client_loop = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Client HTTP partagé (pool de connexions), recréé si la boucle d'événements change"""
+    global _http_client, _http_client_loop
+    from core.config import settings
+
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _http_client.is_closed or _http_client_loop is not loop:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.WEATHER_HTTP_TIMEOUT, connect=settings.WEATHER_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=settings.WEATHER_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.WEATHER_MAX_CONNECTIONS,
+            ),
+        )
+        _http_client_loop = loop
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed and _http_client_loop is asyncio.get_running_loop():
+        await _http_client.aclose()
+    _http_client = None
+
+
+class OpenMeteoProvider(WeatherProvider):
+    """Open-Meteo : géocodage et prévisions (sans clé d'API)"""
+
+    name = "open-meteo"
+    GEOCODING_URL = "https://geocoding-api.open-meteo.com/v1/search"
+    FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+
+    def __init__(self, client_factory: Callable[[], httpx.AsyncClient] = get_http_client):
+        self.client_factory = client_factory
+
+    async def _get(self, url: str, params: dict) -> dict:
+        try:
+            response = await self.client_factory().get(url, params=params)
+            response.raise_for_status()
+            return response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            raise WeatherProviderError(f"{self.name}: {type(e).__name__}: {e}") from e
+
+    async def geocode(self, city: str, country_code: Optional[str]) -> Optional[Location]:
+        data = await self._get(self.GEOCODING_URL, {"name": city, "count": 10, "language": "fr"})
+        results = data.get("results") or []
+        if country_code:
+            # Homonymes : la ville du pays demandé en priorité
+            results = sorted(results, key=lambda r: (r.get("country_code") or "").upper() != country_code.upper())
+        if not results:
+            return None
+        result = results[0]
+        return Location(result["name"], result.get("country") or "", result["latitude"], result["longitude"],
+                        result.get("timezone"))
+
+    async def forecast(self, location: Location) -> Dict[str, Any]:
+        data = await self._get(self.FORECAST_URL, {
+            "latitude": location.latitude,
+            "longitude": location.longitude,
+            "current": "temperature_2m,relative_humidity_2m,precipitation,weather_code,wind_speed_10m",
+            "daily": "temperature_2m_max,temperature_2m_min,precipitation_sum,weather_code",
+            "timezone": location.timezone or "auto",
+            "forecast_days": 1,
+        })
+        try:
+            current, daily = data["current"], data["daily"]
+            return {
+                "current": {
+                    "temperature": current["temperature_2m"],
+                    "humidity": current["relative_humidity_2m"],
+                    "precipitation": current["precipitation"],
+                    "wind_speed": current["wind_speed_10m"],
+                    "weather_code": current["weather_code"],
+                },
+                "daily": {
+                    "max_temp": daily["temperature_2m_max"][0],
+                    "min_temp": daily["temperature_2m_min"][0],
+                    "precipitation": daily["precipitation_sum"][0],
+                    "weather_code": daily["weather_code"][0],
+                },
+            }
+        except (KeyError, IndexError, TypeError) as e:
+            raise WeatherProviderError(f"{self.name}: réponse inattendue ({e})") from e
+
+
+class FakeWeatherProvider(WeatherProvider):
+    """Fournisseur local : villes et conditions fixées, appels comptés, pannes simulables"""
+
+    name = "fake"
+
+    def __init__(self, locations: Optional[Dict[str, Location]] = None, temperature: float = 20,
+                 precipitation: float = 0, weather_code: int = 1, delay: float = 0):
+        default = {"paris": Location("Paris", "France", 48.8566, 2.3522, "Europe/Paris")}
+        self.locations = {normalize_name(name): loc for name, loc in (locations or default).items()}
+        self.temperature = temperature
+        self.precipitation = precipitation
+        self.weather_code = weather_code
+        self.delay = delay
+        self.failing = False
+        self.geocode_calls = 0
+        self.forecast_calls = 0
+        self.running = 0
+        self.max_running = 0  # Appels simultanés observés
+
+    async def geocode(self, city: str, country_code: Optional[str]) -> Optional[Location]:
+        self.geocode_calls += 1
+        if self.failing:
+            raise WeatherProviderError("fake: panne simulée")
+        return self.locations.get(normalize_name(city))
+
+    async def forecast(self, location: Location) -> Dict[str, Any]:
+        self.forecast_calls += 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        if self.failing:
+            raise WeatherProviderError("fake: panne simulée")
+        return {
+            "current": {"temperature": self.temperature, "humidity": 60, "precipitation": self.precipitation,
+                        "wind_speed": 10, "weather_code": self.weather_code},
+            "daily": {"max_temp": self.temperature + 3, "min_temp": self.temperature - 6,
+                      "precipitation": self.precipitation, "weather_code": self.weather_code},
+        }
+
+
+LOAD_GEOCODE_SQL = text("""
+SELECT name, country, latitude, longitude, timezone FROM geocoded_cities WHERE query = :query
+""")
+
+SAVE_GEOCODE_SQL = text("""
+INSERT INTO geocoded_cities (query, name, country, latitude, longitude, timezone)
+VALUES (:query, :name, :country, :latitude, :longitude, :timezone)
+ON CONFLICT (query) DO UPDATE
+SET name = EXCLUDED.name, country = EXCLUDED.country, latitude = EXCLUDED.latitude,
+    longitude = EXCLUDED.longitude, timezone = EXCLUDED.timezone, updated_at = now()
+""")
+
+
+class GeocodeCache:
+    """Ville -> coordonnées : cache mémoire devant la table geocoded_cities (optionnelle)"""
+
+    def __init__(self, session_factory=None, maxsize: int = 4096):
+        self.session_factory = session_factory
+        self.maxsize = maxsize
+        self._memory: Dict[str, Tuple[Any, Optional[float]]] = {}  # requête -> (résultat, expiration)
+
+    def get(self, query: str) -> Any:
+        """Location, NOT_FOUND (ville inconnue) ou None (pas en cache)"""
+        cached, expires_at = self._memory.get(query, (None, None))
+        if expires_at is not None and expires_at <= time.monotonic():
+            cached = None
+        if cached is not None or self.session_factory is None:
+            return cached
+        row = self._run(lambda db: db.execute(LOAD_GEOCODE_SQL, {"query": query}).first())
+        if row is None:
+            return None
+        location = Location(row.name, row.country, row.latitude, row.longitude, row.timezone)
+        self._remember(query, location)
+        return location
+
+    def set(self, query: str, location: Optional[Location]) -> None:
+        if location is None:
+            self._remember(query, NOT_FOUND, time.monotonic() + NOT_FOUND_TTL)
+            return
+        self._remember(query, location)
+        if self.session_factory is not None:
+            self._run(lambda db: db.execute(SAVE_GEOCODE_SQL, {"query": query, **location._asdict()}), commit=True)
+
+    def _run(self, operation, commit: bool = False):
+        db = self.session_factory()
+        try:
+            result = operation(db)
+            if commit:
+                db.commit()
+            return result
+        except Exception as e:
+            # Le cache persistant est une optimisation : une erreur ne bloque pas la météo
+            db.rollback()
+            print(f"⚠️ Cache de géocodage indisponible: {type(e).__name__}: {e}")
+            return None
+        finally:
+            db.close()
+
+    def _remember(self, query: str, value: Any, expires_at: Optional[float] = None) -> None:
+        self._memory.pop(query, None)
+        self._memory[query] = (value, expires_at)
+        if len(self._memory) > self.maxsize:
+            del self._memory[next(iter(self._memory))]
+
+
+class CachedForecast(NamedTuple):
+    data: Dict[str, Any]
+    fetched_at: float  # time.monotonic()
+
+
+class WeatherService:
+    """Météo d'une ville via un fournisseur, avec caches de géocodage et de prévisions"""
+
+    def __init__(self, provider: WeatherProvider, geocode_cache: Optional[GeocodeCache] = None,
+                 gazetteer: Optional[Gazetteer] = None, ttl: float = 900, stale_ttl: float = 21600,
+                 maxsize: int = 2048, nearest_city_km: float = 50):
+        self.provider = provider
+        self.geocode_cache = geocode_cache or GeocodeCache()
+        self.gazetteer = gazetteer
+        self.nearest_city_km = nearest_city_km
+        self.ttl = ttl
+        self.stale_ttl = max(ttl, stale_ttl)
+        self.maxsize = maxsize
+        self._forecasts: Dict[Tuple[float, float], CachedForecast] = {}
+        self._inflight: Dict[Tuple[float, float], asyncio.Task] = {}
+        # Positions demandées récemment (préchargement) : clé -> (position, dernière demande)
+        self._active: Dict[Tuple[float, float], Tuple[Location, float]] = {}
+
+    async def resolve(self, city: str, country_code: Optional[str] = None) -> Optional[Location]:
+        """Coordonnées d'une ville (None si inconnue) ; lève WeatherProviderError si le géocodage échoue"""
+        if self.gazetteer is not None:
+            city_entry = self.gazetteer.lookup(city, country_code)
+            if city_entry is not None:
+                return Location(city_entry.name, city_entry.country, city_entry.latitude,
+                                city_entry.longitude, city_entry.timezone)
+        query = geocode_key(city, country_code)
+        cached = await asyncio.to_thread(self.geocode_cache.get, query)
+        if cached is not None:
+            return None if cached is NOT_FOUND else cached
+        location = await self.provider.geocode(city, country_code)
+        await asyncio.to_thread(self.geocode_cache.set, query, location)
+        return location
+
+    async def get_forecast(self, location: Location) -> Dict[str, Any]:
+        """Prévision en cache si fraîche ; périmée : servie et rafraîchie en arrière-plan"""
+        entry = self._forecasts.get(location.key)
+        age = time.monotonic() - entry.fetched_at if entry is not None else None
+        if entry is None or age >= self.stale_ttl:
+            # Rien en cache (ou trop ancien pour être servi) : la requête attend le fournisseur
+            return await self._refresh(location)
+        if age >= self.ttl:
+            self._refresh_in_background(location)
+        return entry.data
+
+    def _refresh(self, location: Location) -> "asyncio.Future":
+        """Un seul appel au fournisseur par position, partagé par les requêtes concurrentes"""
+        task = self._inflight.get(location.key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(self._fetch(location))
+            self._inflight[location.key] = task
+            task.add_done_callback(lambda done, key=location.key: self._inflight.pop(key, None)
+                                   if self._inflight.get(key) is done else None)
+        return asyncio.shield(task)
+
+    async def _fetch(self, location: Location) -> Dict[str, Any]:
+        data = await self.provider.forecast(location)
+        self._forecasts.pop(location.key, None)
+        self._forecasts[location.key] = CachedForecast(data, time.monotonic())
+        if len(self._forecasts) > self.maxsize:
+            del self._forecasts[next(iter(self._forecasts))]
+        return data
+
+    async def refresh(self, location: Location) -> Dict[str, Any]:
+        """Rafraîchit la prévision d'une position (partagé avec un rafraîchissement en cours)"""
+        return await self._refresh(location)
+
+    def forecast_age(self, location: Location) -> Optional[float]:
+        """Âge en secondes de la prévision en cache, None si absente"""
+        entry = self._forecasts.get(location.key)
+        return time.monotonic() - entry.fetched_at if entry is not None else None
+
+    def track(self, location: Location) -> None:
+        """Note une demande pour cette position"""
+        self._active.pop(location.key, None)
+        self._active[location.key] = (location, time.monotonic())
+        if len(self._active) > self.maxsize:
+            del self._active[next(iter(self._active))]
+
+    def active_locations(self, window: float) -> List[Location]:
+        """Positions demandées depuis moins de window secondes (les plus récentes d'abord)"""
+        limit = time.monotonic() - window
+        for key in [key for key, (_, seen) in self._active.items() if seen < limit]:
+            del self._active[key]
+        return [location for location, _ in reversed(list(self._active.values()))]
+
+    def _refresh_in_background(self, location: Location) -> None:
+        async def refresh():
+            try:
+                await self._refresh(location)
+            except Exception as e:
+                print(f"⚠️ Rafraîchissement météo échoué pour {location.name}, prévision en cache conservée: {e}")
+        if location.key not in self._inflight:
+            asyncio.ensure_future(refresh())
+
+    def locate(self, latitude: float, longitude: float) -> Location:
+        """Position de l'appareil : nommée d'après la ville la plus proche du répertoire"""
+        city = self.gazetteer.nearest(latitude, longitude, self.nearest_city_km) if self.gazetteer else None
+        if city is None:
+            return Location("Position actuelle", "", latitude, longitude, None)
+        return Location(city.name, city.country, latitude, longitude, city.timezone)
+
+    def timezone(self, location: Location) -> str:
+        if location.timezone:
+            return location.timezone
+        # Position isolée : fuseau de la ville connue la plus proche, à défaut UTC
+        city = self.gazetteer.nearest(location.latitude, location.longitude, 1500) if self.gazetteer else None
+        return city.timezone if city else "UTC"
+
+    async def get_weather_data(self, city: str, country_code: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Météo d'une ville au format des recommandations, None si la ville est inconnue ou la météo indisponible"""
+        try:
+            location = await self.resolve(city, country_code)
+        except Exception as e:
+            print(f"Erreur lors de la récupération de la météo: {type(e).__name__}: {e}")
+            return None
+        return await self.get_location_weather(location) if location is not None else None
+
+    async def get_location_weather(self, location: Location) -> Optional[Dict[str, Any]]:
+        """Météo d'une position résolue, avec lever/coucher du soleil calculés localement"""
+        self.track(location)
+        try:
+            forecast = await self.get_forecast(location)
+        except Exception as e:
+            print(f"Erreur lors de la récupération de la météo: {type(e).__name__}: {e}")
+            return None
+
+        tz = self.timezone(location)
+        sunrise, sunset = sun_times(location.latitude, location.longitude, datetime.now(ZoneInfo(tz)).date(), tz)
+        return {
+            "city": location.name,
+            "country": location.country,
+            "timezone": tz,
+            "sunrise": sunrise.strftime("%H:%M") if sunrise else None,
+            "sunset": sunset.strftime("%H:%M") if sunset else None,
+            **forecast,
+        }
@@ -0,0 +1,124 @@
+"""
+Préchargement de la météo des villes actives
+
+Les recommandations arrivent en pic le matin, toutes au même moment. Une
+tâche de fond du worker rafraîchit, à intervalle régulier, les prévisions des
+positions demandées récemment (WEATHER_PREFETCH_ACTIVE_WINDOW) avant qu'elles
+n'expirent, pendant la journée locale de chaque ville (dès
+WEATHER_PREFETCH_START_HOUR, donc avant le pic du matin). Les appels sont
+étalés par un délai aléatoire (jitter) et limités en nombre simultané pour ne
+pas solliciter le fournisseur en rafale. Si le fournisseur est en panne, les
+prévisions en cache restent servies (stale-while-revalidate).
+"""
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from services.weather import Location, WeatherService
+
+
+class WeatherPrefetcher:
+    """Rafraîchissement périodique des prévisions des positions actives"""
+
+    def __init__(self, service: WeatherService, interval: float = 600, active_window: float = 172800,
+                 concurrency: int = 4, jitter: float = 60, start_hour: int = 5, end_hour: int = 23):
+        self.service = service
+        self.interval = interval
+        self.active_window = active_window
+        self.concurrency = max(1, concurrency)
+        self.jitter = jitter
+        self.start_hour = start_hour
+        self.end_hour = end_hour
+        self._task: Optional[asyncio.Task] = None
+
+    def due(self, now: Optional[datetime] = None) -> List[Location]:
+        """Positions actives dont la prévision aura expiré avant le prochain passage"""
+        now = now or datetime.now(timezone.utc)
+        horizon = self.service.ttl - self.interval
+        locations = []
+        for location in self.service.active_locations(self.active_window):
+            local_hour = now.astimezone(ZoneInfo(self.service.timezone(location))).hour
+            if not self.start_hour <= local_hour < self.end_hour:
+                continue  # Nuit locale : personne ne demande de recommandation
+            age = self.service.forecast_age(location)
+            if age is None or age >= horizon:
+                locations.append(location)
+        return locations
+
+    async def run_once(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Un passage : rafraîchit les positions dues, retourne les compteurs"""
+        locations = self.due(now)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        stats = {"due": len(locations), "refreshed": 0, "failed": 0}
+
+        async def refresh(location: Location):
+            # Étalement aléatoire des appels sur la fenêtre de jitter
+            await asyncio.sleep(random.uniform(0, self.jitter))
+            async with semaphore:
+                try:
+                    await self.service.refresh(location)
+                    stats["refreshed"] += 1
+                except Exception as e:
+                    stats["failed"] += 1
+                    print(f"⚠️ Préchargement météo échoué pour {location.name}: {type(e).__name__}: {e}")
+
+        await asyncio.gather(*(refresh(location) for location in locations))
+        return stats
+
+    async def run(self) -> None:
+        while True:
+            # Intervalle légèrement variable : les workers ne se synchronisent pas
+            await asyncio.sleep(self.interval * random.uniform(0.9, 1.1))
+            started = time.monotonic()
+            try:
+                stats = await self.run_once()
+            except Exception as e:
+                print(f"⚠️ Préchargement météo interrompu: {type(e).__name__}: {e}")
+                continue
+            if stats["due"]:
+                print(f"🌤️ Préchargement météo: {stats['refreshed']}/{stats['due']} positions rafraîchies, "
+                      f"{stats['failed']} échecs ({time.monotonic() - started:.1f}s)")
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_prefetcher: Optional[WeatherPrefetcher] = None
+
+
+def start_weather_prefetcher(service: WeatherService) -> None:
+    """Démarre le préchargement dans la boucle du worker (à appeler au démarrage)"""
+    from core.config import settings
+
+    global _prefetcher
+    if not settings.WEATHER_PREFETCH_ENABLED:
+        return
+    if _prefetcher is None:
+        _prefetcher = WeatherPrefetcher(
+            service,
+            interval=settings.WEATHER_PREFETCH_INTERVAL,
+            active_window=settings.WEATHER_PREFETCH_ACTIVE_WINDOW,
+            concurrency=settings.WEATHER_PREFETCH_CONCURRENCY,
+            jitter=settings.WEATHER_PREFETCH_JITTER,
+            start_hour=settings.WEATHER_PREFETCH_START_HOUR,
+        )
+    _prefetcher.start()
+
+
+async def stop_weather_prefetcher() -> None:
+    """Arrête la tâche de préchargement (à appeler à l'arrêt du worker)"""
+    if _prefetcher is not None:
+        await _prefetcher.stop()
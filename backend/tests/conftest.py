@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Les modules du backend s'importent depuis le dossier backend (comme dans les scripts)
+sys.path.append(str(Path(__file__).parent.parent))
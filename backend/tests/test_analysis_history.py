@@ -0,0 +1,116 @@
+from datetime import date, datetime, timedelta, timezone
+from uuid import UUID
+
+from schemas.clothing_analysis import AnalysisMeta, SinglePieceResponse
+from services.analysis_history import (
+    AnalysisLogQueue,
+    add_months,
+    build_analysis_record,
+    month_start,
+    partition_name,
+    sign_analysis,
+    verify_analysis_token,
+)
+
+
+USER_ID = UUID("12345678-1234-5678-1234-567812345678")
+PIECE_ID = UUID("00000000-0000-0000-0000-000000000001")
+SECRET = "test-secret"
+MAX_AGE = timedelta(hours=48)
+META = AnalysisMeta(model_used="gpt-4o-2024-08-06", duration_ms=1840, prompt_tokens=1210, completion_tokens=230)
+
+
+def _analysis(meta=None):
+    return SinglePieceResponse(
+        capture_type="single_piece",
+        pieces=[{
+            "piece_id": PIECE_ID,
+            "piece_type": "tshirt",
+            "name": "T-shirt blanc",
+            "attributes": {"colors": {"primary": ["white"]}, "material": "coton", "pattern": "uni", "fit": "regular"},
+            "style_tags": ["casual"],
+            "occasion_tags": ["everyday"],
+            "seasonality": ["summer"],
+        }],
+        analysis_meta=meta,
+    )
+
+
+def test_month_arithmetic_and_partition_names():
+    """Les mois sont calculés en UTC et franchissent les années"""
+    new_year_eve_utc_minus_2 = datetime(2024, 12, 31, 23, 30, tzinfo=timezone(timedelta(hours=-2)))
+    assert month_start(new_year_eve_utc_minus_2) == date(2025, 1, 1)
+    assert add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert add_months(date(2024, 1, 1), -13) == date(2022, 12, 1)
+    assert partition_name(date(2025, 2, 1)) == "analysis_history_p202502"
+
+
+def test_record_carries_model_metrics_and_compact_dump():
+    run = {"model_used": "gpt-4o-2024-08-06", "duration_ms": 1840, "prompt_tokens": 1210, "completion_tokens": 230}
+
+    record = build_analysis_record(USER_ID, _analysis(), created_item_id=PIECE_ID, run=run)
+
+    assert record["model_used"] == "gpt-4o-2024-08-06"
+    assert (record["analysis_duration_ms"], record["prompt_tokens"], record["completion_tokens"]) == (1840, 1210, 230)
+    assert record["created_item_id"] == PIECE_ID
+    assert "bounding_box" not in record["raw_analysis"]["pieces"][0]
+
+
+def test_client_supplied_metrics_are_never_logged():
+    """Les mesures viennent du jeton signé par le serveur, pas de analysis_meta"""
+    analysis = _analysis(META)
+    sign_analysis(analysis, SECRET)
+    analysis.analysis_meta = AnalysisMeta(model_used="forged", duration_ms=1, prompt_tokens=0, completion_tokens=0)
+
+    run = verify_analysis_token(analysis, SECRET, MAX_AGE)
+    record = build_analysis_record(USER_ID, analysis, created_item_id=PIECE_ID, run=run)
+
+    assert (record["model_used"], record["analysis_duration_ms"], record["prompt_tokens"]) == ("gpt-4o-2024-08-06", 1840, 1210)
+    assert "analysis_meta" not in record["raw_analysis"]
+    assert "analysis_token" not in record["raw_analysis"]
+
+
+def test_tampered_foreign_or_expired_tokens_are_rejected():
+    issued = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    analysis = _analysis(META)
+    token = sign_analysis(analysis, SECRET, now=issued)
+    assert verify_analysis_token(analysis, SECRET, MAX_AGE, now=issued + timedelta(hours=1))["duration_ms"] == 1840
+
+    assert verify_analysis_token(analysis, "autre-secret", MAX_AGE, now=issued) is None
+    assert verify_analysis_token(analysis, SECRET, MAX_AGE, now=issued + timedelta(hours=49)) is None
+
+    payload, signature = token.split(".")
+    analysis.analysis_token = f"{payload[:-2]}xx.{signature}"
+    assert verify_analysis_token(analysis, SECRET, MAX_AGE, now=issued) is None
+    analysis.analysis_token = "pas-un-jeton"
+    assert verify_analysis_token(analysis, SECRET, MAX_AGE, now=issued) is None
+
+    # Jeton valide recopié sur une autre analyse
+    other = _analysis()
+    other.pieces[0].piece_id = UUID("00000000-0000-0000-0000-000000000002")
+    other.analysis_token = token
+    assert verify_analysis_token(other, SECRET, MAX_AGE, now=issued) is None
+
+
+def test_queue_signals_batch_and_caps_pending():
+    queue = AnalysisLogQueue(batch_size=2, max_pending=3)
+    queue.enqueue({"n": 1})
+    assert not queue.full.is_set()
+    queue.enqueue({"n": 2})
+    assert queue.full.is_set()
+
+    queue.enqueue({"n": 3})
+    queue.enqueue({"n": 4})
+    assert [record["n"] for record in queue.drain()] == [2, 3, 4]
+    assert queue.dropped == 1
+
+
+def test_restore_puts_failed_records_first():
+    queue = AnalysisLogQueue()
+    queue.enqueue({"n": 1})
+    failed = queue.drain()
+    queue.enqueue({"n": 2})
+
+    queue.restore(failed)
+
+    assert [record["n"] for record in queue.drain()] == [1, 2]
@@ -0,0 +1,72 @@
+import asyncio
+from datetime import date
+
+from services.gazetteer import Gazetteer, get_gazetteer, sun_times
+from services.weather import FakeWeatherProvider, WeatherService
+
+ROWS = [
+    ("Paris", "FR", 48.86, 2.35, "Europe/Paris"),
+    ("Saint-Étienne", "FR", 45.43, 4.39, "Europe/Paris"),
+    ("Saint-Malo", "FR", 48.65, -2.03, "Europe/Paris"),
+    ("Valence", "FR", 44.93, 4.89, "Europe/Paris"),
+    ("Valence", "ES", 39.47, -0.38, "Europe/Madrid"),
+    ("Paris", "US", 33.66, -95.56, "America/Chicago"),
+]
+
+
+def test_lookup_ignores_case_accents_and_punctuation():
+    gazetteer = Gazetteer(ROWS)
+
+    assert gazetteer.lookup("  saint etienne").name == "Saint-Étienne"
+    assert gazetteer.lookup("SAINT-ÉTIENNE").timezone == "Europe/Paris"
+    assert gazetteer.lookup("Atlantide") is None
+
+
+def test_homonyms_prefer_requested_country_then_file_order():
+    gazetteer = Gazetteer(ROWS)
+
+    assert gazetteer.lookup("Valence").country_code == "FR"
+    assert gazetteer.lookup("valence", "es").timezone == "Europe/Madrid"
+    assert gazetteer.lookup("Paris", "US").latitude == 33.66
+
+
+def test_prefix_search():
+    gazetteer = Gazetteer(ROWS)
+
+    assert [city.name for city in gazetteer.search("saint")] == ["Saint-Malo", "Saint-Étienne"]
+    assert [city.country_code for city in gazetteer.search("val", "ES")] == ["ES", "FR"]
+    assert gazetteer.search(" ") == []
+
+
+def test_nearest_city_from_coordinates():
+    gazetteer = Gazetteer(ROWS)
+
+    assert gazetteer.nearest(45.45, 4.40).name == "Saint-Étienne"
+    assert gazetteer.nearest(48.80, 2.20).name == "Paris"
+    assert gazetteer.nearest(45.0, -30.0) is None
+
+
+def test_bundled_gazetteer_loads():
+    gazetteer = get_gazetteer()
+
+    assert len(gazetteer) > 100
+    assert gazetteer.lookup("Paris", "FR").timezone == "Europe/Paris"
+
+
+def test_sun_times_in_local_time():
+    sunrise, sunset = sun_times(48.86, 2.35, date(2026, 6, 21), "Europe/Paris")
+
+    assert (sunrise.hour, sunset.hour) == (5, 21)
+    assert sun_times(78.2, 15.6, date(2026, 6, 21), "Europe/Oslo") == (None, None)
+
+
+def test_weather_service_resolves_cities_offline():
+    provider = FakeWeatherProvider(locations={})
+    service = WeatherService(provider, gazetteer=Gazetteer(ROWS))
+
+    weather = asyncio.run(service.get_weather_data("saint etienne", "FR"))
+
+    assert weather["city"] == "Saint-Étienne" and weather["timezone"] == "Europe/Paris"
+    assert weather["sunrise"] < weather["sunset"]
+    assert provider.geocode_calls == 0
+    assert service.locate(48.80, 2.20).name == "Paris"
@@ -0,0 +1,181 @@
+import asyncio
+import sys
+
+import pytest
+
+from services.idempotency import (
+    IdempotencyKeyInProgress,
+    IdempotencyKeyMismatch,
+    IdempotencyStore,
+    KeyState,
+    request_fingerprint,
+)
+
+
+def test_fingerprint_ignores_key_order():
+    first = {"user_id": "u1", "analysis_result": {"capture_type": "single_piece", "pieces": [{"a": 1, "b": 2}]}}
+    second = {"analysis_result": {"pieces": [{"b": 2, "a": 1}], "capture_type": "single_piece"}, "user_id": "u1"}
+    assert request_fingerprint(first) == request_fingerprint(second)
+
+
+def test_fingerprint_detects_different_content():
+    base = {"user_id": "u1", "image_urls": None}
+    assert request_fingerprint(base) != request_fingerprint({**base, "image_urls": ["https://cdn/x.jpg"]})
+
+
+class MemoryBackend:
+    """Même contrat que DatabaseIdempotencyBackend, sans base ni expiration"""
+
+    def __init__(self, fail_complete=0):
+        self.keys = {}
+        self.refreshed = 0
+        self.fail_complete = fail_complete
+
+    def claim(self, user_id, key, request_hash):
+        if (user_id, key) in self.keys:
+            return False
+        self.keys[(user_id, key)] = KeyState("in_progress", request_hash, None, None)
+        return True
+
+    def lookup(self, user_id, key):
+        return self.keys.get((user_id, key))
+
+    def refresh(self, user_id, key):
+        self.refreshed += 1
+
+    def complete(self, user_id, key, status_code, body):
+        if self.fail_complete:
+            self.fail_complete -= 1
+            raise ConnectionError("base indisponible")
+        state = self.keys.get((user_id, key))
+        if state is None or state.status != "in_progress":
+            return False
+        self.keys[(user_id, key)] = state._replace(status="completed", response_status=status_code, response_body=body)
+        return True
+
+    def release(self, user_id, key):
+        if self.keys.get((user_id, key), KeyState("completed", "", None, None)).status == "in_progress":
+            del self.keys[(user_id, key)]
+
+
+def store(backend, wait_timeout=1.0, lock_timeout=60):
+    return IdempotencyStore(backend, wait_timeout=wait_timeout, lock_timeout=lock_timeout)
+
+
+def saver(calls, result=None, delay=0.0, error=None):
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return result or {"success": True, "piece_id": str(len(calls))}
+    return work
+
+
+def test_first_request_claims_and_retry_replays():
+    backend, calls = MemoryBackend(), []
+
+    first = asyncio.run(store(backend).run("u1", "k1", "h1", saver(calls)))
+    retry = asyncio.run(store(backend).run("u1", "k1", "h1", saver(calls)))
+
+    assert (first.replayed, retry.replayed) == (False, True)
+    assert retry.body == first.body == {"success": True, "piece_id": "1"}
+    assert retry.status_code == 200
+    assert len(calls) == 1
+
+
+def test_key_reused_with_other_content_is_rejected():
+    backend = MemoryBackend()
+    asyncio.run(store(backend).run("u1", "k1", "h1", saver([])))
+
+    with pytest.raises(IdempotencyKeyMismatch) as error:
+        asyncio.run(store(backend).run("u1", "k1", "h2", saver([])))
+    assert error.value.http_status == 422
+
+
+def test_concurrent_request_waits_then_gives_up():
+    backend, calls = MemoryBackend(), []
+
+    async def scenario():
+        slow = asyncio.create_task(store(backend).run("u1", "k1", "h1", saver(calls, delay=0.5)))
+        await asyncio.sleep(0.05)
+        with pytest.raises(IdempotencyKeyInProgress) as error:
+            await store(backend, wait_timeout=0.1).run("u1", "k1", "h1", saver(calls))
+        # Une attente plus longue rejoue la réponse de la requête d'origine
+        waited = await store(backend).run("u1", "k1", "h1", saver(calls))
+        return error.value, await slow, waited
+
+    error, original, waited = asyncio.run(scenario())
+
+    assert error.http_status == 409
+    assert waited.replayed and waited.body == original.body
+    assert len(calls) == 1
+
+
+def test_failure_releases_the_key_for_a_retry():
+    backend, calls = MemoryBackend(), []
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(store(backend).run("u1", "k1", "h1", saver(calls, error=RuntimeError("échec"))))
+    assert backend.lookup("u1", "k1") is None
+
+    retry = asyncio.run(store(backend).run("u1", "k1", "h1", saver(calls)))
+    assert not retry.replayed and len(calls) == 2
+
+
+def test_slow_processing_keeps_its_reservation_fresh():
+    backend = MemoryBackend()
+
+    asyncio.run(store(backend, lock_timeout=0.3).run("u1", "k1", "h1", saver([], delay=0.35)))
+
+    assert backend.refreshed >= 2
+
+
+def test_saved_response_reaches_the_client_when_recording_fails():
+    backend = MemoryBackend(fail_complete=1)
+
+    outcome = asyncio.run(store(backend).run("u1", "k1", "h1", saver([])))
+
+    assert outcome.body == {"success": True, "piece_id": "1"} and not outcome.replayed
+    assert backend.lookup("u1", "k1").status == "completed"
+
+
+def test_legacy_save_route_forwards_the_idempotency_key(monkeypatch):
+    """/save-clothing : sans en-tête, aucune réservation ; avec, la clé est celle du client"""
+    monkeypatch.setenv("DATABASE_URL", "postgresql://localhost/unused")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    from fastapi.testclient import TestClient
+
+    import main
+    from core.database import get_db
+
+    # modules.wardrobe réexporte l'APIRouter sous le nom "router" : module lu dans sys.modules
+    wardrobe_router = sys.modules["modules.wardrobe.router"]
+
+    backend, calls = MemoryBackend(), []
+
+    async def save_analysis(request, db):
+        calls.append(request.user_id)
+        return {"success": True, "piece_id": str(len(calls))}
+
+    monkeypatch.setattr(wardrobe_router, "_save_analysis", save_analysis)
+    monkeypatch.setattr(wardrobe_router, "DatabaseIdempotencyBackend", lambda *args, **kwargs: backend)
+    monkeypatch.setitem(main.app.dependency_overrides, get_db, lambda: None)
+    client = TestClient(main.app)  # Sans lifespan : aucun worker de fond démarré
+    body = {"user_id": "12345678-1234-5678-1234-567812345678", "analysis_result": {
+        "capture_type": "single_piece",
+        "pieces": [{
+            "piece_id": "00000000-0000-0000-0000-000000000001", "piece_type": "tshirt", "name": "T-shirt blanc",
+            "attributes": {"colors": {"primary": ["white"]}, "material": "coton", "pattern": "uni", "fit": "regular"},
+            "style_tags": ["casual"], "occasion_tags": ["weekend"], "seasonality": ["summer"],
+        }],
+    }}
+
+    assert client.post("/save-clothing", json=body).json() == {"success": True, "piece_id": "1"}
+    assert backend.keys == {}
+
+    first = client.post("/save-clothing", json=body, headers={"Idempotency-Key": "k1"})
+    retry = client.post("/save-clothing", json=body, headers={"Idempotency-Key": "k1"})
+    assert first.json() == retry.json() == {"success": True, "piece_id": "2"}
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert len(calls) == 2
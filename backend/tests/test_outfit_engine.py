@@ -0,0 +1,57 @@
+from services.outfit_engine import BOTTOMS, DRESSES, LAYERS, TOPS, combo_id, combo_key, generate_outfits
+
+
+def piece(item_id, category, color="white", material="coton", styles=("casual",)):
+    return {"id": item_id, "category": category, "colors": [color], "materials": [material],
+            "styleTags": list(styles), "occasionTags": ["weekend"], "isLook": False}
+
+
+WARDROBE = [
+    piece("t1", "tshirt"), piece("t2", "shirt", "navy"), piece("b1", "jeans", "blue", "denim"),
+    piece("b2", "shorts", "beige"), piece("d1", "dress", "red", "soie"),
+    piece("c1", "coat", "black", "laine"), piece("s1", "sneakers"),
+]
+CATEGORIES = {item["id"]: item["category"] for item in WARDROBE}
+
+
+def test_candidates_respect_composition_rules():
+    for temperature in (5, 15, 25, 33):
+        candidates = generate_outfits(WARDROBE, temperature=temperature, top_k=50)
+        assert candidates
+        for candidate in candidates:
+            categories = [CATEGORIES[item_id] for item_id in candidate.item_ids]
+            tops = sum(c in TOPS for c in categories)
+            bottoms = sum(c in BOTTOMS for c in categories)
+            dresses = sum(c in DRESSES for c in categories)
+            # Un haut + un bas, ou une robe seule ; au plus une couche extérieure
+            assert (tops, bottoms, dresses) in {(1, 1, 0), (0, 0, 1)}
+            assert sum(c in LAYERS for c in categories) <= 1
+            assert candidate.id == combo_id(candidate.item_ids)
+
+
+def test_cold_weather_adds_a_layer_and_heat_does_not():
+    cold = generate_outfits(WARDROBE, temperature=5, top_k=1)[0]
+    hot = generate_outfits(WARDROBE, temperature=33, top_k=50)
+
+    assert "c1" in cold.item_ids
+    assert all("c1" not in candidate.item_ids for candidate in hot)
+
+
+def test_weather_fit_ranks_light_pieces_first_in_heat():
+    best = generate_outfits(WARDROBE, temperature=33, top_k=1)[0]
+    assert "b2" in best.item_ids or "d1" in best.item_ids
+
+
+def test_excluded_combos_and_looks_are_skipped():
+    look = {"id": "look-1", "isLook": True, "pieces": [{"id": "t1", "category": "tshirt"}, {"id": "b1", "category": "jeans"}]}
+    first = generate_outfits(WARDROBE + [look], temperature=22, top_k=50)
+    excluded = {combo_key(reversed(first[0].item_ids)), ("look-1",)}
+
+    again = generate_outfits(WARDROBE + [look], temperature=22, exclude=excluded, top_k=50)
+
+    assert {first[0].id, "look-1"}.isdisjoint(candidate.id for candidate in again)
+    assert len(again) == len(first) - 2
+
+
+def test_no_candidate_without_bottom_or_dress():
+    assert generate_outfits([piece("t1", "tshirt"), piece("s1", "sneakers")], temperature=20) == []
@@ -0,0 +1,48 @@
+import uuid
+
+from services.outfit_engine import combo_id
+from services.prompt_encoding import PromptWardrobe, encode_options
+
+
+def piece(category, name, styles=("casual",)):
+    return {"id": str(uuid.uuid4()), "category": category, "name": name, "colors": ["white"], "materials": ["coton"],
+            "pattern": "uni", "seasons": ["summer"], "styleTags": list(styles), "occasionTags": ["weekend"],
+            "itemType": "SINGLE_PIECE", "wearCount": 3, "isLook": False}
+
+
+PIECES = [piece("tshirt", "T-shirt | blanc"), piece("jeans", "Jean brut"), piece("sneakers", "Baskets", ("sport",))]
+LOOK = {"id": str(uuid.uuid4()), "name": "Look week-end", "isLook": True, "styleTags": ["casual"],
+        "pieces": [{"id": PIECES[0]["id"], "category": "tshirt"}, {"id": str(uuid.uuid4()), "category": "coat"}]}
+
+
+def test_aliases_round_trip_to_real_ids():
+    wardrobe = PromptWardrobe(PIECES + [LOOK])
+
+    for item in PIECES + [LOOK]:
+        assert wardrobe.resolve(wardrobe.alias(item["id"])) == item["id"]
+    # Combinaison d'alias dans n'importe quel ordre : id canonique des pièces réelles
+    expected = combo_id([PIECES[0]["id"], PIECES[1]["id"]])
+    assert wardrobe.resolve("combo-p2-p1") == wardrobe.resolve("combo-p1-p2") == expected
+    # Ids inconnus ou déjà réels : inchangés
+    assert wardrobe.resolve("combo-p1-p9") == "combo-p1-p9"
+    assert wardrobe.resolve(expected) == expected
+
+
+def test_item_ids_of_aliases():
+    wardrobe = PromptWardrobe(PIECES + [LOOK])
+
+    assert wardrobe.item_ids("combo-p2-p1") == [PIECES[1]["id"], PIECES[0]["id"]]
+    assert wardrobe.item_ids("t1") == [piece["id"] for piece in LOOK["pieces"]]
+    assert wardrobe.item_ids("combo-p1-p9") == wardrobe.item_ids("nope") == []
+
+
+def test_encoding_is_one_line_per_item_without_uuids():
+    wardrobe = PromptWardrobe(PIECES + [LOOK])
+    lines = wardrobe.text.splitlines()
+
+    assert lines[0] == "TAGS: 1=casual 2=weekend 3=sport"
+    assert "p1|tshirt|T-shirt / blanc|white|coton|uni|summer|1,2" in lines
+    assert lines[-1] == "t1|Look week-end||1|p1,coat"
+    assert len(lines) == 1 + 1 + len(PIECES) + 1 + 1
+    assert not any(item["id"] in wardrobe.text for item in PIECES + [LOOK])
+    assert encode_options(wardrobe, [(87, [PIECES[1]["id"], PIECES[0]["id"]])]).splitlines()[1] == "o1|87|p2,p1"
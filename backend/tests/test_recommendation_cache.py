@@ -0,0 +1,76 @@
+from datetime import datetime, timezone
+
+from services.recommendation_cache import (
+    conflicts_with_exclusions,
+    daytime_weather,
+    recommendation_key,
+    seconds_until_local_midnight,
+    weather_bucket,
+)
+
+NOW = datetime(2026, 6, 1, 6, 0, tzinfo=timezone.utc)  # 8 h à Paris
+
+
+def weather(max_temp=24.0, min_temp=12.0, precipitation=0.0, code=1, temperature=21.0, tz="Europe/Paris"):
+    return {"timezone": tz, "current": {"temperature": temperature, "precipitation": 0.0, "weather_code": 0},
+            "daily": {"max_temp": max_temp, "min_temp": min_temp, "precipitation": precipitation, "weather_code": code}}
+
+
+def key(**overrides):
+    params = {"weather": weather(), "wardrobe_items": [{"id": "a"}], "user_id": "u1", "season": "summer",
+              "user_needs": "Réunion importante", "recently_worn_ids": ["x", "y"], "now": NOW}
+    params.update(overrides)
+    return recommendation_key(**params)
+
+
+def test_same_inputs_within_a_weather_bucket_share_a_key():
+    assert key() == key(weather=weather(max_temp=20.0, min_temp=14.9, code=0))
+    assert key() == key(user_needs="  réunion   IMPORTANTE ", recently_worn_ids=["y", "x", "x"])
+    # Météo du moment ignorée : précalcul à 4 h et demande au pic de 8 h partagent la clé
+    assert key().digest() == key(weather=weather(temperature=9.0)).digest()
+
+
+def test_any_input_change_changes_the_key():
+    base = key()
+    variants = [
+        key(weather=weather(max_temp=25)),
+        key(weather=weather(min_temp=9)),
+        key(weather=weather(precipitation=0.2)),
+        key(weather=weather(code=3)),
+        key(wardrobe_items=[{"id": "b"}]),
+        key(wardrobe_version=3),
+        key(user_id="u2"),
+        key(season="winter"),
+        key(user_needs=None),
+        key(recently_recommended_combos=["combo-a-b"]),
+        key(mode="local"),
+        key(now=datetime(2026, 6, 1, 22, 30, tzinfo=timezone.utc)),  # lendemain à Paris
+    ]
+    assert all(variant != base for variant in variants)
+
+
+def test_weather_bucket_bounds():
+    assert weather_bucket(weather(max_temp=4, min_temp=-0.5)) == "min -5..0|max 0..5|dry|clear"
+    assert weather_bucket(weather(max_temp=30, precipitation=1, code=95)) == "min 10..15|max 30..35|rain|storm"
+
+
+def test_daytime_weather_uses_the_forecast_of_the_day():
+    day = daytime_weather(weather(max_temp=24, min_temp=12, precipitation=1.5, code=61, temperature=9))
+
+    assert day["current"]["temperature"] == 18
+    assert day["current"]["precipitation"] == 1.5 and day["current"]["weather_code"] == 61
+
+
+def test_ttl_runs_until_local_midnight():
+    assert seconds_until_local_midnight("Europe/Paris", NOW) == 16 * 3600
+    assert seconds_until_local_midnight("Asia/Tokyo", NOW) == 9 * 3600
+
+
+def test_stored_recommendation_is_checked_against_new_exclusions():
+    assert key().digest(with_exclusions=False) == key(recently_worn_ids=["z"]).digest(with_exclusions=False)
+    assert key().digest() != key(recently_worn_ids=["z"]).digest()
+
+    result = {"recommendations": [{"id": "combo-a-b", "item_ids": ["a", "b"]}]}
+    assert not conflicts_with_exclusions(result, recently_worn_ids=["c"], recently_recommended_ids=["a"])
+    assert conflicts_with_exclusions(result, recently_worn_ids=["b"])
+    assert conflicts_with_exclusions(result, recently_recommended_combos=["combo-a-b"])
@@ -0,0 +1,26 @@
+from services.outfit_engine import combo_key
+from services.recommendation_history import RecommendationHistory, outfit_key, recommendation_outfit_key
+
+A = "0b6c1c9e-6b1f-4a52-9a39-3f4a3d1c2b10"
+B = "f2a0d8a4-1c3e-4b7d-8e0f-5a6b7c8d9e01"
+
+
+def test_client_combo_ids_map_to_canonical_keys():
+    assert outfit_key(f"combo-{B}-{A}") == outfit_key(f"combo-{A}-{B}") == combo_key([A, B])
+    assert outfit_key("combo-t1-b1") == ("b1", "t1")
+    assert outfit_key("look-1") == ("look-1",)
+    assert recommendation_outfit_key({"id": f"combo-{A}-{B}", "item_ids": [B, A]}) == combo_key([A, B])
+
+
+def test_history_is_a_bounded_ring_with_membership():
+    history = RecommendationHistory(capacity=2)
+    assert history.add(("a", "b")) and history.add(("look-1",))
+    assert not history.add(("a", "b"))
+    assert history.add(("c", "d"))  # Anneau plein : la plus ancienne sort
+
+    assert len(history) == 2
+    assert ("a", "b") not in history and ("look-1",) in history and ("c", "d") in history
+
+    restored = RecommendationHistory.from_bytes(history.to_bytes(), capacity=2)
+    assert len(history.to_bytes()) == 16 and ("c", "d") in restored
+    assert ("x",) in restored.with_outfit_ids(["x"]) and ("x",) not in restored
@@ -0,0 +1,90 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from services.recommendation_cache import recommendation_key
+from services.recommendation_history import RecommendationHistory
+from services.recommendation_precompute import RecommendationPrecomputer
+from services.weather import FakeWeatherProvider, WeatherService
+
+IN_WINDOW = datetime(2026, 6, 1, 2, 0, tzinfo=timezone.utc)  # 4 h à Paris
+PEAK = datetime(2026, 6, 1, 6, 0, tzinfo=timezone.utc)  # 8 h à Paris
+
+
+class FakeRecommendationService:
+    """Même contrat que RecommendationService.precompute, sans modèle"""
+
+    def __init__(self, weather_service):
+        self.weather_service = weather_service
+        self.calls = 0
+
+    async def precompute(self, request, wardrobe_version, current_input_key=None, history=None):
+        weather = await self.weather_service.get_weather_data(request.city, request.country_code)
+        key = recommendation_key(weather, request.wardrobe_items, user_id=request.user_id,
+                                 wardrobe_version=wardrobe_version, mode="auto", now=IN_WINDOW)
+        if current_input_key == key.digest(with_exclusions=False):
+            return None
+        self.calls += 1
+        return key, {"recommendations": [{"id": "combo-a-b", "item_ids": ["a", "b"]}], "mode": "llm"}, 3600
+
+
+class FakeStore:
+    def __init__(self, fail_for=()):
+        self.fail_for = set(fail_for)
+        self.saved = {}
+
+    def load(self, user_id):
+        if user_id in self.fail_for:
+            raise RuntimeError("base indisponible")
+        return 1, [{"id": "a"}, {"id": "b"}], RecommendationHistory(0)
+
+    def save(self, user_id, key, result, valid_until):
+        self.saved[user_id] = (key.digest(with_exclusions=False), valid_until)
+
+
+def profile(user_id, input_key=None, valid_until=None):
+    return SimpleNamespace(user_id=user_id, city="Paris", country_code="FR", latitude=None, longitude=None,
+                           current_season=None, mode=None, input_key=input_key, valid_until=valid_until)
+
+
+def precomputer(provider, store, **kwargs):
+    service = FakeRecommendationService(WeatherService(provider))
+    return service, RecommendationPrecomputer(service, store, SimpleNamespace, **kwargs)
+
+
+def test_only_users_inside_their_local_window_are_computed():
+    store = FakeStore()
+    _, early = precomputer(FakeWeatherProvider(), store)
+    _, late = precomputer(FakeWeatherProvider(), store)
+
+    assert asyncio.run(early.run([profile("u1")], IN_WINDOW)).computed == 1
+    metrics = asyncio.run(late.run([profile("u2")], PEAK))
+
+    assert metrics.outside_window == 1 and metrics.computed == 0
+    assert list(store.saved) == ["u1"]
+
+
+def test_unchanged_inputs_are_not_recomputed():
+    """Un passage suivant ne recalcule pas si la prévision du jour n'a pas changé (météo du moment ignorée)"""
+    store = FakeStore()
+    _, first = precomputer(FakeWeatherProvider(temperature=14), store)
+    asyncio.run(first.run([profile("u1")], IN_WINDOW))
+    input_key, valid_until = store.saved["u1"]
+
+    service, again = precomputer(FakeWeatherProvider(temperature=13), store)
+    metrics = asyncio.run(again.run([profile("u1", input_key, valid_until)], IN_WINDOW))
+    assert metrics.unchanged == 1 and service.calls == 0
+
+    # Prévision changée : recalculée
+    service, changed = precomputer(FakeWeatherProvider(temperature=14, precipitation=2), store)
+    assert asyncio.run(changed.run([profile("u1", input_key, valid_until)], IN_WINDOW)).computed == 1
+
+
+def test_failures_are_counted_without_stopping_the_batch():
+    store = FakeStore(fail_for={"u2"})
+    _, pipeline = precomputer(FakeWeatherProvider(), store, concurrency=2)
+
+    metrics = asyncio.run(pipeline.run([profile(f"u{i}") for i in range(1, 5)], IN_WINDOW))
+
+    assert metrics.users_seen == 4 and metrics.failed == 1 and metrics.computed == 3
+    assert sorted(store.saved) == ["u1", "u3", "u4"]
@@ -0,0 +1,120 @@
+import pytest
+
+from services.prompt_encoding import PromptWardrobe
+from services.recommendation_rules import (
+    OUT_OF_SEASON,
+    RECENTLY_WORN,
+    WEATHER_RULES,
+    estimate_tokens,
+    prefilter_wardrobe,
+)
+
+
+def piece(item_id, category, material="coton", seasons=("summer",)):
+    return {"id": item_id, "category": category, "materials": [material], "seasons": list(seasons), "isLook": False}
+
+
+def ids(result):
+    return [item["id"] for item in result.items]
+
+
+def test_every_rule_has_a_test():
+    tested = {case.values[0] for case in EXCLUDE_CASES + PREFER_CASES}
+    assert tested == {rule.name for rule in WEATHER_RULES}
+
+
+EXCLUDE_CASES = [
+    # règle, température, pièce visée, pièce qui reste (même température)
+    pytest.param("hot_no_warm_materials", 32, piece("a", "shirt", "lin"), piece("b", "shirt", "velours")),
+    pytest.param("hot_no_warm_layers", 31, piece("a", "tshirt"), piece("b", "coat", "coton")),
+    pytest.param("warm_no_heavy_knits", 26, piece("a", "tshirt"), piece("b", "hoodie", "coton")),
+    pytest.param("mild_no_warm_outerwear", 22, piece("a", "jacket", "denim"), piece("b", "coat", "polyester")),
+    pytest.param("mild_no_wool_knits", 21, piece("a", "sweater", "coton"), piece("b", "pullover", "laine")),
+]
+
+
+@pytest.mark.parametrize("rule,temperature,allowed,forbidden", EXCLUDE_CASES)
+def test_exclude_rule(rule, temperature, allowed, forbidden):
+    result = prefilter_wardrobe([allowed, forbidden], temperature=temperature)
+
+    assert ids(result) == [allowed["id"]]
+    assert result.excluded[rule] == [forbidden["id"]]
+
+
+def test_exclude_rules_do_not_apply_when_cold():
+    wardrobe = [piece("a", "coat", "laine"), piece("b", "hoodie", "velours")]
+    assert prefilter_wardrobe(wardrobe, temperature=8).excluded == {}
+
+
+PREFER_CASES = [
+    # règle, conditions, pièce préférée (placée en tête)
+    pytest.param("heat_prefer_light_materials", {"temperature": 27}, piece("p", "shirt", "lin")),
+    pytest.param("cold_prefer_warm_layers", {"temperature": 12}, piece("p", "coat", "polyester")),
+    pytest.param("cold_prefer_warm_materials", {"temperature": 5}, piece("p", "pants", "laine")),
+    pytest.param("rain_prefer_waterproof_types", {"temperature": 18, "raining": True}, piece("p", "boots", "daim")),
+    pytest.param("rain_prefer_waterproof_materials", {"temperature": 18, "raining": True}, piece("p", "jacket", "nylon")),
+]
+
+
+@pytest.mark.parametrize("rule,conditions,favoured", PREFER_CASES)
+def test_prefer_rule(rule, conditions, favoured):
+    neutral = piece("n", "jeans", "denim")
+
+    result = prefilter_wardrobe([neutral, favoured], **conditions, rules=[r for r in WEATHER_RULES if r.name == rule])
+
+    assert ids(result) == ["p", "n"]
+    assert result.preferred == 1
+
+
+def test_rain_preference_needs_rain():
+    result = prefilter_wardrobe([piece("n", "jeans", "denim"), piece("p", "boots", "cuir")], temperature=18)
+    assert ids(result) == ["n", "p"]
+
+
+def test_recently_worn_items_and_looks_containing_them_are_removed():
+    look = {"id": "look-1", "isLook": True, "seasons": ["summer"],
+            "pieces": [{"id": "a", "category": "tshirt"}, {"id": "c", "category": "shorts"}]}
+    wardrobe = [piece("a", "tshirt"), piece("b", "shorts"), look]
+
+    result = prefilter_wardrobe(wardrobe, temperature=22, recently_worn_ids=["a"])
+
+    assert ids(result) == ["b"]
+    assert result.excluded[RECENTLY_WORN] == ["a", "look-1"]
+
+
+def test_out_of_season_items_are_removed():
+    wardrobe = [piece("a", "tshirt", seasons=["summer"]), piece("b", "coat", "laine", seasons=["winter"]),
+                piece("c", "jeans", "denim", seasons=[])]
+
+    result = prefilter_wardrobe(wardrobe, temperature=5, season="summer")
+
+    assert ids(result) == ["a", "c"]
+    assert result.excluded[OUT_OF_SEASON] == ["b"]
+    assert prefilter_wardrobe(wardrobe, temperature=5, season="all_season").excluded == {}
+
+
+def test_all_season_items_match_every_season():
+    wardrobe = [piece("a", "jeans", "denim", seasons=["all_season"]), piece("b", "coat", "laine", seasons=["winter", "all_season"])]
+
+    for season in ("spring", "summer", "fall", "winter"):
+        assert sorted(ids(prefilter_wardrobe(wardrobe, temperature=5, season=season))) == ["a", "b"]
+
+
+def test_looks_are_checked_on_their_pieces():
+    look = {"id": "look-1", "isLook": True, "pieces": [{"id": "x", "category": "hoodie"}, {"id": "y", "category": "jeans"}]}
+
+    result = prefilter_wardrobe([look], temperature=28)
+
+    assert result.excluded == {"warm_no_heavy_knits": ["look-1"]}
+
+
+def test_reports_tokens_saved():
+    wardrobe = [piece(str(i), "sweater", "laine") for i in range(10)] + [piece("keep", "tshirt")]
+
+    result = prefilter_wardrobe(wardrobe, temperature=31)
+
+    assert ids(result) == ["keep"]
+    # Estimation dans l'encodage compact du prompt, pas en JSON
+    removed = PromptWardrobe(wardrobe[:10])
+    assert result.tokens_saved == estimate_tokens("\n".join(removed.line(item) for item in wardrobe[:10])) > 0
+    assert result.summary()["estimated_tokens_saved"] == result.tokens_saved
@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+from services.wardrobe_candidates import prune_candidates, wardrobe_items_from_snapshot
+
+
+def piece(item_id, category, favorite=False, wear_count=0):
+    return {"id": item_id, "category": category, "isFavorite": favorite, "wearCount": wear_count, "isLook": False}
+
+
+def test_prune_caps_each_category_keeping_order():
+    items = [piece("a", "tshirt", wear_count=5), piece("b", "tshirt", favorite=True, wear_count=9),
+             piece("c", "tshirt", wear_count=1), piece("d", "jeans"),
+             {"id": "l1", "isLook": True, "wearCount": 2}, {"id": "l2", "isLook": True, "wearCount": 0}]
+
+    pruned = prune_candidates(items, max_per_category=2, max_looks=1)
+
+    # Favori puis moins porté ; ordre d'origine conservé
+    assert [item["id"] for item in pruned] == ["b", "c", "d", "l2"]
+
+
+def test_prune_keeps_weather_preferred_items_first():
+    """Les éléments adaptés à la météo (en tête du pré-filtre) ne sont pas évincés par les favoris"""
+    items = [piece("coat", "coat", wear_count=30), piece("trench", "coat", favorite=True), piece("parka", "coat")]
+
+    assert [item["id"] for item in prune_candidates(items, 1, 1, preferred=1)] == ["coat"]
+    assert [item["id"] for item in prune_candidates(items, 1, 1)] == ["trench"]
+
+
+def test_wardrobe_items_from_snapshot():
+    jean = SimpleNamespace(
+        id="p1", name="Jean brut", piece_type="jeans", colors={"primary": ["navy"]}, material="denim",
+        pattern=None, fit=None, details=None, style_tags=["casual"], occasion_tags=None,
+        seasonality=["all_season"], is_favorite=True, wear_count=None,
+    )
+    look = SimpleNamespace(
+        id="l1", name="Week-end", dominant_style=["casual"], occasion_tags=[], seasonality=None,
+        color_palette=None, pattern_mix=None, silhouette=None, layering_level=None,
+        is_favorite=False, wear_count=3, items=[SimpleNamespace(item_id="p1", item=jean)],
+    )
+
+    items = wardrobe_items_from_snapshot(SimpleNamespace(pieces=[jean], looks=[look]))
+
+    assert items[0] == {
+        "id": "p1", "name": "Jean brut", "category": "jeans", "itemType": "SINGLE_PIECE", "colors": ["navy"],
+        "materials": ["denim"], "pattern": "uni", "fit": "regular", "styleTags": ["casual"],
+        "seasons": ["all_season"], "isFavorite": True, "wearCount": 0, "isLook": False,
+    }
+    # Champs vides retirés ; pièces de la tenue décrites par leur catégorie
+    assert items[1] == {
+        "id": "l1", "name": "Week-end", "itemType": "OUTFIT", "styleTags": ["casual"], "layeringLevel": 1,
+        "isFavorite": False, "wearCount": 3, "isLook": True,
+        "pieces": [{"id": "p1", "category": "jeans", "name": "Jean brut"}],
+    }
@@ -0,0 +1,83 @@
+import io
+import json
+from uuid import UUID
+
+import pytest
+
+from services.wardrobe_import import (
+    MAX_REPORTED_ERRORS,
+    WardrobeImporter,
+    detect_format,
+    encode_copy_value,
+    iter_records,
+)
+
+
+USER_ID = UUID("12345678-1234-5678-1234-567812345678")
+
+
+def test_detect_format():
+    """Le format est déduit de l'extension, le paramètre explicite est prioritaire"""
+    assert detect_format("garde_robe.jsonl") == "jsonl"
+    assert detect_format("export.CSV") == "csv"
+    assert detect_format("export.txt", "csv") == "csv"
+    with pytest.raises(ValueError):
+        detect_format("export.xlsx")
+
+
+def test_iter_records_jsonl_reports_bad_lines():
+    """Une ligne JSON invalide est signalée sans interrompre la lecture"""
+    stream = io.StringIO('{"piece_type": "tshirt"}\n\n{bad\n[1, 2]\n{"piece_type": "pants"}\n')
+    records = list(iter_records(stream, "jsonl"))
+
+    assert [line for line, _ in records] == [1, 3, 4, 5]
+    assert records[0][1] == {"piece_type": "tshirt"}
+    assert isinstance(records[1][1], Exception)
+    assert isinstance(records[2][1], Exception)
+
+
+def test_iter_records_csv_splits_lists():
+    """En CSV, les cellules vides sont ignorées et les listes séparées par |"""
+    stream = io.StringIO("piece_type,colors,style_tags,brand\ntshirt,white|black,casual|chic,\n")
+    (line, record), = iter_records(stream, "csv")
+
+    assert line == 2
+    assert "brand" not in record
+
+    importer = WardrobeImporter(db=None, user_id=USER_ID, dry_run=True)
+    report = importer.run([(line, record)])
+    assert report.imported == 1 and report.failed == 0
+
+
+def test_validation_errors_are_per_row_and_capped():
+    """Chaque ligne invalide produit une erreur, seules les premières sont détaillées"""
+    records = [(i, {"name": "sans type"}) for i in range(1, MAX_REPORTED_ERRORS + 11)]
+    records.append((999, {"piece_type": "tshirt", "wear_count": 2}))
+
+    report = WardrobeImporter(db=None, user_id=USER_ID, dry_run=True).run(records)
+
+    assert report.total == MAX_REPORTED_ERRORS + 11
+    assert report.imported == 1
+    assert report.failed == MAX_REPORTED_ERRORS + 10
+    assert len(report.errors) == MAX_REPORTED_ERRORS
+    assert report.as_dict()["errors_truncated"] is True
+
+
+def test_duplicate_ids_in_file_are_reported():
+    """Un id répété dans le fichier est signalé au lieu d'être ignoré silencieusement"""
+    item_id = "11111111-2222-3333-4444-555555555555"
+    records = [(1, {"id": item_id, "piece_type": "tshirt"}), (2, {"id": item_id, "piece_type": "tshirt"})]
+
+    report = WardrobeImporter(db=None, user_id=USER_ID, dry_run=True).run(records)
+
+    assert report.imported == 1
+    assert report.errors[0].line == 2
+
+
+def test_encode_copy_value_escapes_text_format():
+    """Les valeurs sont encodées au format texte de COPY"""
+    assert encode_copy_value(None) == "\\N"
+    assert encode_copy_value(True) == "t"
+    assert encode_copy_value("a\tb\nc\\d") == "a\\tb\\nc\\\\d"
+    assert encode_copy_value(["casual", 'say "hi"', "a,b"]) == '{"casual","say \\\\"hi\\\\"","a,b"}'
+    assert json.loads(encode_copy_value({"primary": ["white"]})) == {"primary": ["white"]}
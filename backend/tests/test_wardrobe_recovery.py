@@ -0,0 +1,223 @@
+import asyncio
+import json
+import threading
+import time
+import uuid
+
+from services.wardrobe_recovery import (
+    RecoveryCheckpoint,
+    RecoveryPipeline,
+    guess_piece_type,
+    iter_listing,
+    parse_file_owner,
+)
+
+
+PUBLIC_URL = "https://storage.test/wardrobe"
+
+
+U1 = "11111111-1111-4111-8111-111111111111"
+U2 = "22222222-2222-4222-8222-222222222222"
+U3 = "33333333-3333-4333-8333-333333333333"
+PIECE = "aaaaaaaa-aaaa-4aaa-8aaa-aaaaaaaaaaaa"
+
+
+def user_id(n):
+    return f"{n:08d}-0000-4000-8000-000000000000"
+
+
+class FakeStorageLister:
+    """Bucket en mémoire : fichiers plats à la racine et {dossier: [noms de fichiers]}"""
+
+    def __init__(self, root_files=(), folders=None):
+        self.root_files = sorted(root_files)
+        self.folders = folders or {}
+        self.calls = []
+
+    async def list_page(self, prefix, limit, offset):
+        self.calls.append((prefix, limit, offset))
+        await asyncio.sleep(0)
+        if prefix == "":
+            entries = [{"name": folder, "id": None} for folder in sorted(self.folders)]
+            entries += [{"name": name, "id": name} for name in self.root_files]
+        else:
+            entries = [{"name": name, "id": name} for name in self.folders[prefix.rstrip("/")]]
+        return entries[offset:offset + limit]
+
+
+class FakeSink:
+    def __init__(self, existing=None, fail_for=()):
+        self.existing = existing or {}
+        self.fail_for = set(fail_for)
+        self.batches = []
+        self.items = {}
+
+    def existing_image_urls(self, user_id):
+        return set(self.existing.get(user_id, ()))
+
+    def insert_items(self, user_id, items):
+        if user_id in self.fail_for:
+            raise RuntimeError("base indisponible")
+        self.batches.append((user_id, [item["image_url"] for item in items]))
+        self.items.setdefault(user_id, []).extend(items)
+        return len(items)
+
+
+def _run(pipeline):
+    return asyncio.run(pipeline.run())
+
+
+def test_iter_listing_walks_all_pages():
+    """Le listing suit les pages jusqu'à une page incomplète"""
+    lister = FakeStorageLister(folders={"u1": [f"img_{i}.jpg" for i in range(7)]})
+
+    async def collect():
+        return [entry["name"] async for entry in iter_listing(lister, "u1/", 3)]
+
+    assert len(asyncio.run(collect())) == 7
+    assert [offset for _, _, offset in lister.calls] == [0, 3, 6]
+
+
+def test_guess_piece_type():
+    assert guess_piece_type("Chemise_bleue.jpg") == ("shirt", "Haut importé")
+    assert guess_piece_type("photo.jpg") == ("unknown", "Vêtement importé")
+
+
+def test_parse_file_owner():
+    assert parse_file_owner(f"piece_{U1}_{PIECE}_1700000000.jpg") == (U1, PIECE)
+    assert parse_file_owner(f"outfit_{U1}_1700000000.jpg") == (U1, None)
+    assert parse_file_owner("1700000000_k3j2h.jpg") == (None, None)
+
+
+def test_pipeline_groups_flat_files_by_user():
+    """Fichiers plats regroupés par utilisateur, dossiers d'analyse parcourus, anonymes ignorés"""
+    lister = FakeStorageLister(
+        root_files=[
+            f"piece_{U1}_{PIECE}_1700000000.jpg",
+            f"piece_{U1}_{PIECE}_1700000500.jpg",
+            f"outfit_{U1}_1700000001.jpg",
+            f"outfit_{U2}_1700000002.jpg",
+            "1700000003_k3j2h.jpg",
+        ],
+        folders={U2: ["1700000004_ab12.jpg"], "tmp": ["x.jpg"]},
+    )
+    sink = FakeSink()
+
+    metrics = _run(RecoveryPipeline(lister, sink, PUBLIC_URL, page_size=2))
+
+    # U1 : découpes et photo de tenue ; U2 : photo de tenue et dossier d'analyse
+    assert metrics.groups_done == 4
+    assert metrics.files_unattributed == 1
+    # Deux découpes de la même pièce : une seule entrée, avec l'id de la pièce
+    assert metrics.items_existing == 1
+    assert uuid.UUID(PIECE) in {item["id"] for item in sink.items[U1]}
+    assert sorted(item["image_url"] for item in sink.items[U2]) == [
+        f"{PUBLIC_URL}/{U2}/1700000004_ab12.jpg",
+        f"{PUBLIC_URL}/outfit_{U2}_1700000002.jpg",
+    ]
+    assert ("tmp/", 2, 0) not in lister.calls
+
+
+def test_pipeline_batches_and_skips_existing():
+    """Les images déjà en base sont ignorées, le reste est inséré par lots"""
+    lister = FakeStorageLister(
+        root_files=[f"outfit_{U1}_{i}.jpg" for i in range(5)],
+        folders={U2: ["jean.jpg"]},
+    )
+    sink = FakeSink(existing={U1: [f"{PUBLIC_URL}/outfit_{U1}_0.jpg"]})
+    pipeline = RecoveryPipeline(lister, sink, PUBLIC_URL, batch_size=2, page_size=2, concurrency=2)
+
+    metrics = _run(pipeline)
+
+    assert metrics.groups_done == 2
+    assert metrics.files_seen == 6
+    assert metrics.items_existing == 1
+    assert metrics.items_created == 5
+    assert sorted(len(urls) for user, urls in sink.batches if user == U1) == [2, 2]
+    assert (U2, [f"{PUBLIC_URL}/{U2}/jean.jpg"]) in sink.batches
+
+
+def test_pipeline_dry_run_writes_nothing(tmp_path):
+    lister = FakeStorageLister(root_files=[f"outfit_{U1}_1.jpg", f"outfit_{U1}_2.jpg"])
+    sink = FakeSink()
+    checkpoint = RecoveryCheckpoint(tmp_path / "checkpoint.json")
+
+    metrics = _run(RecoveryPipeline(lister, sink, PUBLIC_URL, checkpoint=checkpoint, dry_run=True))
+
+    assert metrics.items_created == 2
+    assert sink.batches == []
+    assert not (tmp_path / "checkpoint.json").exists()
+
+
+def test_pipeline_resumes_from_checkpoint(tmp_path):
+    """Un groupe en échec n'est pas marqué : la relance ne traite que lui"""
+    path = tmp_path / "checkpoint.json"
+    files = [f"outfit_{U1}_1.jpg", f"outfit_{U2}_1.jpg", f"outfit_{U3}_1.jpg"]
+
+    first = _run(RecoveryPipeline(
+        FakeStorageLister(files), FakeSink(fail_for={U2}), PUBLIC_URL,
+        checkpoint=RecoveryCheckpoint(path),
+    ))
+    assert first.groups_failed == 1
+    assert json.loads(path.read_text()) == {"completed_users": [f"{U1}:outfit", f"{U3}:outfit"]}
+
+    sink = FakeSink()
+    second = _run(RecoveryPipeline(
+        FakeStorageLister(files), sink, PUBLIC_URL, checkpoint=RecoveryCheckpoint(path),
+    ))
+    assert second.groups_skipped == 2
+    assert [user for user, _ in sink.batches] == [U2]
+    assert json.loads(path.read_text()) == {"completed_users": [f"{U1}:outfit", f"{U2}:outfit", f"{U3}:outfit"]}
+
+
+def test_legacy_checkpoint_entries_cover_every_source(tmp_path):
+    """Un utilisateur noté sans source (ancien point de reprise) est entièrement ignoré"""
+    path = tmp_path / "checkpoint.json"
+    path.write_text(json.dumps({"completed_users": [U1]}))
+    lister = FakeStorageLister([f"outfit_{U1}_1.jpg", f"piece_{U1}_{PIECE}_1.jpg"], folders={U1: ["a.jpg"]})
+    sink = FakeSink()
+
+    metrics = _run(RecoveryPipeline(lister, sink, PUBLIC_URL, checkpoint=RecoveryCheckpoint(path)))
+
+    assert metrics.groups_skipped == 3
+    assert sink.batches == []
+
+
+def test_pipeline_bounds_concurrency():
+    """Jamais plus de `concurrency` utilisateurs traités en même temps"""
+    active = {"now": 0, "max": 0}
+    lock = threading.Lock()
+
+    class SlowSink(FakeSink):
+        def existing_image_urls(self, user):
+            with lock:
+                active["now"] += 1
+                active["max"] = max(active["max"], active["now"])
+            time.sleep(0.01)
+            with lock:
+                active["now"] -= 1
+            return super().existing_image_urls(user)
+
+    files = [f"outfit_{user_id(i)}_1.jpg" for i in range(10)]
+    metrics = _run(RecoveryPipeline(FakeStorageLister(files), SlowSink(), PUBLIC_URL, concurrency=3))
+
+    assert metrics.groups_done == 10
+    assert 1 < active["max"] <= 3
+
+
+def test_listing_is_consumed_at_the_pace_of_the_workers():
+    """Le listing n'est jamais lu en entier d'avance : la file bornée retient le producteur"""
+    lister = FakeStorageLister([f"outfit_{user_id(i)}_1.jpg" for i in range(40)])
+    read_ahead = []
+
+    class RecordingSink(FakeSink):
+        def existing_image_urls(self, user):
+            # Fichiers déjà listés au moment où ce groupe commence
+            read_ahead.append(len(lister.calls) * 2 - len(read_ahead))
+            time.sleep(0.002)
+            return super().existing_image_urls(user)
+
+    metrics = _run(RecoveryPipeline(lister, RecordingSink(), PUBLIC_URL, concurrency=1, page_size=2))
+
+    assert metrics.groups_done == 40
+    assert max(read_ahead) <= 8
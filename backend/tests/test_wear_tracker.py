@@ -0,0 +1,58 @@
+from datetime import date
+from uuid import UUID
+
+from services.wear_tracker import WearBuffer, WearEntry, WearKey
+
+
+USER_ID = UUID("12345678-1234-5678-1234-567812345678")
+ITEM_ID = UUID("00000000-0000-0000-0000-000000000001")
+LOOK_ID = UUID("00000000-0000-0000-0000-000000000002")
+
+
+def test_buffer_coalesces_by_entity():
+    """Plusieurs ports d'une même pièce donnent une seule entrée (somme, date la plus récente)"""
+    buffer = WearBuffer()
+    buffer.record_item(USER_ID, ITEM_ID, date(2024, 5, 2))
+    buffer.record_item(USER_ID, ITEM_ID, date(2024, 5, 1))
+    buffer.record_look(USER_ID, LOOK_ID, date(2024, 5, 1))
+
+    entries = buffer.drain()
+
+    assert entries == {
+        WearKey("item", USER_ID, ITEM_ID): WearEntry(2, date(2024, 5, 2)),
+        WearKey("look", USER_ID, LOOK_ID): WearEntry(1, date(2024, 5, 1)),
+    }
+    assert len(buffer) == 0
+
+
+def test_buffer_signals_when_full():
+    buffer = WearBuffer(max_entries=2)
+    buffer.record_item(USER_ID, ITEM_ID, date(2024, 5, 1))
+    assert not buffer.full.is_set()
+    buffer.record_look(USER_ID, LOOK_ID, date(2024, 5, 1))
+    assert buffer.full.is_set()
+
+    buffer.drain()
+    assert not buffer.full.is_set()
+
+
+def test_restore_merges_with_new_wears():
+    """Après un échec d'écriture, les entrées restaurées fusionnent avec les nouveaux ports"""
+    buffer = WearBuffer()
+    buffer.record_item(USER_ID, ITEM_ID, date(2024, 5, 1))
+    failed = buffer.drain()
+    buffer.record_item(USER_ID, ITEM_ID, date(2024, 5, 3))
+
+    buffer.restore(failed)
+
+    assert buffer.drain() == {WearKey("item", USER_ID, ITEM_ID): WearEntry(2, date(2024, 5, 3))}
+
+
+def test_buffer_keeps_users_apart():
+    """Un même id envoyé par un autre utilisateur ne se mélange pas (il sera ignoré au vidage)"""
+    other_user = UUID("87654321-4321-8765-4321-876543218765")
+    buffer = WearBuffer()
+    buffer.record_item(USER_ID, ITEM_ID, date(2024, 5, 1))
+    buffer.record_item(other_user, ITEM_ID, date(2024, 5, 1))
+
+    assert len(buffer.drain()) == 2
@@ -0,0 +1,77 @@
+import asyncio
+
+from services.weather import FakeWeatherProvider, WeatherService, geocode_key
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_geocoding_is_cached_and_normalized():
+    provider = FakeWeatherProvider()
+    service = WeatherService(provider)
+
+    async def scenario():
+        first = await service.get_weather_data("Paris", "FR")
+        again = await service.get_weather_data("  PARIS ", "fr")
+        unknown = [await service.get_weather_data("Atlantide", "FR") for _ in range(2)]
+        return first, again, unknown
+
+    first, again, unknown = run(scenario())
+
+    assert first["city"] == "Paris" and again == first
+    assert unknown == [None, None]
+    # Une fois par ville, y compris pour une ville inconnue
+    assert provider.geocode_calls == 2
+    assert geocode_key("Besançon ", "FR") == geocode_key("besancon", "fr")
+
+
+def test_forecast_is_served_from_cache_while_fresh():
+    provider = FakeWeatherProvider()
+    service = WeatherService(provider, ttl=60)
+
+    async def scenario():
+        return await asyncio.gather(*(service.get_weather_data("Paris") for _ in range(5)))
+
+    results = run(scenario())
+
+    assert all(result == results[0] for result in results)
+    # Requêtes concurrentes : un seul appel au fournisseur
+    assert provider.forecast_calls == 1
+
+
+def test_stale_forecast_is_served_then_revalidated():
+    provider = FakeWeatherProvider(temperature=10)
+    service = WeatherService(provider, ttl=0, stale_ttl=60)
+
+    async def scenario():
+        first = await service.get_weather_data("Paris")
+        provider.temperature = 25
+        stale = await service.get_weather_data("Paris")
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        refreshed = await service.get_weather_data("Paris")
+        return first, stale, refreshed
+
+    first, stale, refreshed = run(scenario())
+
+    assert first["current"]["temperature"] == 10
+    assert stale["current"]["temperature"] == 10
+    assert refreshed["current"]["temperature"] == 25
+
+
+def test_provider_outage_degrades_to_cached_forecast():
+    provider = FakeWeatherProvider(temperature=18)
+    service = WeatherService(provider, ttl=0, stale_ttl=60)
+
+    async def scenario():
+        await service.get_weather_data("Paris")
+        provider.failing = True
+        cached = await service.get_weather_data("Paris")
+        await asyncio.sleep(0)
+        return cached, await WeatherService(provider).get_weather_data("Paris")
+
+    cached, without_cache = run(scenario())
+
+    assert cached["current"]["temperature"] == 18
+    assert without_cache is None
@@ -0,0 +1,70 @@
+import asyncio
+from datetime import datetime, timezone
+
+from services.weather import FakeWeatherProvider, Location, WeatherService
+from services.weather_prefetch import WeatherPrefetcher
+
+PARIS = Location("Paris", "France", 48.86, 2.35, "Europe/Paris")
+TOKYO = Location("Tokyo", "Japon", 35.68, 139.69, "Asia/Tokyo")
+# 6 h à Paris, 15 h à Tokyo
+MORNING = datetime(2026, 6, 1, 4, 0, tzinfo=timezone.utc)
+
+
+def cities(count):
+    return [Location(f"Ville {i}", "France", 45 + i / 10, 2.0, "Europe/Paris") for i in range(count)]
+
+
+def test_only_active_locations_about_to_expire_are_due():
+    service = WeatherService(FakeWeatherProvider(), ttl=900)
+    prefetcher = WeatherPrefetcher(service, interval=600)
+
+    async def scenario():
+        fresh, expiring = cities(2)
+        for location in (fresh, expiring, PARIS):
+            service.track(location)
+        await service.refresh(fresh)
+        await service.refresh(expiring)
+        service._forecasts[expiring.key] = service._forecasts[expiring.key]._replace(
+            fetched_at=service._forecasts[expiring.key].fetched_at - 400)
+        return prefetcher.due(MORNING)
+
+    assert {location.name for location in asyncio.run(scenario())} == {"Ville 1", "Paris"}
+
+
+def test_locations_are_skipped_during_their_local_night():
+    service = WeatherService(FakeWeatherProvider())
+    service.track(PARIS)
+    service.track(TOKYO)
+    # 2 h du matin à Paris, 10 h à Tokyo
+    night_in_paris = datetime(2026, 6, 1, 0, 0, tzinfo=timezone.utc)
+
+    assert [location.name for location in WeatherPrefetcher(service).due(night_in_paris)] == ["Tokyo"]
+
+
+def test_refreshes_with_bounded_concurrency():
+    provider = FakeWeatherProvider(delay=0.01)
+    service = WeatherService(provider)
+    for location in cities(10):
+        service.track(location)
+
+    stats = asyncio.run(WeatherPrefetcher(service, concurrency=3, jitter=0).run_once(MORNING))
+
+    assert stats == {"due": 10, "refreshed": 10, "failed": 0}
+    assert provider.max_running == 3
+    assert all(service.forecast_age(location) is not None for location in cities(10))
+
+
+def test_provider_outage_keeps_cached_forecasts():
+    provider = FakeWeatherProvider(temperature=12)
+    service = WeatherService(provider, ttl=0, stale_ttl=3600)
+
+    async def scenario():
+        weather = await service.get_location_weather(PARIS)
+        provider.failing = True
+        stats = await WeatherPrefetcher(service, interval=0, jitter=0).run_once(MORNING)
+        return weather, stats, await service.get_location_weather(PARIS)
+
+    before, stats, after = asyncio.run(scenario())
+
+    assert stats["failed"] == 1
+    assert after["current"] == before["current"]